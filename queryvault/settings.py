@@ -109,6 +109,69 @@ STATICFILES_DIRS = [BASE_DIR / "vault" / "static"]
 
 DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 
+# Snippet хайлтын backend: auto (= index) | icontains | mysql | postgres | index
+VAULT_SEARCH_BACKEND = os.getenv("VAULT_SEARCH_BACKEND", "auto")
+# ordering=relevance (BM25) тохиргоо
+VAULT_SEARCH_FIELD_BOOSTS = {"title": 3.0, "tags": 2.0, "description": 1.0, "sql_text": 0.5}
+VAULT_SEARCH_BM25_K1 = 1.2
+VAULT_SEARCH_BM25_B = 0.75
+VAULT_SEARCH_POPULARITY_WEIGHT = 0.5
+# Эрхийн хүрээ, хайлтын generation нь process хооронд хуваалцагдах ёстой — REDIS_URL
+# тохируулаагүй (LocMemCache) үед эдгээр request хоорондын cache унтарна
+CACHES = {"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+if os.getenv("REDIS_URL"):
+    CACHES["default"] = {"BACKEND": "django.core.cache.backends.redis.RedisCache", "LOCATION": os.getenv("REDIS_URL")}
+# Хайлтын үр дүнгийн cache (process бүрт LRU; generation нь shared cache дээр)
+VAULT_SEARCH_CACHE_SIZE = int(os.getenv("VAULT_SEARCH_CACHE_SIZE", "2048"))
+VAULT_SEARCH_CACHE_ALIAS = "default"
+# use_count / trend_score-оор эрэмбэлсэн cache-лэгдсэн жагсаалтын насан (сек)
+VAULT_SEARCH_COUNTER_TTL = 60
+# Үүнээс олон үр дүнтэй хайлтыг cache-лэхгүй (live queryset)
+VAULT_SEARCH_MAX_RESULTS = 1000
+# ?with_total=1 үед COUNT-ийн дээд хязгаар
+VAULT_APPROX_COUNT_CAP = 10000
+# AI few-shot / suggestions-ийн local vector similarity
+VAULT_SIMILARITY_MIN_SCORE = 0.1
+VAULT_SIMILARITY_REFRESH_SECONDS = 5
+# utils_perms.permission_scope shared cache-ийн хугацаа (signal-аар мөн устгагдана)
+VAULT_PERM_CACHE_TIMEOUT = 600
+# Copy event буфер (vault/copy_events.py): хэмжээ эсвэл хугацаагаар flush
+VAULT_COPY_BUFFER_ENABLED = True
+VAULT_COPY_BUFFER_SIZE = 200
+VAULT_COPY_FLUSH_SECONDS = 2.0
+# Copy log-ийн SQLSnapshot zlib шахалт
+VAULT_SNAPSHOT_COMPRESS = False
+VAULT_SNAPSHOT_COMPRESS_MIN = 1024
+# rollup_copy_logs --prune: rollup хийгдсэн raw SnippetCopyLog-ийг хэдэн өдөр хадгалах (None = үүрд)
+VAULT_COPY_LOG_RETENTION_DAYS = None
+# rollup_copy_logs: log id-г энэ хугацаанаас (сек) хуучин харагдсан бол л тоолсонд тооцно
+# (auto-increment дараалал ≠ commit дараалал; copy flush transaction-оос урт байх ёстой)
+VAULT_COPY_LOG_SETTLE_SECONDS = 60
+# ordering=trending: copy-ийн жин хагас задралын хугацаа; солисон бол `rebuild_trending`
+VAULT_TRENDING_HALF_LIFE_DAYS = 7
+# Хамгийн анхны copy-оос өмнө байх ёстой (өмнөх copy-г epoch дээр гэж тооцно)
+VAULT_TRENDING_EPOCH = "2000-01-01"
+# Detail хуудасны "мөн copy хийсэн" (refresh_related_snippets)
+VAULT_RELATED_WINDOW_HOURS = 24
+VAULT_RELATED_TOP_K = 10
+# sql_validation.analyze_sql-ийн parse cache (LRU); ALIAS өгвөл kind/алдааг shared cache-д мөн хадгална
+VAULT_SQL_PARSE_CACHE_SIZE = 512
+VAULT_SQL_PARSE_CACHE_MAX_CHARS = 200_000
+VAULT_SQL_PARSE_CACHE_ALIAS = None
+VAULT_SQL_PARSE_CACHE_TIMEOUT = 3600
+# validate_sql_batch: process pool (None = CPU тоо), үүнээс цөөн miss-ийг pool-гүйгээр шалгана
+VAULT_SQL_VALIDATE_WORKERS = None
+VAULT_SQL_VALIDATE_POOL_MIN = 8
+VAULT_SQL_VALIDATE_BATCH_MAX = 5000
+# SQL шалгалтын хамгаалалт: хэмжээ, statement тоо, parse-ын хугацаа (сек);
+# ISOLATE_CHARS-аас урт SQL-ийг, мөн threaded worker дээрх бүх SQL-ийг kill хийж болох
+# урт насалдаг process pool-д (ISOLATE_WORKERS) parse хийнэ; бусдыг main thread дээр SIGALRM-аар
+VAULT_SQL_MAX_BYTES = 1_000_000
+VAULT_SQL_MAX_STATEMENTS = 500
+VAULT_SQL_PARSE_TIMEOUT = 2.0
+VAULT_SQL_ISOLATE_CHARS = 20_000
+VAULT_SQL_ISOLATE_WORKERS = 2
+
 REST_FRAMEWORK = {
     "DEFAULT_FILTER_BACKENDS": [
         "rest_framework.filters.SearchFilter",
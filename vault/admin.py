@@ -1,10 +1,16 @@
 from django.contrib import admin
 from django.db.models import Count
+from django.template.response import TemplateResponse
 from django.urls import reverse
 from django.utils.http import urlencode
 from django.utils.html import format_html
 
-from .models import QuerySnippet, UserDBAccess, SnippetCopyLog
+from .dedupe import find_clusters
+from .models import (
+    DBTypeDailyUsage, JobCheckpoint, QuerySnippet, SnippetCopyLog, SnippetDailyUsage, SQLSnapshot, Tag,
+    UserDailyUsage, UserDBAccess,
+)
+from .rollups import recount_use_counts
 
 
 # --------------------------
@@ -55,12 +61,13 @@ class QuerySnippetAdmin(admin.ModelAdmin):
     search_fields = ("title", "description", "sql_text", "tags")
     list_filter = ("db_type", "sql_kind", "created_by")
     readonly_fields = ("use_count", "created_at", "updated_at")
+    exclude = ("tag_set",)  # `tags` талбараас save() дээр автоматаар sync хийгдэнэ
     autocomplete_fields = ("created_by",)  # NEW
     list_select_related = ("created_by",)
     date_hierarchy = "updated_at"
     ordering = ("-updated_at",)
 
-    actions = ["recount_use_from_logs"]  # NEW
+    actions = ["recount_use_from_logs", "find_duplicate_clusters"]  # NEW
 
     def sql_kind_badge(self, obj):
         # SELECT / modify / dangerous-ийг өнгөөр ялгана
@@ -90,23 +97,42 @@ class QuerySnippetAdmin(admin.ModelAdmin):
 
     @admin.action(description="Recount use_count from copy logs")
     def recount_use_from_logs(self, request, queryset):
-        # SnippetCopyLog-аас дахин тооцоод use_count-ыг update хийнэ
-        counts = (
-            SnippetCopyLog.objects
-            .filter(snippet__in=queryset)
-            .values("snippet_id")
-            .annotate(c=Count("id"))
-        )
-        map_cnt = {row["snippet_id"]: row["c"] for row in counts}
-        updated = 0
-        for s in queryset:
-            new_val = map_cnt.get(s.id, 0)
-            if s.use_count != new_val:
-                s.use_count = new_val
-                s.save(update_fields=["use_count"])
-                updated += 1
+        # Rollup + raw log-оос chunk-аар, нэг UPDATE ... CASE-аар (бүх vault-д: recount_use_counts command)
+        _scanned, updated = recount_use_counts(queryset=queryset)
         self.message_user(request, f"Updated use_count for {updated} snippet(s).")
 
+    @admin.action(description="Find near-duplicate clusters")
+    def find_duplicate_clusters(self, request, queryset):
+        # LSH bucket-аар (pairwise биш) бүлэглэнэ — "Select all" хийвэл бүх vault-аар
+        clusters = find_clusters(snippet_ids=queryset.values("pk"))
+        objs = QuerySnippet.objects.in_bulk([sid for c in clusters for sid in c])
+        context = {
+            **self.admin_site.each_context(request),
+            "opts": self.model._meta,
+            "title": "Near-duplicate clusters",
+            "clusters": [[objs[sid] for sid in c if sid in objs] for c in clusters],
+        }
+        return TemplateResponse(request, "admin/vault/querysnippet/duplicate_clusters.html", context)
+
+
+# --------------------------
+# Tag Admin (QuerySnippet.tags-аас автоматаар үүснэ)
+# --------------------------
+@admin.register(Tag)
+class TagAdmin(admin.ModelAdmin):
+    list_display = ("name", "snippet_count")
+    search_fields = ("name",)
+    ordering = ("name",)
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).annotate(_snippet_count=Count("snippets"))
+
+    def snippet_count(self, obj):
+        return obj._snippet_count
+
+    snippet_count.short_description = "Snippets"
+    snippet_count.admin_order_field = "_snippet_count"
+
 
 # --------------------------
 # UserDBAccess Admin
@@ -133,12 +159,13 @@ class SnippetCopyLogAdmin(admin.ModelAdmin):
         "chars",
     )
     list_filter = ("user", "snippet", "copied_at")
-    search_fields = ("snippet__title", "user__username", "user_agent", "sql_snapshot")
+    search_fields = ("snippet__title", "user__username", "user_agent", "snapshot__sql_text")
     readonly_fields = (
     "snippet", "user", "copied_at", "ip_address", "user_agent", "referer", "sql_snapshot", "sql_chars")
 
     # Performance ба хэрэглэхэд амар болгох тохиргоо
     raw_id_fields = ("user", "snippet")  # NEW: том дата дээр хурдан болно
+    exclude = ("snapshot",)  # текстийг sql_snapshot (readonly)-оор харуулна
     list_select_related = ("user", "snippet")  # NEW: FK-уудыг join-оор татна
     date_hierarchy = "copied_at"  # NEW: огноогоор навигац
     ordering = ("-copied_at",)
@@ -155,6 +182,63 @@ class SnippetCopyLogAdmin(admin.ModelAdmin):
     chars.short_description = "SQL chars"
 
 
+# --------------------------
+# SQLSnapshot Admin (copy log-ийн давхардалгүй SQL текст)
+# --------------------------
+@admin.register(SQLSnapshot)
+class SQLSnapshotAdmin(admin.ModelAdmin):
+    list_display = ("id", "sha256", "size", "compressed", "created_at")
+    search_fields = ("sha256", "sql_text")
+    readonly_fields = ("sha256", "size", "created_at", "text")
+    exclude = ("sql_text", "data")
+    ordering = ("-id",)
+
+    @admin.display(boolean=True)
+    def compressed(self, obj):
+        return obj.data is not None
+
+
+# --------------------------
+# Copy log-ийн өдрийн rollup (rollup_copy_logs command бичнэ)
+# --------------------------
+class DailyUsageAdmin(admin.ModelAdmin):
+    date_hierarchy = "day"
+    ordering = ("-day", "-copies")
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(SnippetDailyUsage)
+class SnippetDailyUsageAdmin(DailyUsageAdmin):
+    list_display = ("day", "snippet", "copies")
+    raw_id_fields = ("snippet",)
+    list_select_related = ("snippet",)
+    search_fields = ("snippet__title",)
+
+
+@admin.register(UserDailyUsage)
+class UserDailyUsageAdmin(DailyUsageAdmin):
+    list_display = ("day", "user", "copies")
+    list_select_related = ("user",)
+    search_fields = ("user__username",)
+
+
+@admin.register(DBTypeDailyUsage)
+class DBTypeDailyUsageAdmin(DailyUsageAdmin):
+    list_display = ("day", "db_type", "copies")
+    list_filter = ("db_type",)
+
+
+@admin.register(JobCheckpoint)
+class JobCheckpointAdmin(admin.ModelAdmin):
+    list_display = ("name", "value", "updated_at")
+    search_fields = ("name",)
+
+
 # --------------------------
 # Admin site branding
 # --------------------------
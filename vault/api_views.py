@@ -1,41 +1,39 @@
 # vault/api_views.py
 from rest_framework import viewsets, permissions, serializers
-from django.db.models import Q
 from rest_framework.decorators import action
 from rest_framework.response import Response
+from django.conf import settings
 from django.core.cache import cache
+from django.http import StreamingHttpResponse
+from rest_framework.utils.encoders import JSONEncoder
 
 import hashlib
 import json
 import re
 
-from .models import QuerySnippet, classify_sql_kind
+from .copy_events import copy_buffer
+from .dedupe import copy_counts_by_fingerprint, find_near_duplicates
+from .models import QuerySnippet
+from .pagination import SnippetCursorPagination
+from .search import filter_snippets, ordered_by_ids, permitted_snippets, search_params, snippet_facets
+from .search_cache import result_cache
+from .search_index import tokenize
+from .similarity import similar_ids, vector_index
+from .suggest import suggest
 from .serializers import QuerySnippetSerializer
-from .sql_validation import validate_sql as _validate_sql, SQLSyntaxError
+from .sql_batch import analyze_many
+from .sql_validation import analyze_sql, guard_snapshot, parse_cache
 
 from .ai import ai_generate_sql as _ai_generate_sql, ai_fix_sql as _ai_fix_sql
 from .utils_perms import allowed_sql_kinds_for, allowed_db_types_for, user_role
 
 
+STREAM_CHUNK_SIZE = 500
+
+
 # ------------- helpers -------------
 def _tokenize(text: str):
-    tokens = re.findall(r"[0-9A-Za-z_А-Яа-яӨөҮүЁё]+", (text or "").lower())
-    return [t for t in tokens if len(t) > 2]
-
-
-def _search_queryset(qs, q: str):
-    tokens = _tokenize(q)
-    if not tokens:
-        return qs
-    q_obj = Q()
-    for t in tokens:
-        q_obj |= (
-                Q(title__icontains=t)
-                | Q(description__icontains=t)
-                | Q(sql_text__icontains=t)
-                | Q(tags__icontains=t)
-        )
-    return qs.filter(q_obj)
+    return tokenize(text)
 
 
 def _trim(s: str, n: int) -> str:
@@ -174,82 +172,181 @@ ORDER BY database, name;
     return "SELECT *\nFROM sales;"
 
 
+def _stream_batches(qs):
+    """
+    STREAM_CHUNK_SIZE-аар тусдаа query-нүүд: `.iterator()` MySQL дээр (server-side
+    cursor-гүй) бүх үр дүнг санах ойд татдаг. Хайлт/эрэмбэтэй бол эхлээд зөвхөн
+    id-уудыг (эрэмбээр нь) аваад ordered_by_ids chunk-аар; бусад үед id-ийн
+    дарааллаар keyset (`pk__gt`).
+    """
+    if tuple(qs.query.order_by) not in ((), ("-updated_at",)):  # viewset-ийн анхдагч эрэмбэ биш
+        ids = list(qs.values_list("pk", flat=True))
+        base = QuerySnippet.objects.all()
+        for i in range(0, len(ids), STREAM_CHUNK_SIZE):
+            yield list(ordered_by_ids(base, ids[i:i + STREAM_CHUNK_SIZE]))
+        return
+    qs = qs.order_by("pk")
+    last = 0
+    while True:
+        batch = list(qs.filter(pk__gt=last)[:STREAM_CHUNK_SIZE])
+        if not batch:
+            return
+        yield batch
+        last = batch[-1].pk
+
+
 # ------------- ViewSet -------------
 class QuerySnippetViewSet(viewsets.ModelViewSet):
     queryset = QuerySnippet.objects.all().order_by("-updated_at")
     serializer_class = QuerySnippetSerializer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = SnippetCursorPagination
     filterset_fields = ["db_type"]
     search_fields = ["title", "description", "sql_text", "tags"]
 
     def get_queryset(self):
         qs = super().get_queryset()
-        request = self.request
-
-        q = request.query_params.get("q", "").strip()
-        tag = request.query_params.get("tag", "").strip()
-        dbt = request.query_params.get("db_type", "").strip()
-
-        if tag:
-            qs = qs.filter(tags__icontains=tag)
-        if dbt:
-            qs = qs.filter(db_type=dbt)
-
-        kinds = allowed_sql_kinds_for(request.user)
-        qs = qs.filter(sql_kind__in=kinds)
-
-        db_types = allowed_db_types_for(request.user)
-        if db_types is not None:
-            qs = qs.filter(db_type__in=db_types)
-
-        return _search_queryset(qs, q)
+        return filter_snippets(qs, self.request.user, **search_params(self.request.query_params))
+
+    def list(self, request, *args, **kwargs):
+        fields = [f.strip() for f in request.query_params.get("facets", "").split(",") if f.strip()]
+        if not fields:
+            return super().list(request, *args, **kwargs)
+        qs = self.filter_queryset(self.get_queryset())
+        facets = snippet_facets(qs, request.user, fields, **request.query_params.dict())
+        page = self.paginate_queryset(qs)
+        response = self.get_paginated_response(self.get_serializer(page, many=True).data)
+        response.data["facets"] = facets
+        return response
+
+    def _search(self, q: str):
+        # UI-тай ижил search backend + эрхийн хүрээний cache
+        return filter_snippets(super().get_queryset(), self.request.user, q=q)
+
+    def _similar(self, ask: str, limit: int):
+        # Үгээр таарахгүй ч утгаар ойр snippet-үүд (local vector index); олдохгүй бол keyword хайлт
+        qs = permitted_snippets(super().get_queryset(), self.request.user)
+        ids = similar_ids(ask, qs, k=limit)
+        if ids:
+            return ordered_by_ids(qs, ids)
+        return self._search(ask)[:limit]
+
+    def create(self, request, *args, **kwargs):
+        response = super().create(request, *args, **kwargs)
+        # Хадгалсны дараа ойролцоо (near-duplicate) snippet-үүдийг анхааруулна
+        response.data["near_duplicates"] = [
+            {"id": s.id, "title": s.title, "similarity": round(sim, 3),
+             "exact": s.sql_fingerprint == response.data.get("sql_fingerprint")}
+            for s, sim in getattr(self, "_near_duplicates", [])
+        ]
+        return response
 
     def perform_create(self, serializer):
-        data = serializer.validated_data
-        sql_kind = classify_sql_kind(data.get("sql_text", ""))
+        sql_kind = serializer.sql_analysis.kind  # validate()-д нэг удаа parse хийсэн
 
         kinds = allowed_sql_kinds_for(self.request.user)
         if sql_kind not in kinds and user_role(self.request.user) != "admin":
             raise serializers.ValidationError({"sql_text": "Таны роль энэ төрлийн SQL хадгалах эрхгүй."})
 
         db_types = allowed_db_types_for(self.request.user)
-        if db_types is not None and data.get("db_type") not in db_types:
+        if db_types is not None and serializer.sql_analysis.db_type not in db_types:
             raise serializers.ValidationError({"db_type": "Таны DB type эрх хүрэхгүй байна."})
 
         obj = serializer.save(created_by=self.request.user)
-        obj.sql_kind = sql_kind
-        obj.save(update_fields=["sql_kind"])
+        self._near_duplicates = find_near_duplicates(
+            obj.sql_text, obj.db_type, exclude_id=obj.pk, analysis=serializer.sql_analysis,
+            queryset=permitted_snippets(QuerySnippet.objects.all(), self.request.user),
+        )
 
     def perform_update(self, serializer):
-        data = serializer.validated_data
-        sql_kind = classify_sql_kind(data.get("sql_text", ""))
+        sql_kind = serializer.sql_analysis.kind  # validate()-д нэг удаа parse хийсэн
 
         kinds = allowed_sql_kinds_for(self.request.user)
         if sql_kind not in kinds and user_role(self.request.user) != "admin":
             raise serializers.ValidationError({"sql_text": "Таны роль энэ төрлийн SQL засах эрхгүй."})
 
         db_types = allowed_db_types_for(self.request.user)
-        if db_types is not None and data.get("db_type") not in db_types:
+        if db_types is not None and serializer.sql_analysis.db_type not in db_types:
             raise serializers.ValidationError({"db_type": "Таны DB type эрх хүрэхгүй байна."})
 
-        obj = serializer.save()
-        obj.sql_kind = sql_kind
-        obj.save(update_fields=["sql_kind"])
+        serializer.save()
 
     @action(detail=False, methods=["get"])
     def search(self, request):
-        qs = self.get_queryset()
-        return Response(self.get_serializer(qs, many=True).data)
+        qs = self.filter_queryset(self.get_queryset())
+        if request.query_params.get("stream") == "ndjson":
+            return self._stream_ndjson(qs)
+        page = self.paginate_queryset(qs)
+        return self.get_paginated_response(self.get_serializer(page, many=True).data)
+
+    def _stream_ndjson(self, qs):
+        """Мөр бүрийг (NDJSON) шууд бичнэ — бүх үр дүнг санах ойд цуглуулахгүй."""
+        serializer = self.get_serializer()
+        encoder = JSONEncoder(ensure_ascii=False)
+
+        def rows():
+            for batch in _stream_batches(qs):
+                for obj in batch:
+                    yield encoder.encode(serializer.to_representation(obj)) + "\n"
+
+        response = StreamingHttpResponse(rows(), content_type="application/x-ndjson; charset=utf-8")
+        response["X-Accel-Buffering"] = "no"  # nginx буфер хийхгүй
+        return response
+
+    @action(detail=False, methods=["get"])
+    def suggest(self, request):
+        prefix = request.query_params.get("prefix", "")
+        try:
+            limit = max(1, min(int(request.query_params.get("limit", 8)), 20))
+        except ValueError:
+            limit = 8
+        return Response(suggest(
+            prefix,
+            kinds=allowed_sql_kinds_for(request.user),
+            db_types=allowed_db_types_for(request.user),
+            limit=limit,
+        ))
+
+    @action(detail=False, methods=["get"], permission_classes=[permissions.IsAdminUser])
+    def stats(self, request):
+        return Response({
+            "search_cache": result_cache.stats(),
+            "top_queries": copy_counts_by_fingerprint(),
+            "similarity_index": vector_index.stats(),
+            "copy_buffer": copy_buffer.stats(),
+            "sql_parse_cache": parse_cache.stats(),
+            "sql_guard": guard_snapshot(),
+        })
 
     @action(detail=False, methods=["post"])
     def validate_sql(self, request):
         sql_text = request.data.get("sql_text", "")
         db_type = request.data.get("db_type", "other")
-        try:
-            dialect = _validate_sql(sql_text, db_type)
-        except SQLSyntaxError as e:
-            return Response({"ok": False, "error": str(e)}, status=400)
-        return Response({"ok": True, "dialect": dialect})
+        analysis = analyze_sql(sql_text, db_type)
+        if not analysis.ok:
+            # guard: too_large / too_many_statements / timeout (синтакс алдаа биш)
+            return Response({"ok": False, "error": analysis.error, "guard": analysis.guard or None}, status=400)
+        return Response({"ok": True, "dialect": analysis.dialect, "kind": analysis.kind,
+                         "statements": analysis.statement_count})
+
+    @action(detail=False, methods=["post"])
+    def validate_sql_batch(self, request):
+        """{"items": [{sql_text, db_type}, ...]} → оролтын дарааллаар {ok, dialect, kind, statements, error}."""
+        items = request.data.get("items")
+        limit = int(getattr(settings, "VAULT_SQL_VALIDATE_BATCH_MAX", 5000))
+        if not isinstance(items, list) or not all(isinstance(i, dict) for i in items):
+            return Response({"ok": False, "error": "items must be a list of {sql_text, db_type}."}, status=400)
+        if len(items) > limit:
+            return Response({"ok": False, "error": f"At most {limit} items per request."}, status=400)
+        results = analyze_many((str(i.get("sql_text") or ""), str(i.get("db_type") or "other")) for i in items)
+        if request.query_params.get("stream") == "ndjson":
+            encoder = JSONEncoder(ensure_ascii=False)
+            response = StreamingHttpResponse(
+                (encoder.encode(r) + "\n" for r in results), content_type="application/x-ndjson; charset=utf-8",
+            )
+            response["X-Accel-Buffering"] = "no"
+            return response
+        return Response({"ok": True, "results": list(results)})
 
     @action(detail=False, methods=["post"])
     def generate_sql(self, request):
@@ -257,7 +354,7 @@ class QuerySnippetViewSet(viewsets.ModelViewSet):
         db_type = request.data.get("db_type", "other")
         schema = request.data.get("schema", "")
 
-        qs = _search_queryset(self.get_queryset(), ask)
+        qs = self._similar(ask, 8)
         suggestions = list(qs.values("id", "title", "tags", "use_count", "db_type")[:8])
 
         sql = _simple_rule_based_sql(ask, db_type, schema)
@@ -272,8 +369,7 @@ class QuerySnippetViewSet(viewsets.ModelViewSet):
         kinds = allowed_sql_kinds_for(request.user)
 
         # few-shot (богиноруулж өгнө)
-        base_qs = self.get_queryset()
-        sugg_qs = _search_queryset(base_qs, ask)[:5]
+        sugg_qs = self._similar(ask, 5)
         examples = [{"nl": _trim(s.description or s.title, 200),
                      "sql": _trim(s.sql_text, 800),
                      "schema": ""} for s in sugg_qs]
@@ -296,35 +392,34 @@ class QuerySnippetViewSet(viewsets.ModelViewSet):
         # 3) баталгаажуулах + self-repair (2 хүртэл)
         last_err = None
         for _ in range(3):
+            analysis = analyze_sql(sql, db_type)
+            if analysis.ok:
+                break
+            last_err = analysis.error
             try:
-                _validate_sql(sql, db_type)
+                sql = _ai_fix_sql(sql, db_type, kinds, last_err)
+                sql = re.sub(r"[^\x09\x0A\x0D\x20-\x7E\u00A0-\uFFFF]", "", sql).strip()
+            except Exception as ie:
+                last_err = f"{last_err} / fix failed: {ie}"
                 break
-            except SQLSyntaxError as e:
-                last_err = str(e)
-                try:
-                    sql = _ai_fix_sql(sql, db_type, kinds, last_err)
-                    sql = re.sub(r"[^\x09\x0A\x0D\x20-\x7E\u00A0-\uFFFF]", "", sql).strip()
-                except Exception as ie:
-                    last_err = f"{last_err} / fix failed: {ie}"
-                    break
-        else:
+        if not analysis.ok:
             return Response({"ok": False, "error": f"AI generated invalid SQL: {last_err}"}, status=400)
 
         # 4) эрхийн шүүлт
-        k = classify_sql_kind(sql)
+        k = analysis.kind
         if k not in kinds and user_role(request.user) != "admin":
             try:
                 sql2 = _ai_generate_sql(ask, db_type, schema, {"select"}, examples=examples)
-                _validate_sql(sql2, db_type)
-                k2 = classify_sql_kind(sql2)
-                if k2 not in kinds:
+                analysis2 = analyze_sql(sql2, db_type)
+                k2 = analysis2.kind
+                if not analysis2.ok or k2 not in kinds:
                     return Response({"ok": False, "error": "Generated SQL violates your permissions."}, status=403)
                 sql, k = sql2, k2
             except Exception:
                 return Response({"ok": False, "error": "Generated SQL violates your permissions."}, status=403)
 
         # 5) төстэй snippet-үүд
-        qs = _search_queryset(self.get_queryset(), ask)
+        qs = self._similar(ask, 8)
         suggestions = list(qs.values("id", "title", "tags", "use_count", "db_type")[:8])
 
         result = {"ok": True, "sql": sql, "kind": k, "suggestions": suggestions}
@@ -7,6 +7,8 @@ class VaultConfig(AppConfig):
     name = "vault"
 
     def ready(self):
+        from . import signals  # noqa: F401  (эрхийн cache invalidation)
+
         try:
             from .ai import ai_generate_sql
             ai_generate_sql("ping", "mysql", "", {"select"})
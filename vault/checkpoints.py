@@ -0,0 +1,16 @@
+# vault/checkpoints.py
+"""JobCheckpoint-ийн жижиг helper-ууд (удаан ажиллах command-уудыг үргэлжлүүлэхэд)."""
+from .models import JobCheckpoint
+
+
+def get_checkpoint(name: str, default: str = "") -> str:
+    value = JobCheckpoint.objects.filter(name=name).values_list("value", flat=True).first()
+    return default if value is None else value
+
+
+def set_checkpoint(name: str, value) -> None:
+    JobCheckpoint.objects.update_or_create(name=name, defaults={"value": str(value)})
+
+
+def clear_checkpoint(name: str) -> None:
+    JobCheckpoint.objects.filter(name=name).delete()
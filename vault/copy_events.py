@@ -0,0 +1,180 @@
+# vault/copy_events.py
+"""
+Copy event-ийн буфертэй (batched) бичилт.
+
+`views.copy_event` event-ийг process доторх буферт хийгээд шууд хариу өгнө.
+Background (daemon) thread буферийг VAULT_COPY_FLUSH_SECONDS тутамд эсвэл
+VAULT_COPY_BUFFER_SIZE хүрмэгц нэг transaction-д бичнэ:
+  - SnippetCopyLog — bulk_create
+  - use_count      — snippet бүрээр нэгтгэсэн нэг UPDATE (CASE WHEN)
+  - trend_score    — мөн нэг UPDATE (vault/trending.py)
+Process унтрахад (atexit) үлдсэнийг бичнэ. VAULT_COPY_BUFFER_ENABLED=False бол
+event бүрийг шууд (sync) бичнэ.
+"""
+import atexit
+import logging
+import threading
+from collections import Counter, defaultdict, deque
+
+from django.conf import settings
+from django.db import OperationalError, connections, transaction
+from django.db.models import Case, F, IntegerField, Value, When
+from django.utils import timezone
+
+from .models import QuerySnippet, SnippetCopyLog
+from .snapshots import snapshot_hash, snapshot_ids
+from .trending import apply_copy_times
+
+logger = logging.getLogger(__name__)
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+class CopyEventBuffer:
+    def __init__(self):
+        self._events = deque()
+        self._pending = Counter()  # snippet_id → буферт байгаа copy тоо
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+        self.flushed = 0
+
+    # ---- producer ----
+    def add(self, event: dict):
+        with self._lock:
+            self._events.append(event)
+            self._pending[event["snippet_id"]] += 1
+            size = len(self._events)
+        self._ensure_worker()
+        if size >= int(_setting("VAULT_COPY_BUFFER_SIZE", 200)):
+            self._wake.set()
+
+    def pending_for(self, snippet_id) -> int:
+        with self._lock:
+            return self._pending.get(snippet_id, 0)
+
+    def __len__(self):
+        return len(self._events)
+
+    # ---- consumer ----
+    def _drain(self):
+        with self._lock:
+            events = list(self._events)
+            self._events.clear()
+            self._pending.clear()
+        return events
+
+    def _requeue(self, events):
+        with self._lock:
+            limit = int(_setting("VAULT_COPY_BUFFER_MAX", 50000))
+            keep = events[: max(0, limit - len(self._events))]
+            self._events.extendleft(reversed(keep))
+            for e in keep:
+                self._pending[e["snippet_id"]] += 1
+        if len(keep) < len(events):
+            logger.error("copy buffer full, dropped %d event(s)", len(events) - len(keep))
+
+    def flush(self) -> int:
+        events = self._drain()
+        if not events:
+            return 0
+        try:
+            write_events(events)
+        except OperationalError:
+            # DB түр холбогдохгүй — дараагийн удаа дахин оролдоно
+            logger.exception("copy event flush failed (%d event(s)), will retry", len(events))
+            self._requeue(events)
+            return 0
+        except Exception:
+            # Нэг муу event бүх batch-ийг гацаахгүйн тулд нэг нэгээр нь бичнэ
+            logger.exception("copy event batch failed, writing one by one")
+            retry, written = [], 0
+            for e in events:
+                try:
+                    write_events([e])
+                    written += 1
+                except OperationalError:
+                    retry.append(e)
+                except Exception:
+                    logger.exception("dropping copy event for snippet #%s", e["snippet_id"])
+            if retry:
+                self._requeue(retry)
+            self.flushed += written
+            return written
+        self.flushed += len(events)
+        return len(events)
+
+    def _run(self):
+        interval = float(_setting("VAULT_COPY_FLUSH_SECONDS", 2.0))
+        while True:
+            self._wake.wait(interval)
+            self._wake.clear()
+            self.flush()
+            connections.close_all()  # thread-ийн холболтыг барьж үлдэхгүй
+
+    def _ensure_worker(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="vault-copy-flusher", daemon=True)
+                self._thread.start()
+
+    def stats(self) -> dict:
+        return {"buffered": len(self._events), "flushed": self.flushed}
+
+
+def write_events(events):
+    """Event-үүдийг нэг transaction-д бичнэ (устсан snippet-ийн event алгасна)."""
+    ids = {e["snippet_id"] for e in events}
+    existing = set(QuerySnippet.objects.filter(pk__in=ids).values_list("pk", flat=True))
+    events = [e for e in events if e["snippet_id"] in existing]
+    if not events:
+        return
+    counts = Counter(e["snippet_id"] for e in events)
+    with transaction.atomic():
+        # Ижил SQL текст нэг л SQLSnapshot мөртэй
+        snap_ids = snapshot_ids({e["sql_snapshot"] for e in events})
+        logs = []
+        for e in events:
+            fields = {k: v for k, v in e.items() if k != "sql_snapshot"}
+            logs.append(SnippetCopyLog(snapshot_id=snap_ids[snapshot_hash(e["sql_snapshot"])], **fields))
+        SnippetCopyLog.objects.bulk_create(logs, batch_size=500)
+        QuerySnippet.objects.filter(pk__in=counts).update(
+            use_count=F("use_count") + Case(
+                *[When(pk=pk, then=Value(n)) for pk, n in counts.items()],
+                default=Value(0), output_field=IntegerField(),
+            )
+        )
+        times = defaultdict(list)
+        for e in events:
+            times[e["snippet_id"]].append(e["copied_at"])
+        apply_copy_times(times)
+
+
+copy_buffer = CopyEventBuffer()
+atexit.register(copy_buffer.flush)
+
+
+def record_copy(snippet: QuerySnippet, user=None, ip=None, user_agent="", referer="") -> int:
+    """
+    Copy event-ийг бүртгээд тооцоолсон use_count буцаана
+    (DB-ээс уншсан утга + энэ process-ийн буферт хүлээгдэж буй тоо).
+    """
+    event = {
+        "snippet_id": snippet.pk,
+        "user_id": user.pk if user is not None and user.is_authenticated else None,
+        "copied_at": timezone.now(),
+        "ip_address": ip or None,
+        "user_agent": (user_agent or "")[:512],
+        "referer": (referer or "")[:200],
+        "sql_snapshot": snippet.sql_text,
+        "sql_chars": len(snippet.sql_text or ""),
+    }
+    if not _setting("VAULT_COPY_BUFFER_ENABLED", True):
+        write_events([event])
+        return (snippet.use_count or 0) + 1
+    copy_buffer.add(event)
+    return (snippet.use_count or 0) + copy_buffer.pending_for(snippet.pk)
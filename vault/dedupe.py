@@ -0,0 +1,232 @@
+# vault/dedupe.py
+"""
+Ойролцоо (near-duplicate) snippet илрүүлэлт: MinHash + LSH.
+
+sql_text-ийг comment-гүй болгож, sqlglot-оор canonical болгоод (literal → ?,
+alias → t1/c1...), token shingle-үүдийн MinHash signature-ийг band-уудад
+хувааж SnippetLSHBucket-д индекслэнэ. Хайлт нь band бүрт нэг индекстэй
+lookup, дараа нь цөөн candidate-ийн signature-ийг харьцуулна.
+
+Яг ижил query-г `QuerySnippet.sql_fingerprint` (индекстэй) талбараар олно.
+"""
+import hashlib
+import re
+import struct
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import Count, Exists, Min, OuterRef, Q, Sum
+from sqlglot import errors, parse
+
+from .models import QuerySnippet, SnippetDailyUsage, SnippetLSHBucket, SnippetMinHash
+from .sql_validation import DIALECT_MAP, _strip_comments, regex_canonical, render_canonical
+
+NUM_PERM = 64
+BANDS = 16
+ROWS = NUM_PERM // BANDS
+SHINGLE_SIZE = 3
+# MinHash нь shingle бүрт NUM_PERM удаа hash хийдэг (O(64·n)) — зөвхөн эхний хэсгээр
+SIGNATURE_MAX_CHARS = 20_000
+DEFAULT_THRESHOLD = 0.8
+
+_PRIME = (1 << 61) - 1
+_MASK = (1 << 64) - 1
+
+
+def _perm_coeffs():
+    coeffs = []
+    for i in range(NUM_PERM):
+        d = hashlib.blake2b(f"vault-minhash-{i}".encode(), digest_size=16).digest()
+        a, b = struct.unpack("<QQ", d)
+        coeffs.append(((a % (_PRIME - 1)) + 1, b % _PRIME))
+    return coeffs
+
+
+PERMUTATIONS = _perm_coeffs()
+TOKEN_RE = re.compile(r"\w+|[^\w\s]")
+
+
+# ------------- normalization -------------
+def canonical_sql(sql_text: str, db_type: str, placeholders=True, column_aliases=True, analysis=None) -> str:
+    """
+    Comment, whitespace, alias (болон literal)-ын ялгааг арилгасан canonical SQL.
+    Тохирох `analysis` (sql_validation.analyze_sql) өгвөл түүнд тооцоолсон хэлбэрийг
+    шууд буцаана — AST-гүй (shared cache, isolated, guard) үед ч дахин parse хийхгүй.
+    """
+    if analysis is not None and analysis.matches(sql_text, db_type):
+        ready = analysis.canonical(placeholders, column_aliases)
+        if ready is not None:
+            return ready
+    dialect = DIALECT_MAP.get(db_type or "other", "mysql")
+    text = _strip_comments(sql_text)
+    try:
+        trees = [t for t in parse(text, read=dialect) if t is not None]
+        return render_canonical(trees, dialect, placeholders, column_aliases)
+    except (errors.ParseError, errors.TokenError):
+        # parse хийгдэхгүй бол regex-ээр ойролцоогоор
+        return regex_canonical(text, placeholders)
+
+
+def normalize_sql(sql_text: str, db_type: str, analysis=None) -> str:
+    """MinHash-д зориулсан хамгийн "сул" хэлбэр (literal, alias бүгд canonical)."""
+    return canonical_sql(sql_text, db_type, analysis=analysis)
+
+
+def sql_fingerprint(sql_text: str, db_type: str, analysis=None) -> str:
+    """
+    Яг ижил query-н fingerprint (sha256 hex): format, comment, table alias-аас
+    үл хамаарна, харин literal болон багана alias (үр дүнд нөлөөлнө) хадгалагдана.
+    """
+    canonical = canonical_sql(sql_text, db_type, placeholders=False, column_aliases=False, analysis=analysis)
+    return hashlib.sha256(f"{db_type}\n{canonical}".encode("utf-8")).hexdigest()
+
+
+# ------------- MinHash / LSH -------------
+def shingles(canonical: str):
+    tokens = TOKEN_RE.findall(canonical.lower())
+    if len(tokens) < SHINGLE_SIZE:
+        return {" ".join(tokens)} if tokens else set()
+    return {" ".join(tokens[i:i + SHINGLE_SIZE]) for i in range(len(tokens) - SHINGLE_SIZE + 1)}
+
+
+def minhash_signature(shingle_set):
+    hashes = [
+        int.from_bytes(hashlib.blake2b(s.encode("utf-8"), digest_size=8).digest(), "little")
+        for s in shingle_set
+    ] or [0]
+    return [min(((a * h + b) % _PRIME) & _MASK for h in hashes) for a, b in PERMUTATIONS]
+
+
+def band_hashes(signature):
+    """Band бүрийн ROWS утгыг signed 63-bit bucket болгоно (BigIntegerField-д багтана)."""
+    out = []
+    for band in range(BANDS):
+        chunk = struct.pack(f"<{ROWS}Q", *signature[band * ROWS:(band + 1) * ROWS])
+        out.append(int.from_bytes(hashlib.blake2b(chunk, digest_size=8).digest(), "little", signed=True) >> 1)
+    return out
+
+
+def pack_signature(signature) -> bytes:
+    return struct.pack(f"<{NUM_PERM}Q", *signature)
+
+
+def unpack_signature(data) -> tuple:
+    return struct.unpack(f"<{NUM_PERM}Q", bytes(data))
+
+
+def estimate_jaccard(sig_a, sig_b) -> float:
+    return sum(1 for x, y in zip(sig_a, sig_b) if x == y) / NUM_PERM
+
+
+def sql_signature(sql_text: str, db_type: str, analysis=None):
+    canonical = normalize_sql(sql_text, db_type, analysis=analysis)
+    return minhash_signature(shingles(canonical[:SIGNATURE_MAX_CHARS]))
+
+
+# ------------- index maintenance -------------
+def index_minhash(snippet: QuerySnippet):
+    signature = sql_signature(snippet.sql_text, snippet.db_type, analysis=snippet._sql_analysis)
+    with transaction.atomic():
+        SnippetMinHash.objects.update_or_create(
+            snippet_id=snippet.pk, defaults={"signature": pack_signature(signature)}
+        )
+        SnippetLSHBucket.objects.filter(snippet_id=snippet.pk).delete()
+        SnippetLSHBucket.objects.bulk_create([
+            SnippetLSHBucket(snippet_id=snippet.pk, band=i, bucket=h)
+            for i, h in enumerate(band_hashes(signature))
+        ])
+
+
+# ------------- lookups -------------
+def find_near_duplicates(sql_text: str, db_type: str, queryset=None, exclude_id=None,
+                         threshold: float = DEFAULT_THRESHOLD, limit: int = 5, analysis=None):
+    """
+    [(snippet, similarity), ...] — LSH bucket-аар candidate олж, signature-аар шалгана.
+    `queryset` өгвөл (ж: эрхээр шүүсэн) зөвхөн түүн доторх snippet-ийг буцаана.
+    """
+    signature = sql_signature(sql_text, db_type, analysis=analysis)
+    cond = Q()
+    for i, h in enumerate(band_hashes(signature)):
+        cond |= Q(band=i, bucket=h)
+    candidates = set(SnippetLSHBucket.objects.filter(cond).values_list("snippet_id", flat=True))
+    candidates.discard(exclude_id)
+    if not candidates:
+        return []
+
+    scored = []
+    for sid, data in SnippetMinHash.objects.filter(snippet_id__in=candidates).values_list("snippet_id", "signature"):
+        sim = estimate_jaccard(signature, unpack_signature(data))
+        if sim >= threshold:
+            scored.append((sid, sim))
+    if not scored:
+        return []
+
+    qs = queryset if queryset is not None else QuerySnippet.objects.all()
+    objs = qs.filter(pk__in=[sid for sid, _ in scored]).in_bulk()
+    scored.sort(key=lambda x: (-x[1], x[0]))
+    return [(objs[sid], sim) for sid, sim in scored if sid in objs][:limit]
+
+
+def find_clusters(snippet_ids=None, threshold: float = DEFAULT_THRESHOLD):
+    """
+    Ижил bucket-д орсон snippet-үүдээс union-find-аар cluster үүсгэнэ.
+    [[snippet_id, ...], ...] — хамгийн том cluster эхэндээ.
+    """
+    buckets = SnippetLSHBucket.objects.all()
+    if snippet_ids is not None:
+        buckets = buckets.filter(snippet_id__in=snippet_ids)
+    # Өөр snippet-тэй хуваалцсан bucket-ийн мөрүүд — нэг query (bucket бүрт query биш)
+    others = buckets.filter(band=OuterRef("band"), bucket=OuterRef("bucket")).exclude(pk=OuterRef("pk"))
+    shared = (
+        buckets.filter(Exists(others))
+        .order_by("band", "bucket", "snippet_id")
+        .values_list("band", "bucket", "snippet_id")
+    )
+    members = defaultdict(list)
+    for band, bucket, sid in shared.iterator(chunk_size=5000):
+        members[(band, bucket)].append(sid)
+    if not members:
+        return []
+
+    ids = {sid for group in members.values() for sid in group}
+    sigs = {
+        sid: unpack_signature(data)
+        for sid, data in SnippetMinHash.objects.filter(snippet_id__in=ids).values_list("snippet_id", "signature")
+    }
+    parent = {sid: sid for sid in ids}
+
+    def root(x):
+        while parent[x] != x:
+            parent[x] = parent[parent[x]]
+            x = parent[x]
+        return x
+
+    for group in members.values():
+        head = group[0]
+        for other in group[1:]:
+            if head in sigs and other in sigs and estimate_jaccard(sigs[head], sigs[other]) >= threshold:
+                parent[root(other)] = root(head)
+
+    clusters = defaultdict(list)
+    for sid in ids:
+        clusters[root(sid)].append(sid)
+    return sorted((sorted(c) for c in clusters.values() if len(c) > 1), key=lambda c: (-len(c), c[0]))
+
+
+def copy_counts_by_fingerprint(limit: int = 20):
+    """
+    Текстээрээ ялгаатай ч ижил query-гээр (fingerprint) нэгтгэсэн copy тоо.
+    Өдрийн rollup-аас уншина (сүүлийн rollup_copy_logs хүртэлх).
+    """
+    rows = (
+        SnippetDailyUsage.objects
+        .exclude(snippet__sql_fingerprint="")
+        .values("snippet__sql_fingerprint")
+        .annotate(copies=Sum("copies"), snippets=Count("snippet_id", distinct=True), first_id=Min("snippet_id"))
+        .order_by("-copies")[:limit]
+    )
+    return [
+        {"fingerprint": r["snippet__sql_fingerprint"], "copies": r["copies"],
+         "snippets": r["snippets"], "snippet_id": r["first_id"]}
+        for r in rows
+    ]
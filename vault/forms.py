@@ -2,7 +2,7 @@ from django import forms
 from .models import QuerySnippet
 
 
-from .sql_validation import validate_sql, SQLSyntaxError
+from .sql_validation import analyze_sql
 
 class SnippetForm(forms.ModelForm):
     class Meta:
@@ -13,12 +13,15 @@ class SnippetForm(forms.ModelForm):
             "sql_text": forms.Textarea(attrs={"rows": 12, "spellcheck": "false"}),
         }
 
+    sql_analysis = None
+
     def clean(self):
         cleaned = super().clean()
         sql_text = cleaned.get("sql_text")
         db_type = cleaned.get("db_type")
-        try:
-            validate_sql(sql_text, db_type)
-        except SQLSyntaxError as e:
-            self.add_error("sql_text", f"SQL syntax error: {e}")
+        # Нэг удаа parse хийгээд view болон QuerySnippet.save-д дамжуулна
+        self.sql_analysis = self.instance._sql_analysis = analyze_sql(sql_text, db_type)
+        if not self.sql_analysis.ok:
+            a = self.sql_analysis
+            self.add_error("sql_text", a.error if a.guard else f"SQL syntax error: {a.error}")
         return cleaned
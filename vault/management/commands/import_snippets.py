@@ -0,0 +1,80 @@
+# vault/management/commands/import_snippets.py
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from vault.dedupe import sql_fingerprint
+from vault.models import QuerySnippet
+
+UPDATABLE_FIELDS = ("title", "description", "tags")
+
+
+def _records(data):
+    """`dumpdata` формат ({"model", "fields"}) эсвэл энгийн dict жагсаалт."""
+    for row in data:
+        if "fields" in row:
+            if row.get("model", "vault.querysnippet").lower() != "vault.querysnippet":
+                continue
+            row = row["fields"]
+        yield row
+
+
+class Command(BaseCommand):
+    help = (
+        "JSON файлаас snippet импортлоно. sql_fingerprint-ээр upsert хийдэг тул "
+        "ижил query (format/comment/alias ялгаатай ч) давхар үүсэхгүй."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("path")
+        parser.add_argument("--chunk", type=int, default=500)
+        parser.add_argument("--dry-run", action="store_true")
+
+    def handle(self, *args, **opts):
+        try:
+            with open(opts["path"], encoding="utf-8") as fh:
+                rows = list(_records(json.load(fh)))
+        except (OSError, ValueError) as e:
+            raise CommandError(f"Файл уншиж чадсангүй: {e}")
+
+        created = updated = unchanged = 0
+        for start in range(0, len(rows), opts["chunk"]):
+            chunk = []
+            for row in rows[start:start + opts["chunk"]]:
+                if not (row.get("sql_text") or "").strip():
+                    continue
+                db_type = row.get("db_type") or "mysql"
+                chunk.append((sql_fingerprint(row["sql_text"], db_type), db_type, row))
+
+            # Chunk бүрт нэг индекстэй lookup
+            existing = {}
+            for s in QuerySnippet.objects.filter(sql_fingerprint__in={fp for fp, _db, _r in chunk}).order_by("-id"):
+                existing[s.sql_fingerprint] = s
+
+            for fp, db_type, row in chunk:
+                obj = existing.get(fp)
+                if obj is None:
+                    obj = QuerySnippet(
+                        sql_text=row["sql_text"], db_type=db_type,
+                        **{f: row.get(f) or "" for f in UPDATABLE_FIELDS},
+                    )
+                    obj.title = obj.title or "Imported snippet"
+                    if not opts["dry_run"]:
+                        obj.save()
+                    existing[fp] = obj
+                    created += 1
+                    continue
+                changed = [f for f in UPDATABLE_FIELDS if row.get(f) and row[f] != getattr(obj, f)]
+                if not changed:
+                    unchanged += 1
+                    continue
+                for f in changed:
+                    setattr(obj, f, row[f])
+                if not opts["dry_run"]:
+                    obj.save(update_fields=[*changed, "updated_at"])
+                updated += 1
+
+        prefix = "[dry-run] " if opts["dry_run"] else ""
+        self.stdout.write(self.style.SUCCESS(
+            f"{prefix}created {created}, updated {updated}, unchanged {unchanged}."
+        ))
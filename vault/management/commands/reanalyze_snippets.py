@@ -0,0 +1,61 @@
+# vault/management/commands/reanalyze_snippets.py
+from collections import Counter
+
+from django.core.management.base import BaseCommand
+
+from vault.checkpoints import clear_checkpoint, get_checkpoint, set_checkpoint
+from vault.models import QuerySnippet
+from vault.sql_batch import reanalyze_snippets
+
+CHECKPOINT = "reanalyze_snippets:last_id"
+
+
+class Command(BaseCommand):
+    help = (
+        "Бүх QuerySnippet-ийн sql_kind / sql_fingerprint-ийг process pool-д дахин тооцож, "
+        "өөрчлөгдсөнийг л бичнэ. --resume нь JobCheckpoint-оос үргэлжлүүлнэ; "
+        "--dry-run нь юу өөрчлөгдөхийг л харуулна."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--chunk", type=int, default=2000)
+        parser.add_argument("--workers", type=int, default=None, help="Process тоо (default: CPU тоо)")
+        parser.add_argument("--resume", action="store_true")
+        parser.add_argument("--dry-run", action="store_true")
+
+    def handle(self, *args, **opts):
+        dry_run = opts["dry_run"]
+        start_after = int(get_checkpoint(CHECKPOINT, "0") or 0) if opts["resume"] else 0
+        total = QuerySnippet.objects.filter(pk__gt=start_after).count()
+        if start_after:
+            self.stdout.write(f"Resuming after id {start_after}")
+        transitions = Counter()
+        fingerprints = 0
+
+        def progress(last_id, scanned, changes):
+            nonlocal fingerprints
+            if not dry_run:
+                set_checkpoint(CHECKPOINT, last_id)
+            for pk, old, new, fp_changed in changes:
+                fingerprints += fp_changed
+                if old != new:
+                    transitions[(old, new)] += 1
+                if dry_run and opts["verbosity"] > 1:
+                    self.stdout.write(f"  #{pk}: {old} → {new}" + (" (fingerprint)" if fp_changed else ""))
+            pct = (100.0 * scanned / total) if total else 100.0
+            self.stdout.write(f"{scanned}/{total} ({pct:.0f}%) scanned, last id {last_id}")
+
+        scanned, changed, guarded = reanalyze_snippets(
+            chunk=opts["chunk"], start_after=start_after, workers=opts["workers"],
+            dry_run=dry_run, on_chunk=progress,
+        )
+        if not dry_run:
+            clear_checkpoint(CHECKPOINT)
+        for (old, new), n in sorted(transitions.items()):
+            self.stdout.write(f"  {old} → {new}: {n}")
+        if fingerprints:
+            self.stdout.write(f"  fingerprint changed: {fingerprints}")
+        if guarded:
+            self.stdout.write(self.style.WARNING(f"  {guarded} snippet(s) too large/slow to parse (kept as dangerous)"))
+        verb = "Would update" if dry_run else "Updated"
+        self.stdout.write(self.style.SUCCESS(f"Scanned {scanned} snippet(s). {verb} {changed}."))
@@ -0,0 +1,27 @@
+# vault/management/commands/rebuild_search_index.py
+from django.core.management.base import BaseCommand
+
+from vault.models import FieldStat, QuerySnippet, SnippetTerm, TermStat
+from vault.search_index import ensure_field_stats, index_snippet
+
+
+class Command(BaseCommand):
+    help = "QuerySnippet-үүдийн token индекс (SnippetTerm) болон BM25 статистикийг бүрэн дахин байгуулна."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--chunk", type=int, default=500)
+
+    def handle(self, *args, **opts):
+        SnippetTerm.objects.all().delete()
+        TermStat.objects.all().delete()
+        FieldStat.objects.all().delete()
+        ensure_field_stats()
+
+        qs = QuerySnippet.objects.only("id", "title", "description", "sql_text", "tags").order_by("id")
+        done = 0
+        for s in qs.iterator(chunk_size=opts["chunk"]):
+            index_snippet(s, created=True)
+            done += 1
+            if done % opts["chunk"] == 0:
+                self.stdout.write(f"indexed {done}")
+        self.stdout.write(self.style.SUCCESS(f"Indexed {done} snippet(s)."))
@@ -0,0 +1,18 @@
+# vault/management/commands/rebuild_trending.py
+from django.core.management.base import BaseCommand
+
+from vault.trending import rebuild_trend_scores
+
+
+class Command(BaseCommand):
+    help = (
+        "trend_score-ийг өдрийн rollup + raw copy log-оос бүрэн дахин тооцно "
+        "(VAULT_TRENDING_HALF_LIFE_DAYS / VAULT_TRENDING_EPOCH солисны дараа)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--chunk", type=int, default=1000)
+
+    def handle(self, *args, **opts):
+        n = rebuild_trend_scores(chunk=opts["chunk"])
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt trend_score for {n} snippet(s)."))
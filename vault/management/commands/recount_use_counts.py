@@ -0,0 +1,34 @@
+# vault/management/commands/recount_use_counts.py
+from django.core.management.base import BaseCommand
+
+from vault.checkpoints import clear_checkpoint, get_checkpoint, set_checkpoint
+from vault.models import QuerySnippet
+from vault.rollups import recount_use_counts
+
+CHECKPOINT = "recount_use_counts:last_id"
+
+
+class Command(BaseCommand):
+    help = (
+        "QuerySnippet.use_count-ыг copy log (rollup + raw)-оос id chunk-аар дахин тооцно. "
+        "--resume нь өмнө тасарсан газраас (JobCheckpoint) үргэлжлүүлнэ."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--chunk", type=int, default=1000)
+        parser.add_argument("--resume", action="store_true")
+
+    def handle(self, *args, **opts):
+        start_after = int(get_checkpoint(CHECKPOINT, "0") or 0) if opts["resume"] else 0
+        total = QuerySnippet.objects.filter(pk__gt=start_after).count()
+        if start_after:
+            self.stdout.write(f"Resuming after id {start_after}")
+
+        def progress(last_id, scanned, updated):
+            set_checkpoint(CHECKPOINT, last_id)
+            pct = (100.0 * scanned / total) if total else 100.0
+            self.stdout.write(f"{scanned}/{total} ({pct:.0f}%) scanned, {updated} updated, last id {last_id}")
+
+        scanned, updated = recount_use_counts(chunk=opts["chunk"], start_after=start_after, on_chunk=progress)
+        clear_checkpoint(CHECKPOINT)
+        self.stdout.write(self.style.SUCCESS(f"Scanned {scanned} snippet(s), updated {updated}."))
@@ -0,0 +1,25 @@
+# vault/management/commands/refresh_related_snippets.py
+from django.core.management.base import BaseCommand
+
+from vault.related import process_new_logs, reset
+
+
+class Command(BaseCommand):
+    help = (
+        "Шинэ copy log-уудаас co-usage pair тоог нэмж, өөрчлөгдсөн snippet-үүдийн "
+        "\"related\" top-k-г шинэчилнэ (checkpoint-оос үргэлжилнэ)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--chunk", type=int, default=5000)
+        parser.add_argument("--rebuild", action="store_true", help="Бүх pair/related-ийг устгаад эхнээс нь")
+
+    def handle(self, *args, **opts):
+        if opts["rebuild"]:
+            reset()
+
+        def progress(last_id, processed, refreshed):
+            self.stdout.write(f"{processed} log(s) processed, {refreshed} snippet(s) refreshed, last id {last_id}")
+
+        processed, refreshed = process_new_logs(chunk=opts["chunk"], on_chunk=progress)
+        self.stdout.write(self.style.SUCCESS(f"Processed {processed} copy log(s); refreshed {refreshed} snippet(s)."))
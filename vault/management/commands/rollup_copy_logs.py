@@ -0,0 +1,36 @@
+# vault/management/commands/rollup_copy_logs.py
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from vault.rollups import finalized_through, prune_raw_logs, rollup_pending
+
+
+class Command(BaseCommand):
+    help = (
+        "SnippetCopyLog-ийг өдрөөр (snippet / user / db_type) нэгтгэнэ — idempotent, "
+        "checkpoint-оос үргэлжилнэ. --prune үед retention-оос хуучин raw мөрийг устгана."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--prune", action="store_true",
+                            help="VAULT_COPY_LOG_RETENTION_DAYS-ээс хуучин (rollup хийгдсэн) raw log-ийг устгана")
+        parser.add_argument("--retention-days", type=int, default=None)
+        parser.add_argument("--chunk", type=int, default=5000)
+
+    def handle(self, *args, **opts):
+        def report(day, n):
+            if n or opts["verbosity"] > 1:
+                self.stdout.write(f"{day}: {n} copy log(s)")
+
+        days = rollup_pending(on_day=report)
+        self.stdout.write(self.style.SUCCESS(f"Rolled up {days} day(s); finalized through {finalized_through()}."))
+
+        if opts["prune"]:
+            retention = opts["retention_days"]
+            if retention is None:
+                retention = getattr(settings, "VAULT_COPY_LOG_RETENTION_DAYS", None)
+            if not retention:
+                self.stdout.write("Retention not configured; nothing pruned.")
+                return
+            deleted = prune_raw_logs(retention, chunk=opts["chunk"])
+            self.stdout.write(self.style.SUCCESS(f"Pruned {deleted} raw copy log(s) older than {retention} day(s)."))
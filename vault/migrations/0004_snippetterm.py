@@ -0,0 +1,66 @@
+# Generated by Django 5.2.18 on 2026-10-16 22:39
+
+import re
+from collections import Counter
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+# vault.search_index-ийн хуулбар — migration нь app-ийн одоогийн кодоос хамаарахгүй
+SEARCH_FIELDS = ("title", "description", "sql_text", "tags")
+TOKEN_RE = re.compile(r"[0-9A-Za-z_А-Яа-яӨөҮүЁё]+")
+MIN_TOKEN_LEN = 3
+MAX_TERM_LEN = 64
+
+
+def tokenize(text):
+    tokens = TOKEN_RE.findall((text or "").lower())
+    return [t[:MAX_TERM_LEN] for t in tokens if len(t) >= MIN_TOKEN_LEN]
+
+
+def snippet_postings(title="", description="", sql_text="", tags=""):
+    values = {"title": title, "description": description, "sql_text": sql_text, "tags": tags}
+    rows = []
+    for field in SEARCH_FIELDS:
+        for term, tf in Counter(tokenize(values[field])).items():
+            rows.append((field, term, tf))
+    return rows
+
+
+def backfill_terms(apps, schema_editor):
+    QuerySnippet = apps.get_model("vault", "QuerySnippet")
+    SnippetTerm = apps.get_model("vault", "SnippetTerm")
+    batch = []
+    for s in QuerySnippet.objects.only("id", "title", "description", "sql_text", "tags").iterator(chunk_size=500):
+        for field, term, tf in snippet_postings(s.title, s.description, s.sql_text, s.tags):
+            batch.append(SnippetTerm(snippet_id=s.id, field=field, term=term, tf=tf))
+        if len(batch) >= 5000:
+            SnippetTerm.objects.bulk_create(batch)
+            batch = []
+    if batch:
+        SnippetTerm.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('vault', '0003_userdbaccess_alter_querysnippet_options_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SnippetTerm',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('term', models.CharField(max_length=64)),
+                ('field', models.CharField(choices=[('title', 'title'), ('description', 'description'), ('sql_text', 'sql_text'), ('tags', 'tags')], max_length=16)),
+                ('tf', models.PositiveIntegerField(default=1)),
+                ('snippet', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='terms', to='vault.querysnippet')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['term', 'snippet'], name='vault_snipp_term_c9999c_idx')],
+                'unique_together': {('snippet', 'field', 'term')},
+            },
+        ),
+        migrations.RunPython(backfill_terms, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,38 @@
+from django.db import migrations
+
+# MATCH(...) AGAINST(...)-ийн баганын жагсаалт бүрт тохирох FULLTEXT индекс хэрэгтэй.
+FULLTEXT_INDEXES = {
+    "vault_qs_ft_all": ("title", "description", "sql_text", "tags"),
+    "vault_qs_ft_title": ("title",),
+    "vault_qs_ft_description": ("description",),
+    "vault_qs_ft_sql_text": ("sql_text",),
+    "vault_qs_ft_tags": ("tags",),
+}
+
+
+def add_fulltext_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != "mysql":
+        return
+    table = schema_editor.quote_name("vault_querysnippet")
+    for name, cols in FULLTEXT_INDEXES.items():
+        col_sql = ", ".join(schema_editor.quote_name(c) for c in cols)
+        schema_editor.execute(f"ALTER TABLE {table} ADD FULLTEXT INDEX {schema_editor.quote_name(name)} ({col_sql})")
+
+
+def drop_fulltext_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != "mysql":
+        return
+    table = schema_editor.quote_name("vault_querysnippet")
+    for name in FULLTEXT_INDEXES:
+        schema_editor.execute(f"ALTER TABLE {table} DROP INDEX {schema_editor.quote_name(name)}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('vault', '0004_snippetterm'),
+    ]
+
+    operations = [
+        migrations.RunPython(add_fulltext_indexes, drop_fulltext_indexes),
+    ]
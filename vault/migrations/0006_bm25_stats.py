@@ -0,0 +1,91 @@
+# Generated by Django 5.2.18 on 2026-10-16 22:43
+
+import re
+from collections import Counter
+
+from django.db import migrations, models
+
+# vault.search_index-ийн хуулбар — migration нь app-ийн одоогийн кодоос хамаарахгүй
+SEARCH_FIELDS = ("title", "description", "sql_text", "tags")
+TOKEN_RE = re.compile(r"[0-9A-Za-z_А-Яа-яӨөҮүЁё]+")
+MIN_TOKEN_LEN = 3
+MAX_TERM_LEN = 64
+
+
+def tokenize(text):
+    tokens = TOKEN_RE.findall((text or "").lower())
+    return [t[:MAX_TERM_LEN] for t in tokens if len(t) >= MIN_TOKEN_LEN]
+
+
+def snippet_postings(title="", description="", sql_text="", tags=""):
+    values = {"title": title, "description": description, "sql_text": sql_text, "tags": tags}
+    rows = []
+    for field in SEARCH_FIELDS:
+        for term, tf in Counter(tokenize(values[field])).items():
+            rows.append((field, term, tf))
+    return rows
+
+
+def field_lengths(rows):
+    lens = Counter()
+    for field, _term, tf in rows:
+        lens[field] += tf
+    return lens
+
+
+def backfill_stats(apps, schema_editor):
+    QuerySnippet = apps.get_model("vault", "QuerySnippet")
+    SnippetTerm = apps.get_model("vault", "SnippetTerm")
+    TermStat = apps.get_model("vault", "TermStat")
+    FieldStat = apps.get_model("vault", "FieldStat")
+
+    SnippetTerm.objects.all().delete()
+    df, totals, docs, batch = Counter(), Counter(), 0, []
+    for s in QuerySnippet.objects.only("id", "title", "description", "sql_text", "tags").iterator(chunk_size=500):
+        rows = snippet_postings(s.title, s.description, s.sql_text, s.tags)
+        lens = field_lengths(rows)
+        batch.extend(SnippetTerm(snippet_id=s.id, field=f, term=t, tf=tf, field_len=lens[f]) for f, t, tf in rows)
+        df.update({t for _f, t, _tf in rows})
+        totals.update(lens)
+        docs += 1
+        if len(batch) >= 5000:
+            SnippetTerm.objects.bulk_create(batch)
+            batch = []
+    if batch:
+        SnippetTerm.objects.bulk_create(batch)
+
+    TermStat.objects.bulk_create([TermStat(term=t, df=n) for t, n in df.items()], batch_size=2000)
+    FieldStat.objects.bulk_create([FieldStat(field=f, total_len=totals[f], docs=docs) for f in SEARCH_FIELDS])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('vault', '0005_querysnippet_fulltext'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FieldStat',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('field', models.CharField(choices=[('title', 'title'), ('description', 'description'), ('sql_text', 'sql_text'), ('tags', 'tags')], max_length=16, unique=True)),
+                ('total_len', models.BigIntegerField(default=0)),
+                ('docs', models.IntegerField(default=0)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='TermStat',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('term', models.CharField(max_length=64, unique=True)),
+                ('df', models.IntegerField(default=0)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='snippetterm',
+            name='field_len',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_stats, migrations.RunPython.noop),
+    ]
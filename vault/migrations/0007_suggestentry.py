@@ -0,0 +1,77 @@
+# Generated by Django 5.2.18 on 2026-10-16 22:44
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def parse_tags(tags):
+    # vault.models.parse_tags-ийн хуулбар (Tag.NAME_MAX_LEN = 100)
+    names = []
+    for t in (tags or "").split(","):
+        name = t.strip().casefold()[:100]
+        if name and name not in names:
+            names.append(name)
+    return names
+
+
+# vault.suggest-ийн хуулбар — migration нь app-ийн одоогийн кодоос хамаарахгүй
+KEY_MAX_LEN = 200
+MAX_TITLE_POSITIONS = 10
+
+
+def normalize(text):
+    return " ".join((text or "").lower().split())[:KEY_MAX_LEN]
+
+
+def suggestion_rows(title, tags):
+    rows = []
+    words = normalize(title).split(" ")
+    seen = set()
+    for i in range(min(len(words), MAX_TITLE_POSITIONS)):
+        key = " ".join(words[i:])[:KEY_MAX_LEN]
+        if key and key not in seen:
+            seen.add(key)
+            rows.append(("title", key, (title or "")[:KEY_MAX_LEN]))
+    for tag in parse_tags(tags):
+        key = normalize(tag)
+        if key and key not in seen:
+            seen.add(key)
+            rows.append(("tag", key, key))
+    return rows
+
+
+def backfill_suggestions(apps, schema_editor):
+    QuerySnippet = apps.get_model("vault", "QuerySnippet")
+    SuggestEntry = apps.get_model("vault", "SuggestEntry")
+    batch = []
+    for s in QuerySnippet.objects.only("id", "title", "tags").iterator(chunk_size=500):
+        batch.extend(SuggestEntry(snippet_id=s.id, kind=k, key=key, label=label) for k, key, label in suggestion_rows(s.title, s.tags))
+        if len(batch) >= 5000:
+            SuggestEntry.objects.bulk_create(batch)
+            batch = []
+    if batch:
+        SuggestEntry.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('vault', '0006_bm25_stats'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SuggestEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(max_length=200)),
+                ('kind', models.CharField(choices=[('title', 'Title'), ('tag', 'Tag')], max_length=8)),
+                ('label', models.CharField(max_length=200)),
+                ('snippet', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='suggest_entries', to='vault.querysnippet')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['kind', 'key'], name='vault_sugge_kind_860765_idx')],
+            },
+        ),
+        migrations.RunPython(backfill_suggestions, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,53 @@
+# Generated by Django 5.2.18 on 2026-10-16 22:45
+
+from django.db import migrations, models
+
+
+def parse_tags(tags):
+    # vault.models.parse_tags-ийн хуулбар (Tag.NAME_MAX_LEN = 100)
+    names = []
+    for t in (tags or "").split(","):
+        name = t.strip().casefold()[:100]
+        if name and name not in names:
+            names.append(name)
+    return names
+
+
+def backfill_tags(apps, schema_editor):
+    QuerySnippet = apps.get_model("vault", "QuerySnippet")
+    Tag = apps.get_model("vault", "Tag")
+    SnippetTag = QuerySnippet.tag_set.through
+
+    pairs = []
+    for s in QuerySnippet.objects.only("id", "tags").iterator(chunk_size=1000):
+        pairs.extend((s.id, name) for name in parse_tags(s.tags))
+    names = sorted({name for _id, name in pairs})
+    Tag.objects.bulk_create([Tag(name=n) for n in names], ignore_conflicts=True, batch_size=1000)
+    tag_ids = dict(Tag.objects.values_list("name", "id"))
+    SnippetTag.objects.bulk_create(
+        [SnippetTag(querysnippet_id=sid, tag_id=tag_ids[name]) for sid, name in pairs],
+        ignore_conflicts=True, batch_size=2000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('vault', '0007_suggestentry'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Tag',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100, unique=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='querysnippet',
+            name='tag_set',
+            field=models.ManyToManyField(blank=True, related_name='snippets', to='vault.tag'),
+        ),
+        migrations.RunPython(backfill_tags, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.18 on 2026-10-16 22:47
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('vault', '0008_tag'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='querysnippet',
+            index=models.Index(fields=['updated_at', 'id'], name='vault_qs_updated_id_idx'),
+        ),
+    ]
@@ -0,0 +1,157 @@
+# Generated by Django 5.2.18 on 2026-10-16 22:49
+
+import hashlib
+import re
+import struct
+
+import django.db.models.deletion
+from django.db import migrations, models
+from sqlglot import errors, exp, parse
+
+# vault.sql_validation / vault.dedupe-ийн хуулбар — migration нь app-ийн одоогийн кодоос хамаарахгүй
+DIALECT_MAP = {
+    "postgres": "postgres",
+    "mysql": "mysql",
+    "sqlite": "sqlite",
+    "mssql": "tsql",
+    "clickhouse": "clickhouse",
+    "other": "mysql",
+}
+
+
+def strip_comments(sql):
+    s = sql or ""
+    s = re.sub(r"/\*.*?(?:\*/|\Z)", " ", s, flags=re.S)
+    s = re.sub(r"--.*?$", " ", s, flags=re.M)
+    return s.strip()
+
+
+def canonicalize(tree, placeholders, column_aliases):
+    table_map, column_map = {}, {}
+    for node in tree.find_all(exp.TableAlias):
+        if node.name and node.name.lower() not in table_map:
+            table_map[node.name.lower()] = f"t{len(table_map) + 1}"
+    if column_aliases:
+        for node in tree.find_all(exp.Alias):
+            if node.alias and node.alias.lower() not in column_map:
+                column_map[node.alias.lower()] = f"c{len(column_map) + 1}"
+
+    def rename(node):
+        if placeholders and isinstance(node, exp.Literal):
+            return exp.Placeholder()
+        if isinstance(node, exp.TableAlias) and node.name.lower() in table_map:
+            node.set("this", exp.to_identifier(table_map[node.name.lower()]))
+        elif isinstance(node, exp.Alias) and node.alias.lower() in column_map:
+            node.set("alias", exp.to_identifier(column_map[node.alias.lower()]))
+        elif isinstance(node, exp.Column):
+            if node.table and node.table.lower() in table_map:
+                node.set("table", exp.to_identifier(table_map[node.table.lower()]))
+            elif not node.table and node.name.lower() in column_map:
+                node.set("this", exp.to_identifier(column_map[node.name.lower()]))
+        return node
+
+    return tree.transform(rename)
+
+
+def canonical_sql(sql_text, db_type, placeholders, column_aliases):
+    dialect = DIALECT_MAP.get(db_type or "other", "mysql")
+    text = strip_comments(sql_text)
+    try:
+        trees = [t for t in parse(text, read=dialect) if t is not None]
+        return ";\n".join(
+            canonicalize(t, placeholders, column_aliases).sql(dialect=dialect, normalize=True, comments=False)
+            for t in trees
+        )
+    except (errors.ParseError, errors.TokenError):
+        if placeholders:
+            text = re.sub(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b", "?", text)
+        return " ".join(text.lower().split())
+
+
+NUM_PERM = 64
+BANDS = 16
+ROWS = NUM_PERM // BANDS
+SHINGLE_SIZE = 3
+SIGNATURE_MAX_CHARS = 20_000
+_PRIME = (1 << 61) - 1
+_MASK = (1 << 64) - 1
+TOKEN_RE = re.compile(r"\w+|[^\w\s]")
+
+
+def _perm_coeffs():
+    coeffs = []
+    for i in range(NUM_PERM):
+        d = hashlib.blake2b(f"vault-minhash-{i}".encode(), digest_size=16).digest()
+        a, b = struct.unpack("<QQ", d)
+        coeffs.append(((a % (_PRIME - 1)) + 1, b % _PRIME))
+    return coeffs
+
+
+def sql_signature(sql_text, db_type):
+    canonical = canonical_sql(sql_text, db_type, placeholders=True, column_aliases=True)[:SIGNATURE_MAX_CHARS]
+    tokens = TOKEN_RE.findall(canonical.lower())
+    if len(tokens) < SHINGLE_SIZE:
+        shingles = {" ".join(tokens)} if tokens else set()
+    else:
+        shingles = {" ".join(tokens[i:i + SHINGLE_SIZE]) for i in range(len(tokens) - SHINGLE_SIZE + 1)}
+    hashes = [
+        int.from_bytes(hashlib.blake2b(s.encode("utf-8"), digest_size=8).digest(), "little")
+        for s in shingles
+    ] or [0]
+    return [min(((a * h + b) % _PRIME) & _MASK for h in hashes) for a, b in _perm_coeffs()]
+
+
+def band_hashes(signature):
+    out = []
+    for band in range(BANDS):
+        chunk = struct.pack(f"<{ROWS}Q", *signature[band * ROWS:(band + 1) * ROWS])
+        out.append(int.from_bytes(hashlib.blake2b(chunk, digest_size=8).digest(), "little", signed=True) >> 1)
+    return out
+
+
+def pack_signature(signature):
+    return struct.pack(f"<{NUM_PERM}Q", *signature)
+
+
+def backfill_minhash(apps, schema_editor):
+    QuerySnippet = apps.get_model("vault", "QuerySnippet")
+    SnippetMinHash = apps.get_model("vault", "SnippetMinHash")
+    SnippetLSHBucket = apps.get_model("vault", "SnippetLSHBucket")
+
+    sigs, buckets = [], []
+    for s in QuerySnippet.objects.only("id", "sql_text", "db_type").iterator(chunk_size=1000):
+        sig = sql_signature(s.sql_text, s.db_type)
+        sigs.append(SnippetMinHash(snippet_id=s.id, signature=pack_signature(sig)))
+        buckets.extend(SnippetLSHBucket(snippet_id=s.id, band=i, bucket=h) for i, h in enumerate(band_hashes(sig)))
+    SnippetMinHash.objects.bulk_create(sigs, batch_size=1000)
+    SnippetLSHBucket.objects.bulk_create(buckets, batch_size=2000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('vault', '0009_querysnippet_keyset_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SnippetMinHash',
+            fields=[
+                ('snippet', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='minhash', serialize=False, to='vault.querysnippet')),
+                ('signature', models.BinaryField()),
+            ],
+        ),
+        migrations.CreateModel(
+            name='SnippetLSHBucket',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('band', models.PositiveSmallIntegerField()),
+                ('bucket', models.BigIntegerField()),
+                ('snippet', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='lsh_buckets', to='vault.querysnippet')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['band', 'bucket'], name='vault_snipp_band_d90112_idx')],
+            },
+        ),
+        migrations.RunPython(backfill_minhash, migrations.RunPython.noop),
+    ]
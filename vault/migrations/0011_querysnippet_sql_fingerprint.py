@@ -0,0 +1,100 @@
+# Generated by Django 5.2.18 on 2026-10-16 22:50
+
+import hashlib
+import re
+
+from django.db import migrations, models
+from sqlglot import errors, exp, parse
+
+# vault.sql_validation / vault.dedupe-ийн хуулбар — migration нь app-ийн одоогийн кодоос хамаарахгүй
+DIALECT_MAP = {
+    "postgres": "postgres",
+    "mysql": "mysql",
+    "sqlite": "sqlite",
+    "mssql": "tsql",
+    "clickhouse": "clickhouse",
+    "other": "mysql",
+}
+
+
+def strip_comments(sql):
+    s = sql or ""
+    s = re.sub(r"/\*.*?(?:\*/|\Z)", " ", s, flags=re.S)
+    s = re.sub(r"--.*?$", " ", s, flags=re.M)
+    return s.strip()
+
+
+def canonicalize(tree, placeholders, column_aliases):
+    table_map, column_map = {}, {}
+    for node in tree.find_all(exp.TableAlias):
+        if node.name and node.name.lower() not in table_map:
+            table_map[node.name.lower()] = f"t{len(table_map) + 1}"
+    if column_aliases:
+        for node in tree.find_all(exp.Alias):
+            if node.alias and node.alias.lower() not in column_map:
+                column_map[node.alias.lower()] = f"c{len(column_map) + 1}"
+
+    def rename(node):
+        if placeholders and isinstance(node, exp.Literal):
+            return exp.Placeholder()
+        if isinstance(node, exp.TableAlias) and node.name.lower() in table_map:
+            node.set("this", exp.to_identifier(table_map[node.name.lower()]))
+        elif isinstance(node, exp.Alias) and node.alias.lower() in column_map:
+            node.set("alias", exp.to_identifier(column_map[node.alias.lower()]))
+        elif isinstance(node, exp.Column):
+            if node.table and node.table.lower() in table_map:
+                node.set("table", exp.to_identifier(table_map[node.table.lower()]))
+            elif not node.table and node.name.lower() in column_map:
+                node.set("this", exp.to_identifier(column_map[node.name.lower()]))
+        return node
+
+    return tree.transform(rename)
+
+
+def canonical_sql(sql_text, db_type, placeholders, column_aliases):
+    dialect = DIALECT_MAP.get(db_type or "other", "mysql")
+    text = strip_comments(sql_text)
+    try:
+        trees = [t for t in parse(text, read=dialect) if t is not None]
+        return ";\n".join(
+            canonicalize(t, placeholders, column_aliases).sql(dialect=dialect, normalize=True, comments=False)
+            for t in trees
+        )
+    except (errors.ParseError, errors.TokenError):
+        if placeholders:
+            text = re.sub(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b", "?", text)
+        return " ".join(text.lower().split())
+
+
+def sql_fingerprint(sql_text, db_type):
+    canonical = canonical_sql(sql_text, db_type, placeholders=False, column_aliases=False)
+    return hashlib.sha256(f"{db_type}\n{canonical}".encode("utf-8")).hexdigest()
+
+
+def backfill_fingerprints(apps, schema_editor):
+    QuerySnippet = apps.get_model("vault", "QuerySnippet")
+    batch = []
+    for s in QuerySnippet.objects.only("id", "sql_text", "db_type").iterator(chunk_size=1000):
+        s.sql_fingerprint = sql_fingerprint(s.sql_text, s.db_type)
+        batch.append(s)
+        if len(batch) >= 1000:
+            QuerySnippet.objects.bulk_update(batch, ["sql_fingerprint"])
+            batch = []
+    if batch:
+        QuerySnippet.objects.bulk_update(batch, ["sql_fingerprint"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('vault', '0010_snippet_minhash'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='querysnippet',
+            name='sql_fingerprint',
+            field=models.CharField(blank=True, db_index=True, editable=False, max_length=64),
+        ),
+        migrations.RunPython(backfill_fingerprints, migrations.RunPython.noop),
+    ]
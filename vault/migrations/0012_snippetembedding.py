@@ -0,0 +1,70 @@
+# Generated by Django 5.2.18 on 2026-10-16 22:52
+
+import math
+import re
+import zlib
+from collections import Counter
+
+import django.db.models.deletion
+import numpy as np
+from django.db import migrations, models
+
+# vault.similarity / vault.search_index.tokenize-ийн хуулбар — migration нь app-ийн одоогийн кодоос хамаарахгүй
+VECTOR_DIM = 256
+NGRAM = 3
+FIELD_WEIGHTS = {"title": 2.0, "description": 1.0, "tags": 1.5, "sql_text": 0.5}
+TOKEN_RE = re.compile(r"[0-9A-Za-z_А-Яа-яӨөҮүЁё]+")
+
+
+def tokenize(text):
+    return [t[:64] for t in TOKEN_RE.findall((text or "").lower()) if len(t) >= 3]
+
+
+def embed_snippet(title="", description="", sql_text="", tags=""):
+    counts = Counter()
+    for field, text in (("title", title), ("description", description), ("sql_text", sql_text), ("tags", tags)):
+        weight = FIELD_WEIGHTS[field]
+        for tok in tokenize(text or ""):
+            counts[tok] += weight
+            padded = f"<{tok}>"
+            for i in range(len(padded) - NGRAM + 1):
+                counts["#" + padded[i:i + NGRAM]] += weight * 0.5
+    vec = np.zeros(VECTOR_DIM, dtype=np.float32)
+    for feat, w in counts.items():
+        h = zlib.crc32(feat.encode("utf-8"))
+        sign = 1.0 if h & 0x80000000 else -1.0
+        vec[h % VECTOR_DIM] += sign * (1.0 + math.log(w)) if w >= 1 else sign * w
+    norm = float(np.linalg.norm(vec))
+    return vec / norm if norm else vec
+
+
+def backfill_embeddings(apps, schema_editor):
+    QuerySnippet = apps.get_model("vault", "QuerySnippet")
+    SnippetEmbedding = apps.get_model("vault", "SnippetEmbedding")
+    batch = []
+    for s in QuerySnippet.objects.only("id", "title", "description", "sql_text", "tags").iterator(chunk_size=1000):
+        vec = embed_snippet(s.title, s.description, s.sql_text, s.tags)
+        batch.append(SnippetEmbedding(snippet_id=s.id, vector=vec.tobytes()))
+        if len(batch) >= 1000:
+            SnippetEmbedding.objects.bulk_create(batch)
+            batch = []
+    SnippetEmbedding.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('vault', '0011_querysnippet_sql_fingerprint'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SnippetEmbedding',
+            fields=[
+                ('snippet', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='embedding', serialize=False, to='vault.querysnippet')),
+                ('vector', models.BinaryField()),
+                ('updated_at', models.DateTimeField(auto_now=True, db_index=True)),
+            ],
+        ),
+        migrations.RunPython(backfill_embeddings, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-16 22:54
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('vault', '0012_snippetembedding'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='snippetcopylog',
+            name='copied_at',
+            field=models.DateTimeField(default=django.utils.timezone.now, editable=False),
+        ),
+    ]
@@ -0,0 +1,97 @@
+# Generated by Django 5.2.18 on 2026-10-16 22:54
+
+import hashlib
+import zlib
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+# vault.snapshots-ийн хуулбар — migration нь app-ийн одоогийн кодоос хамаарахгүй
+def snapshot_hash(text):
+    return hashlib.sha256((text or "").encode("utf-8")).hexdigest()
+
+
+def encode_snapshot(text):
+    # VAULT_SNAPSHOT_COMPRESS=False (анхдагч) үеийн утга — шахалтгүй; шинэ мөрийг runtime шахна
+    text = text or ""
+    return text, None, len(text.encode("utf-8"))
+
+
+def decode_snapshot(sql_text, data):
+    if data:
+        return zlib.decompress(bytes(data)).decode("utf-8")
+    return sql_text or ""
+
+
+def snapshot_ids(texts, model):
+    by_hash = {snapshot_hash(t): t for t in texts}
+    if not by_hash:
+        return {}
+    found = dict(model.objects.filter(sha256__in=by_hash).values_list("sha256", "id"))
+    missing = [h for h in by_hash if h not in found]
+    if missing:
+        rows = []
+        for h in missing:
+            sql_text, data, size = encode_snapshot(by_hash[h])
+            rows.append(model(sha256=h, sql_text=sql_text, data=data, size=size))
+        model.objects.bulk_create(rows, ignore_conflicts=True, batch_size=500)
+        found.update(model.objects.filter(sha256__in=missing).values_list("sha256", "id"))
+    return found
+
+
+def dedupe_snapshots(apps, schema_editor):
+    """Одоо байгаа sql_snapshot-уудыг hash-аар нэгтгэж SQLSnapshot руу шилжүүлнэ."""
+    SnippetCopyLog = apps.get_model("vault", "SnippetCopyLog")
+    SQLSnapshot = apps.get_model("vault", "SQLSnapshot")
+    qs = SnippetCopyLog.objects.only("id", "sql_snapshot").order_by("id")
+    last_id = 0
+    while True:
+        logs = list(qs.filter(id__gt=last_id)[:2000])
+        if not logs:
+            break
+        ids = snapshot_ids({log.sql_snapshot for log in logs}, model=SQLSnapshot)
+        for log in logs:
+            log.snapshot_id = ids[snapshot_hash(log.sql_snapshot)]
+        SnippetCopyLog.objects.bulk_update(logs, ["snapshot"])
+        last_id = logs[-1].id
+
+
+def restore_snapshots(apps, schema_editor):
+    SnippetCopyLog = apps.get_model("vault", "SnippetCopyLog")
+    SQLSnapshot = apps.get_model("vault", "SQLSnapshot")
+    for snap in SQLSnapshot.objects.iterator(chunk_size=500):
+        SnippetCopyLog.objects.filter(snapshot_id=snap.id).update(
+            sql_snapshot=decode_snapshot(snap.sql_text, snap.data)
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('vault', '0013_snippetcopylog_copied_at_default'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SQLSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('sha256', models.CharField(max_length=64, unique=True)),
+                ('sql_text', models.TextField(blank=True)),
+                ('data', models.BinaryField(blank=True, null=True)),
+                ('size', models.PositiveIntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='snippetcopylog',
+            name='snapshot',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='copy_logs', to='vault.sqlsnapshot'),
+        ),
+        migrations.RunPython(dedupe_snapshots, restore_snapshots),
+        migrations.RemoveField(
+            model_name='snippetcopylog',
+            name='sql_snapshot',
+        ),
+    ]
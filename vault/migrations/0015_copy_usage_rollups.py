@@ -0,0 +1,62 @@
+# Generated by Django 5.2.18 on 2026-10-16 22:56
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('vault', '0014_sqlsnapshot'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='JobCheckpoint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100, unique=True)),
+                ('value', models.CharField(blank=True, max_length=200)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='DBTypeDailyUsage',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('db_type', models.CharField(choices=[('postgres', 'PostgreSQL'), ('mysql', 'MySQL/MariaDB'), ('sqlite', 'SQLite'), ('mssql', 'SQL Server'), ('clickhouse', 'ClickHouse'), ('other', 'Other')], max_length=20)),
+                ('copies', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'unique_together': {('day', 'db_type')},
+            },
+        ),
+        migrations.CreateModel(
+            name='SnippetDailyUsage',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('copies', models.PositiveIntegerField(default=0)),
+                ('snippet', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_usage', to='vault.querysnippet')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['snippet', 'day'], name='vault_snipp_snippet_0c079b_idx')],
+                'unique_together': {('day', 'snippet')},
+            },
+        ),
+        migrations.CreateModel(
+            name='UserDailyUsage',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField(db_index=True)),
+                ('copies', models.PositiveIntegerField(default=0)),
+                ('user', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='daily_usage', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['user', 'day'], name='vault_userd_user_id_870430_idx')],
+            },
+        ),
+    ]
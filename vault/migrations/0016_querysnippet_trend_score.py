@@ -0,0 +1,51 @@
+# Generated by Django 5.2.18 on 2026-10-16 22:58
+
+import datetime
+import math
+from collections import defaultdict
+
+from django.db import migrations, models
+
+
+def backfill_trend_scores(apps, schema_editor):
+    # Raw log-оос; prune хийгдсэн (rollup-д л үлдсэн) түүхийг `rebuild_trending` нэмж тооцно.
+    # vault.trending.trending_scores-ийн хуулбар (migration app кодоос хамаарахгүй).
+    # Анхдагч тохиргоо (half-life 7 хоног, epoch 2000-01-01); өөрчилсөн бол `rebuild_trending`.
+    QuerySnippet = apps.get_model("vault", "QuerySnippet")
+    SnippetCopyLog = apps.get_model("vault", "SnippetCopyLog")
+    rate = math.log(2) / (7 * 86400)
+    epoch = datetime.datetime(2000, 1, 1, tzinfo=datetime.timezone.utc)
+    grouped = defaultdict(list)
+    for pk, t in SnippetCopyLog.objects.values_list("snippet_id", "copied_at").iterator(chunk_size=5000):
+        grouped[pk].append(rate * max((t - epoch).total_seconds(), 1.0))
+    scores = {}
+    for pk, weights in grouped.items():
+        top = max(weights)
+        scores[pk] = top + math.log(sum(math.exp(w - top) for w in weights))
+    batch = [QuerySnippet(pk=pk, trend_score=score) for pk, score in scores.items()]
+    QuerySnippet.objects.bulk_update(batch, ["trend_score"], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('vault', '0015_copy_usage_rollups'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='querysnippet',
+            name='trend_score',
+            field=models.FloatField(default=0.0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='querysnippet',
+            name='trend_updated_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='querysnippet',
+            index=models.Index(fields=['trend_score', 'id'], name='vault_qs_trend_id_idx'),
+        ),
+        migrations.RunPython(backfill_trend_scores, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 5.2.18 on 2026-10-16 22:59
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('vault', '0016_querysnippet_trend_score'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RelatedSnippet',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('score', models.FloatField(default=0.0)),
+                ('related', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='vault.querysnippet')),
+                ('snippet', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='related_entries', to='vault.querysnippet')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['snippet', '-score'], name='vault_relat_snippet_22c9d4_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='SnippetPairCount',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('count', models.PositiveIntegerField(default=0)),
+                ('snippet_a', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='vault.querysnippet')),
+                ('snippet_b', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='vault.querysnippet')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['snippet_b', 'snippet_a'], name='vault_snipp_snippet_682590_idx')],
+                'unique_together': {('snippet_a', 'snippet_b')},
+            },
+        ),
+    ]
@@ -0,0 +1,58 @@
+# Generated by Django 5.2.18 on 2026-10-16 23:40
+
+import datetime
+import math
+from collections import defaultdict
+
+from django.db import migrations
+from django.utils import timezone
+
+
+def rescore_trend_scores(apps, schema_editor):
+    # VAULT_TRENDING_EPOCH 2000-01-01 болсон: хуучин epoch-оос өмнөх copy сөрөг/0 оноо өгч байсан.
+    # vault.trending.rebuild_trend_scores-ийн хуулбар (migration app кодоос хамаарахгүй).
+    QuerySnippet = apps.get_model("vault", "QuerySnippet")
+    SnippetCopyLog = apps.get_model("vault", "SnippetCopyLog")
+    SnippetDailyUsage = apps.get_model("vault", "SnippetDailyUsage")
+    JobCheckpoint = apps.get_model("vault", "JobCheckpoint")
+
+    # Анхдагч тохиргоо (half-life 7 хоног, epoch 2000-01-01); өөрчилсөн бол `rebuild_trending`.
+    rate = math.log(2) / (7 * 86400)
+    epoch = datetime.datetime(2000, 1, 1, tzinfo=datetime.timezone.utc)
+
+    def log_weight(t):
+        return rate * max((t - epoch).total_seconds(), 1.0)
+
+    grouped = defaultdict(list)
+    value = JobCheckpoint.objects.filter(name="copy_rollup:finalized_through").values_list("value", flat=True).first()
+    through = datetime.date.fromisoformat(value) if value else None
+    live = SnippetCopyLog.objects.all()
+    if through is not None:
+        rolled = SnippetDailyUsage.objects.filter(day__lte=through, copies__gt=0)
+        for pk, day, copies in rolled.values_list("snippet_id", "day", "copies").iterator(chunk_size=5000):
+            start = timezone.make_aware(datetime.datetime.combine(day, datetime.time.min))
+            end = timezone.make_aware(datetime.datetime.combine(day + datetime.timedelta(days=1), datetime.time.min))
+            grouped[pk].append(log_weight(start + (end - start) / 2) + math.log(copies))
+        next_day = timezone.make_aware(datetime.datetime.combine(through + datetime.timedelta(days=1), datetime.time.min))
+        live = live.filter(copied_at__gte=next_day)
+    for pk, t in live.values_list("snippet_id", "copied_at").iterator(chunk_size=5000):
+        grouped[pk].append(log_weight(t))
+
+    scores = {}
+    for pk, weights in grouped.items():
+        top = max(weights)
+        scores[pk] = top + math.log(sum(math.exp(w - top) for w in weights))
+    QuerySnippet.objects.exclude(pk__in=list(scores)).exclude(trend_score=0).update(trend_score=0.0)
+    batch = [QuerySnippet(pk=pk, trend_score=score) for pk, score in scores.items()]
+    QuerySnippet.objects.bulk_update(batch, ["trend_score"], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('vault', '0017_related_snippets'),
+    ]
+
+    operations = [
+        migrations.RunPython(rescore_trend_scores, migrations.RunPython.noop),
+    ]
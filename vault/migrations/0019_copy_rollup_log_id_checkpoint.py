@@ -0,0 +1,25 @@
+# Generated by Django 5.2.18 on 2026-10-17 00:10
+
+from django.db import migrations
+
+
+def seed_log_id_checkpoint(apps, schema_editor):
+    # Өмнө нь эцэслэгдсэн өдрүүд одоо байгаа бүх log-ийг агуулсан гэж үзнэ
+    # (vault.rollups.LOG_ID_CHECKPOINT) — эс бөгөөс хуучин log-ууд хоцорсон гэж дахин нэмэгдэнэ.
+    JobCheckpoint = apps.get_model("vault", "JobCheckpoint")
+    SnippetCopyLog = apps.get_model("vault", "SnippetCopyLog")
+    if not JobCheckpoint.objects.filter(name="copy_rollup:finalized_through").exists():
+        return
+    last_id = SnippetCopyLog.objects.order_by("-id").values_list("id", flat=True).first() or 0
+    JobCheckpoint.objects.get_or_create(name="copy_rollup:last_log_id", defaults={"value": str(last_id)})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('vault', '0018_rescore_trend_epoch'),
+    ]
+
+    operations = [
+        migrations.RunPython(seed_log_id_checkpoint, migrations.RunPython.noop),
+    ]
@@ -1,8 +1,34 @@
 # vault/models.py
 from django.contrib.auth import get_user_model
 from django.db import models
+from django.utils import timezone
 from django.contrib.auth.models import User
 
+# classify_sql_kind / _strip_comments — хуучин import-уудад (models.classify_sql_kind)
+from .sql_validation import _strip_comments, analyze_sql, classify_sql_kind  # noqa: F401
+
+SEARCH_FIELDS = ("title", "description", "sql_text", "tags")
+
+
+def parse_tags(tags: str):
+    """Comma-separated tags → case-fold хийсэн, давхардалгүй нэрс (дараалал хадгална)."""
+    names = []
+    for t in (tags or "").split(","):
+        name = t.strip().casefold()[:Tag.NAME_MAX_LEN]
+        if name and name not in names:
+            names.append(name)
+    return names
+
+
+class Tag(models.Model):
+    NAME_MAX_LEN = 100
+
+    name = models.CharField(max_length=NAME_MAX_LEN, unique=True)  # case-fold хийсэн
+
+    def __str__(self):
+        return self.name
+
+
 class QuerySnippet(models.Model):
     DB_CHOICES = [
         ('postgres', 'PostgreSQL'),
@@ -23,6 +49,7 @@ class QuerySnippet(models.Model):
     sql_text = models.TextField()
     db_type = models.CharField(max_length=20, choices=DB_CHOICES, default='mysql')
     tags = models.CharField(max_length=200, blank=True)
+    tag_set = models.ManyToManyField(Tag, blank=True, related_name="snippets")
     use_count = models.IntegerField(default=0)
     created_by = models.ForeignKey(User, null=True, blank=True, on_delete=models.SET_NULL)
     created_at = models.DateTimeField(auto_now_add=True)
@@ -30,40 +57,152 @@ class QuerySnippet(models.Model):
 
     sql_kind = models.CharField(max_length=16, choices=SQL_KIND_CHOICES,
                                 default='select', db_index=True)
+    # dedupe.sql_fingerprint — canonical AST-ийн sha256 (яг ижил query хайх, import upsert)
+    sql_fingerprint = models.CharField(max_length=64, blank=True, db_index=True, editable=False)
+    # trending.py — forward-decay оноо (ln Σ exp(λ·(t − epoch)); 0 = copy байхгүй)
+    trend_score = models.FloatField(default=0.0, editable=False)
+    trend_updated_at = models.DateTimeField(null=True, blank=True, editable=False)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["updated_at", "id"], name="vault_qs_updated_id_idx"),  # keyset pagination
+            models.Index(fields=["trend_score", "id"], name="vault_qs_trend_id_idx"),  # ordering=trending
+        ]
+
+    # form/serializer-ийн analyze_sql үр дүн (таарвал save дахин parse хийхгүй)
+    _sql_analysis = None
 
     def save(self, *args, **kwargs):
-        self.sql_kind = classify_sql_kind(self.sql_text)
+        adding = self._state.adding
+        update_fields = kwargs.get("update_fields")
+        if update_fields is None or set(update_fields) & {"sql_text", "db_type"}:
+            from .dedupe import sql_fingerprint
+            analysis = self._sql_analysis
+            if analysis is None or not analysis.matches(self.sql_text, self.db_type):
+                analysis = self._sql_analysis = analyze_sql(self.sql_text, self.db_type)
+            self.sql_kind = analysis.kind
+            self.sql_fingerprint = sql_fingerprint(self.sql_text, self.db_type, analysis=analysis)
+            if update_fields is not None:
+                kwargs["update_fields"] = update_fields = {*update_fields, "sql_kind", "sql_fingerprint"}
         super().save(*args, **kwargs)
 
+        # Хайлтын индексийг шинэчилнэ (зөвхөн текст талбар өөрчлөгдсөн үед)
+        if update_fields is None or set(update_fields) & set(SEARCH_FIELDS):
+            from .search_index import index_snippet
+            from .similarity import index_embedding
+            from .suggest import sync_suggestions
+            from .tags import sync_tags
+            index_snippet(self, created=adding)
+            sync_suggestions(self)
+            sync_tags(self)
+            index_embedding(self)
+        # Near-duplicate (MinHash/LSH) индекс — зөвхөн SQL өөрчлөгдсөн үед
+        if update_fields is None or set(update_fields) & {"sql_text", "db_type"}:
+            from .dedupe import index_minhash
+            index_minhash(self)
+        # Хайлтын cache-г хүчингүй болгоно (зөвхөн тоолуур өөрчлөгдсөнөөс бусад үед —
+        # тоолуураар эрэмбэлсэн жагсаалт VAULT_SEARCH_COUNTER_TTL-ээр шинэчлэгдэнэ)
+        if update_fields is None or set(update_fields) - {"use_count"}:
+            from .search_cache import bump_generation
+            bump_generation()
+
+    # Устгах үеийн индекс/cache цэвэрлэгээ vault/signals.py-д (queryset/cascade delete-д ч ажиллана)
+
     @property
     def tag_list(self):
         return [t.strip() for t in (self.tags or "").split(",") if t.strip()]
 
-def _strip_comments(sql: str) -> str:
-    import re
-    s = sql or ""
-    s = re.sub(r"/\*.*?\*/", " ", s, flags=re.S)
-    s = re.sub(r"--.*?$", " ", s, flags=re.M)
-    return s.strip()
-
-def classify_sql_kind(sql: str) -> str:
-    import re
-    s = _strip_comments(sql).lower()
-    if not s:
-        return 'select'
-    m = re.match(r"^(with|select|insert|update|merge|delete|truncate|drop|alter|create|grant|revoke)", s)
-    kw = m.group(1) if m else ''
-    if kw in ('select', 'with'):
-        if re.search(r"\b(insert|update|merge|delete|truncate|drop|alter|create|grant|revoke)\b", s):
-            if re.search(r"\b(delete|truncate|drop|alter|create|grant|revoke)\b", s):
-                return 'dangerous'
-            return 'modify'
-        return 'select'
-    if kw in ('insert', 'update', 'merge'):
-        return 'modify'
-    if kw in ('delete', 'truncate', 'drop', 'alter', 'create', 'grant', 'revoke'):
-        return 'dangerous'
-    return 'select'
+class SnippetTerm(models.Model):
+    """Inverted index: token → snippet postings (field бүрээр)."""
+    FIELD_CHOICES = [(f, f) for f in SEARCH_FIELDS]
+
+    snippet = models.ForeignKey(QuerySnippet, on_delete=models.CASCADE, related_name="terms")
+    term = models.CharField(max_length=64)
+    field = models.CharField(max_length=16, choices=FIELD_CHOICES)
+    tf = models.PositiveIntegerField(default=1)
+    field_len = models.PositiveIntegerField(default=0)  # тухайн талбарын нийт token (BM25)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["term", "snippet"]),
+        ]
+        unique_together = ("snippet", "field", "term")
+
+    def __str__(self):
+        return f"{self.term} → #{self.snippet_id} ({self.field})"
+
+
+class TermStat(models.Model):
+    """BM25-д зориулсан document frequency (index_snippet шинэчилнэ)."""
+    term = models.CharField(max_length=64, unique=True)
+    df = models.IntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.term}: df={self.df}"
+
+
+class FieldStat(models.Model):
+    """Талбар бүрийн нийт урт ба индекслэгдсэн snippet-ийн тоо (avg field length)."""
+    field = models.CharField(max_length=16, unique=True, choices=SnippetTerm.FIELD_CHOICES)
+    total_len = models.BigIntegerField(default=0)
+    docs = models.IntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.field}: {self.total_len}/{self.docs}"
+
+
+class SuggestEntry(models.Model):
+    """Typeahead-д зориулсан эрэмбэлэгдсэн prefix хүснэгт (title үгийн эхлэл бүр + tag)."""
+    KIND_CHOICES = [("title", "Title"), ("tag", "Tag")]
+
+    key = models.CharField(max_length=200)
+    kind = models.CharField(max_length=8, choices=KIND_CHOICES)
+    label = models.CharField(max_length=200)
+    snippet = models.ForeignKey(QuerySnippet, on_delete=models.CASCADE, related_name="suggest_entries")
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["kind", "key"]),
+        ]
+
+    def __str__(self):
+        return f"{self.kind}:{self.key}"
+
+
+class SnippetMinHash(models.Model):
+    """Normalized SQL-ийн MinHash signature (dedupe.NUM_PERM × uint64)."""
+    snippet = models.OneToOneField(QuerySnippet, on_delete=models.CASCADE, primary_key=True,
+                                   related_name="minhash")
+    signature = models.BinaryField()
+
+    def __str__(self):
+        return f"minhash #{self.snippet_id}"
+
+
+class SnippetLSHBucket(models.Model):
+    """LSH: band бүрийн hash → snippet. Ижил (band, bucket)-тэй snippet-үүд candidate болно."""
+    snippet = models.ForeignKey(QuerySnippet, on_delete=models.CASCADE, related_name="lsh_buckets")
+    band = models.PositiveSmallIntegerField()
+    bucket = models.BigIntegerField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["band", "bucket"]),
+        ]
+
+    def __str__(self):
+        return f"#{self.snippet_id} band={self.band}"
+
+
+class SnippetEmbedding(models.Model):
+    """similarity.embed_snippet-ийн float32 vector (AI few-shot / suggestions)."""
+    snippet = models.OneToOneField(QuerySnippet, on_delete=models.CASCADE, primary_key=True,
+                                   related_name="embedding")
+    vector = models.BinaryField()
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)  # incremental refresh
+
+    def __str__(self):
+        return f"embedding #{self.snippet_id}"
 
 
 class UserDBAccess(models.Model):
@@ -76,14 +215,32 @@ class UserDBAccess(models.Model):
     def __str__(self):
         return f"{self.user.username} → {self.db_type}"
 
+class SQLSnapshot(models.Model):
+    """Copy log-ийн SQL текст — агуулга бүрт нэг мөр (vault/snapshots.py)."""
+    sha256 = models.CharField(max_length=64, unique=True)
+    sql_text = models.TextField(blank=True)  # шахаагүй үед
+    data = models.BinaryField(null=True, blank=True)  # zlib (VAULT_SNAPSHOT_COMPRESS)
+    size = models.PositiveIntegerField(default=0)  # анхны UTF-8 байт
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    @property
+    def text(self):
+        from .snapshots import decode_snapshot
+        return decode_snapshot(self.sql_text, self.data)
+
+    def __str__(self):
+        return f"{self.sha256[:12]} ({self.size} B)"
+
+
 class SnippetCopyLog(models.Model):
     snippet = models.ForeignKey(QuerySnippet, on_delete=models.CASCADE, related_name="copy_logs")
     user = models.ForeignKey(get_user_model(), null=True, blank=True, on_delete=models.SET_NULL)
-    copied_at = models.DateTimeField(auto_now_add=True)
+    copied_at = models.DateTimeField(default=timezone.now, editable=False)  # buffer-ээс бичихэд event-ийн цаг
     ip_address = models.GenericIPAddressField(null=True, blank=True)
     user_agent = models.CharField(max_length=512, blank=True)
     referer = models.URLField(blank=True)
-    sql_snapshot = models.TextField(blank=True)
+    snapshot = models.ForeignKey(SQLSnapshot, null=True, blank=True, on_delete=models.PROTECT,
+                                 related_name="copy_logs")
     sql_chars = models.PositiveIntegerField(default=0)
 
     class Meta:
@@ -92,6 +249,95 @@ class SnippetCopyLog(models.Model):
             models.Index(fields=["copied_at"]),
         ]
 
+    @property
+    def sql_snapshot(self):
+        return self.snapshot.text if self.snapshot_id else ""
+
     def __str__(self):
         u = self.user.username if self.user else "anon"
         return f"Copy #{self.id} • {self.snippet.title} • {u}"
+
+
+class JobCheckpoint(models.Model):
+    """Management command-уудын үргэлжлүүлэх цэг (ж: rollup хийгдсэн сүүлийн өдөр)."""
+    name = models.CharField(max_length=100, unique=True)
+    value = models.CharField(max_length=200, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.name}={self.value}"
+
+
+class SnippetDailyUsage(models.Model):
+    """SnippetCopyLog-ийн өдрийн нэгтгэл — snippet бүрээр (vault/rollups.py)."""
+    day = models.DateField()
+    snippet = models.ForeignKey(QuerySnippet, on_delete=models.CASCADE, related_name="daily_usage")
+    copies = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        unique_together = ("day", "snippet")
+        indexes = [
+            models.Index(fields=["snippet", "day"]),
+        ]
+
+    def __str__(self):
+        return f"{self.day} #{self.snippet_id}: {self.copies}"
+
+
+class UserDailyUsage(models.Model):
+    """Өдрийн нэгтгэл — хэрэглэгч бүрээр (user=None нь anon / устсан хэрэглэгч)."""
+    day = models.DateField(db_index=True)
+    user = models.ForeignKey(User, null=True, blank=True, on_delete=models.SET_NULL, related_name="daily_usage")
+    copies = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["user", "day"]),
+        ]
+
+    def __str__(self):
+        return f"{self.day} {self.user_id or 'anon'}: {self.copies}"
+
+
+class DBTypeDailyUsage(models.Model):
+    """Өдрийн нэгтгэл — DB type бүрээр."""
+    day = models.DateField()
+    db_type = models.CharField(max_length=20, choices=QuerySnippet.DB_CHOICES)
+    copies = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        unique_together = ("day", "db_type")
+
+    def __str__(self):
+        return f"{self.day} {self.db_type}: {self.copies}"
+
+
+class SnippetPairCount(models.Model):
+    """Нэг хэрэглэгч/session ойрхон хугацаанд хоёуланг нь copy хийсэн тоо (snippet_a < snippet_b)."""
+    snippet_a = models.ForeignKey(QuerySnippet, on_delete=models.CASCADE, related_name="+")
+    snippet_b = models.ForeignKey(QuerySnippet, on_delete=models.CASCADE, related_name="+")
+    count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        unique_together = ("snippet_a", "snippet_b")
+        indexes = [
+            models.Index(fields=["snippet_b", "snippet_a"]),
+        ]
+
+    def __str__(self):
+        return f"#{self.snippet_a_id} ↔ #{self.snippet_b_id}: {self.count}"
+
+
+class RelatedSnippet(models.Model):
+    """"Үүнийг copy хийсэн хүмүүс мөн ..." — snippet бүрийн урьдчилан тооцсон top-k (vault/related.py)."""
+    snippet = models.ForeignKey(QuerySnippet, on_delete=models.CASCADE, related_name="related_entries")
+    related = models.ForeignKey(QuerySnippet, on_delete=models.CASCADE, related_name="+")
+    score = models.FloatField(default=0.0)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["snippet", "-score"]),
+        ]
+
+    def __str__(self):
+        return f"#{self.snippet_id} → #{self.related_id} ({self.score:g})"
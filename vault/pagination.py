@@ -0,0 +1,54 @@
+# vault/pagination.py
+from django.conf import settings
+from rest_framework.pagination import CursorPagination
+from rest_framework.response import Response
+
+
+class SnippetCursorPagination(CursorPagination):
+    """
+    (updated_at, id) keyset pagination — OFFSET, COUNT(*) байхгүй тул гүн
+    хуудас ч эхний хуудас шиг хямд. Хайлтын үр дүн (search_rank),
+    ordering=relevance болон ordering=trending (trend_score индекс) нь өөрсдийн
+    эрэмбээрээ keyset хийгдэнэ.
+
+    `?with_total=1` үед VAULT_APPROX_COUNT_CAP хүртэл хязгаарласан COUNT буцаана.
+    """
+    page_size = 50
+    page_size_query_param = "page_size"
+    max_page_size = 200
+    ordering = ("-updated_at", "-id")
+
+    def get_ordering(self, request, queryset, view):
+        annotations = queryset.query.annotations
+        if "search_rank" in annotations:
+            return ("search_rank",)
+        if "relevance" in annotations:
+            return ("-relevance", "-id")
+        if tuple(queryset.query.order_by[:1]) == ("-trend_score",):
+            return ("-trend_score", "-id")
+        if "rank" in annotations:  # MySQL FULLTEXT / Postgres FTS (live хайлт)
+            return ("-rank", "-id")
+        return self.ordering
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.total = None
+        if request.query_params.get("with_total") in ("1", "true", "yes"):
+            self.total = approx_count(queryset)
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        payload = {"next": self.get_next_link(), "previous": self.get_previous_link()}
+        if self.total is not None:
+            payload["total"], payload["total_is_exact"] = self.total
+        payload["results"] = data
+        return Response(payload)
+
+    def page_links(self):
+        return {"next": self.get_next_link(), "previous": self.get_previous_link()}
+
+
+def approx_count(queryset):
+    """(count, is_exact) — cap-аас хэтэрвэл бүрэн COUNT(*) хийхгүй."""
+    cap = int(getattr(settings, "VAULT_APPROX_COUNT_CAP", 10000))
+    n = queryset.order_by()[:cap + 1].count()
+    return (cap, False) if n > cap else (n, True)
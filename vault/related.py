@@ -0,0 +1,161 @@
+# vault/related.py
+"""
+"Үүнийг copy хийсэн хүмүүс мөн ..." — copy log-ийн co-occurrence.
+
+Нэг actor (хэрэглэгч, anon бол IP) VAULT_RELATED_WINDOW_HOURS дотор хоёр
+snippet copy хийсэн бол SnippetPairCount(a, b) +1. `refresh_related_snippets`
+command зөвхөн checkpoint-оос (сүүлд боловсруулсан log id) хойшхи шинэ log-ийг
+уншиж pair тоог нэмээд, өөрчлөгдсөн snippet-үүдийн top-k-г RelatedSnippet-д
+дахин бичнэ. Detail хуудас RelatedSnippet-ээс нэг индекстэй query-гээр уншина.
+"""
+import datetime
+from collections import Counter, defaultdict
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+
+from .checkpoints import get_checkpoint, set_checkpoint
+from .models import QuerySnippet, RelatedSnippet, SnippetCopyLog, SnippetPairCount
+
+CHECKPOINT = "related:last_log_id"
+MAX_ACTOR_HISTORY = 200  # нэг actor-ын window доторх хамгийн сүүлийн copy-нууд
+
+
+def _window():
+    return datetime.timedelta(hours=float(getattr(settings, "VAULT_RELATED_WINDOW_HOURS", 24)))
+
+
+def _top_k():
+    return int(getattr(settings, "VAULT_RELATED_TOP_K", 10))
+
+
+def _actor(user_id, ip):
+    if user_id:
+        return f"u:{user_id}"
+    return f"ip:{ip}" if ip else None
+
+
+def pair_deltas(new_rows, context_rows, window):
+    """
+    new_rows / context_rows: [(id, snippet_id, user_id, ip, copied_at), ...]
+    Шинэ мөр бүрийг өмнөх (id бага) мөрүүдтэй нь хослуулна — хос бүр нэг л удаа
+    тоологдоно. Нэг actor ижил snippet-ийг window дотор дахин copy хийвэл алгасна.
+    """
+    history = defaultdict(list)
+    for row in sorted(context_rows):
+        actor = _actor(row[2], row[3])
+        if actor:
+            history[actor].append(row)
+    deltas = Counter()
+    for log_id, sid, user_id, ip, t in new_rows:
+        actor = _actor(user_id, ip)
+        if actor is None:
+            continue
+        earlier = {
+            other_sid
+            for other_id, other_sid, _u, _ip, other_t in history[actor][-MAX_ACTOR_HISTORY:]
+            if other_id < log_id and abs(t - other_t) <= window
+        }
+        if sid in earlier:
+            continue
+        for other in earlier:
+            deltas[(min(sid, other), max(sid, other))] += 1
+    return deltas
+
+
+def apply_pair_deltas(deltas):
+    """Pair тоог нэмээд өөрчлөгдсөн snippet-үүдийн set-ийг буцаана."""
+    if not deltas:
+        return set()
+    touched = {sid for pair in deltas for sid in pair}
+    alive = set(QuerySnippet.objects.filter(pk__in=touched).values_list("pk", flat=True))
+    deltas = {pair: n for pair, n in deltas.items() if pair[0] in alive and pair[1] in alive}
+    existing = {
+        (p.snippet_a_id, p.snippet_b_id): p
+        for p in SnippetPairCount.objects.filter(
+            snippet_a_id__in={a for a, _b in deltas}, snippet_b_id__in={b for _a, b in deltas}
+        )
+    }
+    to_update, to_create = [], []
+    for (a, b), n in deltas.items():
+        p = existing.get((a, b))
+        if p is None:
+            to_create.append(SnippetPairCount(snippet_a_id=a, snippet_b_id=b, count=n))
+        else:
+            p.count += n
+            to_update.append(p)
+    SnippetPairCount.objects.bulk_update(to_update, ["count"], batch_size=1000)
+    SnippetPairCount.objects.bulk_create(to_create, batch_size=1000)
+    return {sid for pair in deltas for sid in pair}
+
+
+def rebuild_top_k(snippet_ids, k=None):
+    """Өгсөн snippet-үүдийн RelatedSnippet мөрүүдийг pair тооноос дахин бичнэ."""
+    k = k or _top_k()
+    snippet_ids = set(snippet_ids)
+    if not snippet_ids:
+        return
+    neighbors = defaultdict(list)
+    pairs = SnippetPairCount.objects.filter(
+        Q(snippet_a_id__in=snippet_ids) | Q(snippet_b_id__in=snippet_ids)
+    ).values_list("snippet_a_id", "snippet_b_id", "count")
+    for a, b, n in pairs.iterator(chunk_size=5000):
+        if a in snippet_ids:
+            neighbors[a].append((n, b))
+        if b in snippet_ids:
+            neighbors[b].append((n, a))
+    rows = []
+    for sid, items in neighbors.items():
+        items.sort(key=lambda x: (-x[0], x[1]))
+        rows.extend(RelatedSnippet(snippet_id=sid, related_id=other, score=n) for n, other in items[:k])
+    RelatedSnippet.objects.filter(snippet_id__in=snippet_ids).delete()
+    RelatedSnippet.objects.bulk_create(rows, batch_size=1000)
+
+
+def process_new_logs(chunk: int = 5000, on_chunk=None):
+    """Checkpoint-оос хойшхи copy log-уудыг chunk-аар боловсруулна. (log тоо, snippet тоо)."""
+    window = _window()
+    last_id = int(get_checkpoint(CHECKPOINT, "0") or 0)
+    fields = ("id", "snippet_id", "user_id", "ip_address", "copied_at")
+    processed = refreshed = 0
+    while True:
+        new = list(SnippetCopyLog.objects.filter(id__gt=last_id).order_by("id").values_list(*fields)[:chunk])
+        if not new:
+            break
+        user_ids = {r[2] for r in new if r[2]}
+        ips = {r[3] for r in new if not r[2] and r[3]}
+        times = [r[4] for r in new]
+        context = SnippetCopyLog.objects.filter(
+            copied_at__gte=min(times) - window, copied_at__lte=max(times),
+        ).filter(Q(user_id__in=user_ids) | Q(user__isnull=True, ip_address__in=ips)).values_list(*fields)
+        deltas = pair_deltas(new, list(context), window)
+        with transaction.atomic():
+            touched = apply_pair_deltas(deltas)
+            rebuild_top_k(touched)
+            last_id = new[-1][0]
+            set_checkpoint(CHECKPOINT, last_id)
+        processed += len(new)
+        refreshed += len(touched)
+        if on_chunk:
+            on_chunk(last_id, processed, refreshed)
+    return processed, refreshed
+
+
+def reset():
+    with transaction.atomic():
+        SnippetPairCount.objects.all().delete()
+        RelatedSnippet.objects.all().delete()
+        set_checkpoint(CHECKPOINT, 0)
+
+
+def related_snippets(snippet, kinds, db_types, limit=None):
+    """Detail хуудсанд: эрхээр шүүсэн top-k — нэг индекстэй query (+ related JOIN)."""
+    qs = (
+        RelatedSnippet.objects.filter(snippet=snippet, related__sql_kind__in=kinds)
+        .select_related("related")
+        .order_by("-score")
+    )
+    if db_types is not None:
+        qs = qs.filter(related__db_type__in=db_types)
+    return [r.related for r in qs[:limit or _top_k()]]
@@ -0,0 +1,246 @@
+# vault/rollups.py
+"""
+SnippetCopyLog-ийн өдрийн нэгтгэл (snippet / user / db_type) ба retention.
+
+`rollup_day(day)` нь тухайн өдрийн нэгтгэлийг raw log-оос дахин бичдэг тул
+idempotent. `rollup_copy_logs` command өмнөх checkpoint-оос (ROLLUP_CHECKPOINT,
+эцэслэгдсэн сүүлийн өдөр) өнөөдөр хүртэл ажиллана. Raw мөрийг зөвхөн
+эцэслэгдсэн өдрүүдээс (checkpoint-оос өмнө) chunk-аар устгана.
+
+Буфертэй copy event эцэслэгдсэн өдөр рүү хоцорч бичигдэж болно. Rollup нь
+LOG_ID_CHECKPOINT (тооцсон сүүлийн log id) хүртэлх мөрийг л тоолно; түүнээс
+хойшхи хоцорсон мөрийг дараагийн ажиллалтад өдрийн нэгтгэлд нэмнэ (raw нь prune
+хийгдсэн байж болох тул дахин бичихгүй).
+
+Auto-increment id нь commit-ийн дараалал биш: бага id-тай transaction хожуу commit
+хийгдэж болно. Тиймээс checkpoint-ыг одоо харагдаж буй max id хүртэл биш, өмнөх
+ажиллалтад харсан, VAULT_COPY_LOG_SETTLE_SECONDS-ээс хуучин max id хүртэл л
+(settled_log_id) урагшлуулна — түүнээс хойшхи мөр raw log-оос тоологдсоор байна.
+
+Нийт тоо = эцэслэгдсэн өдрүүдийн rollup + түүнээс хойшхи эсвэл нэмэгдээгүй raw log.
+"""
+import datetime
+from collections import Counter
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, Count, F, IntegerField, Q, Sum, Value, When
+from django.utils import timezone
+
+from .checkpoints import get_checkpoint, set_checkpoint
+from .models import DBTypeDailyUsage, QuerySnippet, SnippetCopyLog, SnippetDailyUsage, UserDailyUsage
+from .related import CHECKPOINT as RELATED_CHECKPOINT, _window as related_window
+
+ROLLUP_CHECKPOINT = "copy_rollup:finalized_through"
+LOG_ID_CHECKPOINT = "copy_rollup:last_log_id"
+# "<id>@<isoformat>" — тухайн үед харагдсан max log id
+LOG_ID_SEEN = "copy_rollup:seen_log_id"
+
+
+def day_bounds(day: datetime.date):
+    """Local (TIME_ZONE) өдрийн [эхлэл, дараагийн өдрийн эхлэл) aware datetime."""
+    start = timezone.make_aware(datetime.datetime.combine(day, datetime.time.min))
+    end = timezone.make_aware(datetime.datetime.combine(day + datetime.timedelta(days=1), datetime.time.min))
+    return start, end
+
+
+def finalized_through():
+    """Rollup нь эцэслэгдсэн (raw log-гүй байж болох) сүүлийн өдөр, эсвэл None."""
+    value = get_checkpoint(ROLLUP_CHECKPOINT)
+    return datetime.date.fromisoformat(value) if value else None
+
+
+def merged_log_id() -> int:
+    """Эцэслэгдсэн өдрүүдийн rollup-д орсон сүүлийн SnippetCopyLog id."""
+    return int(get_checkpoint(LOG_ID_CHECKPOINT, "0"))
+
+
+def settled_log_id(now=None) -> int:
+    """
+    Бүх бага id нь commit хийгдсэн гэж үзэж болох log id: өмнө нь харсан max id
+    VAULT_COPY_LOG_SETTLE_SECONDS-ээс хуучин бол түүнийг буцааж, одоогийн max id-г
+    дараагийн ажиллалтад зориулж тэмдэглэнэ. Эс бөгөөс merged_log_id (урагшлахгүй).
+    """
+    now = now or timezone.now()
+    merged = merged_log_id()
+    settle = datetime.timedelta(seconds=float(getattr(settings, "VAULT_COPY_LOG_SETTLE_SECONDS", 60)))
+    seen = get_checkpoint(LOG_ID_SEEN)
+    if seen:
+        seen_id, _at, seen_at = seen.partition("@")
+        if now - datetime.datetime.fromisoformat(seen_at) < settle:
+            return merged
+        merged = max(merged, int(seen_id))
+    max_id = SnippetCopyLog.objects.order_by("-id").values_list("id", flat=True).first() or 0
+    set_checkpoint(LOG_ID_SEEN, f"{max_id}@{now.isoformat()}")
+    return merged
+
+
+def rollup_day(day: datetime.date, max_id=None) -> int:
+    """Нэг өдрийн гурван нэгтгэлийг raw log-оос (id <= max_id) сольж бичнэ. Log-ийн тоог буцаана."""
+    start, end = day_bounds(day)
+    logs = SnippetCopyLog.objects.filter(copied_at__gte=start, copied_at__lt=end).order_by()
+    if max_id is not None:
+        logs = logs.filter(id__lte=max_id)
+    by_snippet = list(logs.values("snippet_id").annotate(n=Count("id")))
+    by_user = list(logs.values("user_id").annotate(n=Count("id")))
+    by_db = list(logs.values("snippet__db_type").annotate(n=Count("id")))
+    with transaction.atomic():
+        for model in (SnippetDailyUsage, UserDailyUsage, DBTypeDailyUsage):
+            model.objects.filter(day=day).delete()
+        SnippetDailyUsage.objects.bulk_create(
+            [SnippetDailyUsage(day=day, snippet_id=r["snippet_id"], copies=r["n"]) for r in by_snippet],
+            batch_size=1000,
+        )
+        UserDailyUsage.objects.bulk_create(
+            [UserDailyUsage(day=day, user_id=r["user_id"], copies=r["n"]) for r in by_user], batch_size=1000,
+        )
+        DBTypeDailyUsage.objects.bulk_create(
+            [DBTypeDailyUsage(day=day, db_type=r["snippet__db_type"], copies=r["n"]) for r in by_db],
+        )
+    return sum(r["n"] for r in by_snippet)
+
+
+def _add_counts(model, day, field, counts):
+    for value, n in counts.items():
+        updated = model.objects.filter(day=day, **{field: value}).update(copies=F("copies") + n)
+        if not updated:
+            model.objects.create(day=day, copies=n, **{field: value})
+
+
+def merge_late_logs(before: datetime.date, max_id: int) -> int:
+    """
+    (merged_log_id, max_id] хооронд бичигдсэн ч `before`-оос өмнөх (эцэслэгдсэн)
+    өдрийнх болох log-уудыг тэр өдрүүдийн нэгтгэлд нэмнэ. Нэмсэн мөрийн тоог буцаана.
+    """
+    start, _end = day_bounds(before)
+    late = (
+        SnippetCopyLog.objects.filter(id__gt=merged_log_id(), id__lte=max_id, copied_at__lt=start)
+        .values_list("copied_at", "snippet_id", "user_id", "snippet__db_type")
+    )
+    by_day = {}
+    for copied_at, snippet_id, user_id, db_type in late.iterator(chunk_size=5000):
+        snippets, users, dbs = by_day.setdefault(timezone.localdate(copied_at), (Counter(), Counter(), Counter()))
+        snippets[snippet_id] += 1
+        users[user_id] += 1
+        dbs[db_type] += 1
+    with transaction.atomic():
+        for day, (snippets, users, dbs) in by_day.items():
+            _add_counts(SnippetDailyUsage, day, "snippet_id", snippets)
+            _add_counts(UserDailyUsage, day, "user_id", users)
+            _add_counts(DBTypeDailyUsage, day, "db_type", dbs)
+        set_checkpoint(LOG_ID_CHECKPOINT, max_id)
+    return sum(sum(s.values()) for s, _u, _d in by_day.values())
+
+
+def rollup_pending(today=None, on_day=None):
+    """
+    Checkpoint-ын өдрөөс (эсвэл хамгийн анхны log-оос) өнөөдөр хүртэл rollup хийнэ.
+    Өчигдрийг эцэслэгдсэн гэж тэмдэглэнэ; өнөөдрийнх дараагийн удаа дахин бичигдэнэ.
+    Өмнө нь эцэслэгдсэн өдрүүдэд хоцорч ирсэн log-уудыг эхлээд нэмнэ (merge_late_logs).
+    """
+    today = today or timezone.localdate()
+    max_id = settled_log_id()
+    start = finalized_through()
+    if start is not None:
+        merge_late_logs(start, max_id)
+    else:
+        first = SnippetCopyLog.objects.order_by("copied_at").values_list("copied_at", flat=True).first()
+        if first is None:
+            return 0
+        start = timezone.localdate(first)
+    days = 0
+    day = start
+    while day <= today:
+        with transaction.atomic():
+            n = rollup_day(day, max_id)
+            if day < today:
+                set_checkpoint(ROLLUP_CHECKPOINT, day.isoformat())
+                set_checkpoint(LOG_ID_CHECKPOINT, max_id)
+        if on_day:
+            on_day(day, n)
+        day += datetime.timedelta(days=1)
+        days += 1
+    return days
+
+
+def prune_raw_logs(retention_days: int, chunk: int = 5000, today=None) -> int:
+    """
+    `retention_days`-ээс хуучин, ЭЦЭСЛЭГДСЭН өдрүүдийн raw log-ийг id chunk-аар устгана
+    (урт transaction / lock үүсгэхгүй). Checkpoint-ын өдөр өөрөө хадгалагдана.
+    Related snippets (related.CHECKPOINT)-д боловсруулагдаагүй log, түүний өмнөх
+    цонхны (VAULT_RELATED_WINDOW_HOURS) log-ууд мөн хадгалагдана.
+    """
+    through = finalized_through()
+    if through is None or retention_days is None or retention_days <= 0:
+        return 0
+    today = today or timezone.localdate()
+    keep_from = min(today - datetime.timedelta(days=retention_days), through)
+    cutoff, _end = day_bounds(keep_from)
+    related_id = int(get_checkpoint(RELATED_CHECKPOINT, "0") or 0)
+    pending = SnippetCopyLog.objects.filter(id__gt=related_id).order_by("copied_at").values_list("copied_at", flat=True)
+    first_pending = pending.first()
+    if first_pending is not None:
+        cutoff = min(cutoff, first_pending - related_window())
+    # Rollup-д хараахан нэмэгдээгүй хоцорсон log-ууд хадгалагдана
+    prunable = SnippetCopyLog.objects.filter(copied_at__lt=cutoff, id__lte=min(merged_log_id(), related_id))
+    deleted = 0
+    while True:
+        ids = list(prunable.order_by("id").values_list("id", flat=True)[:chunk])
+        if not ids:
+            return deleted
+        deleted += SnippetCopyLog.objects.filter(id__in=ids).delete()[0]
+
+
+# ------------- readers -------------
+def live_copy_logs(through=None):
+    """Rollup-д ороогүй raw log-ууд: checkpoint-оос хойшхи өдрүүдийнх + хоцорч бичигдсэн."""
+    through = finalized_through() if through is None else through
+    if through is None:
+        return SnippetCopyLog.objects.all()
+    start, _end = day_bounds(through + datetime.timedelta(days=1))
+    return SnippetCopyLog.objects.filter(Q(copied_at__gte=start) | Q(id__gt=merged_log_id()))
+
+
+def copy_totals(snippet_ids=None):
+    """{snippet_id: нийт copy} — эцэслэгдсэн өдрүүд rollup-аас, үлдсэн нь raw log-оос."""
+    through = finalized_through()
+    live = live_copy_logs(through)
+    totals = {}
+    if through is not None:
+        rolled = SnippetDailyUsage.objects.filter(day__lte=through)
+        if snippet_ids is not None:
+            rolled = rolled.filter(snippet_id__in=snippet_ids)
+        for sid, n in rolled.values("snippet_id").annotate(n=Sum("copies")).values_list("snippet_id", "n"):
+            totals[sid] = n
+    if snippet_ids is not None:
+        live = live.filter(snippet_id__in=snippet_ids)
+    for sid, n in live.order_by().values("snippet_id").annotate(n=Count("id")).values_list("snippet_id", "n"):
+        totals[sid] = totals.get(sid, 0) + n
+    return totals
+
+
+def recount_use_counts(queryset=None, chunk: int = 1000, start_after: int = 0, on_chunk=None):
+    """
+    use_count-ыг copy_totals-аар id-ийн дарааллаар chunk-аар дахин тооцно:
+    chunk бүрт (id, use_count) унших 1 query + нэгтгэл 2 query + зөрүүтэй мөрүүдэд
+    нэг `UPDATE ... CASE`. `on_chunk(last_id, scanned, updated)` — progress/checkpoint.
+    """
+    qs = (QuerySnippet.objects.all() if queryset is None else queryset).order_by("pk")
+    last_id, scanned, updated = start_after, 0, 0
+    while True:
+        rows = list(qs.filter(pk__gt=last_id).values_list("pk", "use_count")[:chunk])
+        if not rows:
+            break
+        totals = copy_totals(snippet_ids=[pk for pk, _uc in rows])
+        changed = {pk: totals.get(pk, 0) for pk, uc in rows if uc != totals.get(pk, 0)}
+        if changed:
+            QuerySnippet.objects.filter(pk__in=changed).update(use_count=Case(
+                *[When(pk=pk, then=Value(n)) for pk, n in changed.items()],
+                output_field=IntegerField(),
+            ))
+        last_id = rows[-1][0]
+        scanned += len(rows)
+        updated += len(changed)
+        if on_chunk:
+            on_chunk(last_id, scanned, updated)
+    return scanned, updated
@@ -0,0 +1,243 @@
+# vault/search.py
+"""
+Snippet хайлтын нэгдсэн давхарга. Web UI (SnippetList) болон REST API
+(QuerySnippetViewSet) хоёулаа эндээс дуудна.
+
+Backend-ийг `settings.VAULT_SEARCH_BACKEND`-ээр сонгоно:
+  "auto" (default) — "index" (ямар ч DB дээр; posting-ууд нь save бүрт шинэчлэгддэг тул)
+  "icontains"      — бүх талбар дээр phrase `icontains` (индексгүй)
+  "mysql"          — MySQL FULLTEXT (MATCH ... AGAINST)
+  "postgres"       — Postgres FTS (SearchVector / SearchRank)
+  "index"          — SnippetTerm token индекс + BM25 (ямар ч DB дээр ажиллана)
+
+`ordering="relevance"` нь backend-ээс үл хамааран BM25 (+ use_count prior)-аар,
+`ordering="trending"` нь decay хийсэн copy оноогоор (trend_score) эрэмбэлнэ.
+"""
+from collections import Counter
+
+from django.conf import settings
+from django.db.models import Case, Count, IntegerField, Q, Value, When
+
+from .models import QuerySnippet, parse_tags
+from .search_cache import result_cache, result_key, scope_fingerprint
+from .search_index import bm25_search
+from .search_mysql import fulltext_search
+from .tags import filter_by_tags, tag_counts
+from .utils_perms import allowed_sql_kinds_for, allowed_db_types_for, permission_scope
+
+
+class SearchBackend:
+    name = ""
+
+    def search(self, qs, q: str, mode: str = ""):
+        """
+        Шүүгдсэн (боломжтой бол `rank`-аар эрэмбэлэгдсэн) queryset буцаана.
+        `mode="boolean"` нь зөвхөн MySQL FULLTEXT-д нөлөөлнө (бусад нь үл тооно).
+        """
+        raise NotImplementedError
+
+
+class IContainsBackend(SearchBackend):
+    name = "icontains"
+
+    def search(self, qs, q, mode=""):
+        return qs.filter(
+            Q(title__icontains=q)
+            | Q(description__icontains=q)
+            | Q(sql_text__icontains=q)
+            | Q(tags__icontains=q)
+        )
+
+
+class MySQLFulltextBackend(SearchBackend):
+    name = "mysql"
+
+    def search(self, qs, q, mode=""):
+        return fulltext_search(qs, q, mode=mode or "natural")
+
+
+class PostgresBackend(SearchBackend):
+    name = "postgres"
+
+    def search(self, qs, q, mode=""):
+        from django.contrib.postgres.search import SearchQuery, SearchVector, SearchRank
+        vector = (
+                SearchVector("title", weight="A")
+                + SearchVector("description", weight="B")
+                + SearchVector("sql_text", weight="C")
+                + SearchVector("tags", weight="B")
+        )
+        query = SearchQuery(q)
+        return (
+            qs.annotate(search=vector, rank=SearchRank(vector, query))
+            .filter(search=query)
+            .order_by("-rank", "-updated_at")
+        )
+
+
+class IndexBackend(SearchBackend):
+    name = "index"
+
+    def search(self, qs, q, mode=""):
+        return bm25_search(qs, q)
+
+
+BACKENDS = {b.name: b for b in (IContainsBackend, MySQLFulltextBackend, PostgresBackend, IndexBackend)}
+
+def backend_name() -> str:
+    name = (getattr(settings, "VAULT_SEARCH_BACKEND", "auto") or "auto").lower()
+    if name == "auto":
+        return "index"
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown VAULT_SEARCH_BACKEND: {name!r}")
+    return name
+
+
+def get_backend() -> SearchBackend:
+    return BACKENDS[backend_name()]()
+
+
+def search_snippets(qs, q: str, mode: str = ""):
+    q = (q or "").strip()
+    if not q:
+        return qs
+    return get_backend().search(qs, q, mode=mode)
+
+
+def permitted_snippets(qs, user, kinds=None, db_types=None):
+    """Хэрэглэгчийн роль (sql_kind) болон DB type эрхээр шүүнэ."""
+    kinds = allowed_sql_kinds_for(user) if kinds is None else kinds
+    db_types = allowed_db_types_for(user) if db_types is None else db_types
+    qs = qs.filter(sql_kind__in=kinds)
+    if db_types is not None:
+        qs = qs.filter(db_type__in=db_types)
+    return qs
+
+
+def ordered_by_ids(qs, ids):
+    """id жагсаалтын дарааллыг `search_rank` (0..n-1) annotation-оор хадгална."""
+    if not ids:
+        return qs.none()
+    rank = Case(*[When(pk=pk, then=Value(i)) for i, pk in enumerate(ids)], output_field=IntegerField())
+    return qs.filter(pk__in=ids).annotate(search_rank=rank).order_by("search_rank")
+
+
+ORDERINGS = ("relevance", "trending")
+
+
+def search_params(data) -> dict:
+    """Request-ийн GET/query_params-аас filter_snippets-ийн аргументуудыг normalize хийж авна."""
+    ordering = (data.get("ordering") or "").strip()
+    return {
+        "q": (data.get("q") or "").strip(),
+        "tag": ",".join(parse_tags(data.get("tag") or "")),
+        "db_type": (data.get("db_type") or "").strip(),
+        "ordering": ordering if ordering in ORDERINGS else "",
+        "tag_mode": "any" if (data.get("tag_mode") or "").strip() == "any" else "all",
+        "mode": "boolean" if (data.get("mode") or "").strip() == "boolean" else "",
+    }
+
+
+def _scope(user):
+    perm = permission_scope(user)
+    db_types = None if perm.db_types is None else list(perm.db_types)
+    return scope_fingerprint(perm.role, perm.kinds, db_types), list(perm.kinds), db_types
+
+
+# Cache-д id жагсаалтын оронд: "VAULT_SEARCH_MAX_RESULTS-аас олон — live queryset ашигла"
+TOO_MANY_RESULTS = "too_many"
+
+
+def _ranked(qs, params):
+    if params["ordering"] == "trending":
+        return search_snippets(qs, params["q"], params["mode"]).order_by("-trend_score", "-id")
+    if params["ordering"]:
+        return bm25_search(qs, params["q"])
+    return search_snippets(qs, params["q"], params["mode"])
+
+
+def _counter_timeout(params, backend: str):
+    """
+    use_count / trend_score-оор эрэмбэлсэн жагсаалтын cache хугацаа. Тоолуур
+    copy бүрт өөрчлөгддөг тул generation нэмэхгүй — оронд нь богино TTL.
+    """
+    if params["ordering"] or backend == "index":  # BM25-ийн use_count prior
+        return float(getattr(settings, "VAULT_SEARCH_COUNTER_TTL", 60))
+    return None
+
+
+def filter_snippets(qs, user, q="", tag="", db_type="", ordering="", tag_mode="all", mode=""):
+    """
+    UI болон API-ийн нийтлэг шүүлт: tag / db_type / эрх / хайлт.
+    `tag` нь comma-separated байж болно (tag_mode="all" | "any").
+    `mode="boolean"` — MySQL FULLTEXT-ийн boolean синтакс (+word -word "phrase" pre*).
+    Хайлттай үед эрэмбэлсэн id-ууд эрхийн хүрээгээр cache-лэгдэнэ. Үр дүн
+    VAULT_SEARCH_MAX_RESULTS-аас олон бол id жагсаалт хадгалахгүй (зөвхөн тэр
+    тэмдэг) — live эрэмбэлсэн queryset буцаах тул хуудас/total/facet/stream таслагдахгүй.
+    """
+    params = search_params({"q": q, "tag": tag, "db_type": db_type, "ordering": ordering, "tag_mode": tag_mode,
+                            "mode": mode})
+    tag_names = parse_tags(params["tag"])
+    if tag_names:
+        qs = filter_by_tags(qs, tag_names, mode=params["tag_mode"])
+    if params["db_type"]:
+        qs = qs.filter(db_type=params["db_type"])
+
+    scope, kinds, db_types = _scope(user)
+    qs = permitted_snippets(qs, user, kinds=kinds, db_types=db_types)
+    if not params["q"]:
+        if params["ordering"] == "trending":
+            return qs.order_by("-trend_score", "-id")
+        return bm25_search(qs, "") if params["ordering"] else qs
+
+    backend = backend_name()
+    key = result_key(scope, backend=backend, **params)
+    ids = result_cache.get(key)
+    if ids is None:
+        limit = int(getattr(settings, "VAULT_SEARCH_MAX_RESULTS", 1000))
+        ids = list(_ranked(qs, params).values_list("pk", flat=True)[:limit + 1])
+        if len(ids) > limit:
+            ids = TOO_MANY_RESULTS
+        result_cache.set(key, ids, timeout=_counter_timeout(params, backend))
+    if ids == TOO_MANY_RESULTS:
+        return _ranked(qs, params)
+    return ordered_by_ids(qs, ids)
+
+
+FACET_FIELDS = ("db_type", "sql_kind", "tags")
+
+
+def compute_facets(qs, fields):
+    """
+    Шүүгдсэн queryset-ийн facet тоо: db_type + sql_kind нэг GROUP BY-аар,
+    tags нь Tag join хүснэгтээр.
+    """
+    ids = qs.order_by().values("pk")
+    facets = {}
+    scalar = [f for f in ("db_type", "sql_kind") if f in fields]
+    if scalar:
+        counts = {f: Counter() for f in scalar}
+        rows = QuerySnippet.objects.filter(pk__in=ids).order_by().values(*scalar).annotate(n=Count("pk"))
+        for row in rows:
+            for f in scalar:
+                counts[f][row[f]] += row["n"]
+        for f in scalar:
+            facets[f] = [{"value": v, "count": n} for v, n in counts[f].most_common()]
+    if "tags" in fields:
+        limit = int(getattr(settings, "VAULT_FACET_TAG_LIMIT", 50))
+        facets["tags"] = [{"value": r["tag__name"], "count": r["count"]} for r in tag_counts(ids, limit=limit)]
+    return facets
+
+
+def snippet_facets(qs, user, fields, **params):
+    """compute_facets-ийг хайлтын үр дүнтэй адил түлхүүрээр (эрхийн хүрээ + generation) cache-лэнэ."""
+    fields = [f for f in FACET_FIELDS if f in fields]
+    if not fields:
+        return {}
+    scope, _kinds, _db_types = _scope(user)
+    key = result_key(scope, facets=",".join(fields), **search_params(params))
+    facets = result_cache.get(key)
+    if facets is None:
+        facets = compute_facets(qs, fields)
+        result_cache.set(key, facets)
+    return facets
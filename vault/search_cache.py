@@ -0,0 +1,127 @@
+# vault/search_cache.py
+"""
+Хайлтын үр дүнгийн (id жагсаалт) cache.
+
+Түлхүүр = normalized query + эрхийн хүрээний fingerprint (role + kinds + db types)
++ generation. QuerySnippet-ийн агуулга өөрчлөгдөх (save/delete) бүрт generation
+нэмэгддэг тул хуучин үр дүн хэзээ ч буцаагдахгүй, LRU дарааллаар шахагдаж гарна.
+Тоолуур (use_count, trend_score) generation-д нөлөөлөхгүй — түүгээр эрэмбэлсэн
+жагсаалт `timeout` (VAULT_SEARCH_COUNTER_TTL)-оор хадгалагдаж, дараа нь дахин тооцогдоно.
+
+Generation нь `settings.VAULT_SEARCH_CACHE_ALIAS` cache дээр хадгалагдана. Тэр нь
+process-local (LocMemCache/DummyCache) бол өөр worker-ийн save-ийг мэдэх боломжгүй
+тул request хоорондын cache (энэ LRU, utils_perms) бүхэлдээ унтарна — олон
+process-той үед shared backend (Redis/Memcached/DB cache) тохируулна уу.
+"""
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+
+GENERATION_KEY = "vault:search:gen"
+
+
+def shared_cache():
+    """Process хоорондын cache; process-local backend бол None (invalidation бусад worker-т хүрэхгүй)."""
+    cache = caches[getattr(settings, "VAULT_SEARCH_CACHE_ALIAS", "default")]
+    if isinstance(cache, (LocMemCache, DummyCache)):
+        return None
+    return cache
+
+
+def current_generation() -> int:
+    c = shared_cache()
+    if c is None:
+        return 0
+    gen = c.get(GENERATION_KEY)
+    if gen is None:
+        c.add(GENERATION_KEY, 1, timeout=None)
+        gen = c.get(GENERATION_KEY, 1)
+    return gen
+
+
+def bump_generation():
+    c = shared_cache()
+    if c is None:
+        return
+    try:
+        c.incr(GENERATION_KEY)
+    except ValueError:
+        c.set(GENERATION_KEY, 2, timeout=None)
+
+
+class SearchResultCache:
+    """Process доторх хэмжээ хязгаартай LRU (thread-safe). Shared cache байхгүй бол идэвхгүй."""
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def enabled(self) -> bool:
+        return self.max_entries > 0 and shared_cache() is not None
+
+    def get(self, key):
+        if not self.enabled():
+            return None
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None and entry[0] is not None and entry[0] <= time.monotonic():
+                del self._data[key]
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key, value, timeout=None):
+        """`timeout` (секунд) — generation-оос гадуур өөрчлөгддөг өгөгдөлд (тоолуур) тулгуурласан үр дүн."""
+        if not self.enabled():
+            return
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._lock:
+            self._data[key] = (deadline, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self.hits = self.misses = 0
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "enabled": self.enabled(),
+            "entries": len(self._data),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+            "generation": current_generation(),
+        }
+
+
+result_cache = SearchResultCache(int(getattr(settings, "VAULT_SEARCH_CACHE_SIZE", 2048)))
+
+
+def scope_fingerprint(role: str, kinds, db_types) -> str:
+    dbs = "*" if db_types is None else ",".join(sorted(db_types))
+    return f"{role}|{','.join(sorted(kinds))}|{dbs}"
+
+
+def result_key(scope: str, **params) -> str:
+    norm = {k: " ".join(str(v or "").lower().split()) for k, v in params.items()}
+    raw = json.dumps([scope, norm], ensure_ascii=False, sort_keys=True).encode("utf-8")
+    return f"{current_generation()}:{hashlib.sha1(raw).hexdigest()}"
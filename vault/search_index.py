@@ -0,0 +1,180 @@
+# vault/search_index.py
+import math
+import re
+from collections import Counter
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, F, FloatField, OuterRef, Subquery, Sum, Value, When
+from django.db.models.functions import Cast, Ln
+
+from .models import SEARCH_FIELDS, FieldStat, QuerySnippet, SnippetTerm, TermStat
+
+TOKEN_RE = re.compile(r"[0-9A-Za-z_А-Яа-яӨөҮүЁё]+")
+MIN_TOKEN_LEN = 3
+MAX_TERM_LEN = 64
+
+# Postgres-ийн A/B/C жинтэй ижил (A=1.0, B=0.4, C=0.2)
+FIELD_WEIGHTS = {
+    "title": 1.0,
+    "description": 0.4,
+    "tags": 0.4,
+    "sql_text": 0.2,
+}
+
+# BM25 талбарын boost (settings.VAULT_SEARCH_FIELD_BOOSTS-оор дарна)
+DEFAULT_FIELD_BOOSTS = {
+    "title": 3.0,
+    "tags": 2.0,
+    "description": 1.0,
+    "sql_text": 0.5,
+}
+
+
+def tokenize(text: str):
+    tokens = TOKEN_RE.findall((text or "").lower())
+    return [t[:MAX_TERM_LEN] for t in tokens if len(t) >= MIN_TOKEN_LEN]
+
+
+def snippet_postings(title="", description="", sql_text="", tags=""):
+    """(field, term, tf) жагсаалт буцаана (migration 0004/0006 өөрийн хуулбартай)."""
+    values = {"title": title, "description": description, "sql_text": sql_text, "tags": tags}
+    rows = []
+    for field in SEARCH_FIELDS:
+        for term, tf in Counter(tokenize(values[field])).items():
+            rows.append((field, term, tf))
+    return rows
+
+
+def field_lengths(rows):
+    lens = Counter()
+    for field, _term, tf in rows:
+        lens[field] += tf
+    return lens
+
+
+def index_snippet(snippet: QuerySnippet, created: bool = False):
+    """
+    Нэг snippet-ийн posting-уудыг бүрэн сольж бичээд BM25-ийн статистикийг
+    (TermStat.df, FieldStat.total_len/docs) зөрүүгээр нь шинэчилнэ.
+    """
+    rows = snippet_postings(snippet.title, snippet.description, snippet.sql_text, snippet.tags)
+    new_lens = field_lengths(rows)
+    with transaction.atomic():
+        old = list(SnippetTerm.objects.filter(snippet_id=snippet.pk).values_list("field", "term", "tf"))
+        SnippetTerm.objects.filter(snippet_id=snippet.pk).delete()
+        SnippetTerm.objects.bulk_create([
+            SnippetTerm(snippet_id=snippet.pk, field=f, term=t, tf=tf, field_len=new_lens[f])
+            for f, t, tf in rows
+        ])
+        _apply_stats_delta(
+            old_terms={t for _f, t, _tf in old},
+            new_terms={t for _f, t, _tf in rows},
+            old_lens=field_lengths(old),
+            new_lens=new_lens,
+            doc_delta=1 if created else 0,
+        )
+
+
+def unindex_snippet(snippet: QuerySnippet):
+    """Устгахын өмнө статистикаас хасна (posting-ууд CASCADE-аар устана)."""
+    old = list(SnippetTerm.objects.filter(snippet_id=snippet.pk).values_list("field", "term", "tf"))
+    _apply_stats_delta(
+        old_terms={t for _f, t, _tf in old},
+        new_terms=set(),
+        old_lens=field_lengths(old),
+        new_lens=Counter(),
+        doc_delta=-1,
+    )
+
+
+def _apply_stats_delta(old_terms, new_terms, old_lens, new_lens, doc_delta):
+    removed = sorted(old_terms - new_terms)
+    added = sorted(new_terms - old_terms)
+    if removed:
+        TermStat.objects.filter(term__in=removed).update(df=F("df") - 1)
+    if added:
+        TermStat.objects.bulk_create([TermStat(term=t, df=0) for t in added], ignore_conflicts=True)
+        TermStat.objects.filter(term__in=added).update(df=F("df") + 1)
+
+    len_delta = {f: new_lens[f] - old_lens[f] for f in SEARCH_FIELDS}
+    if doc_delta or any(len_delta.values()):
+        FieldStat.objects.update(
+            total_len=F("total_len") + Case(
+                *[When(field=f, then=Value(d)) for f, d in len_delta.items()],
+                default=Value(0),
+            ),
+            docs=F("docs") + doc_delta,
+        )
+
+
+def ensure_field_stats():
+    FieldStat.objects.bulk_create([FieldStat(field=f) for f in SEARCH_FIELDS], ignore_conflicts=True)
+
+
+def matching_ids(q: str):
+    """Query-н аль нэг token агуулсан snippet id-ийн subquery (индексээр)."""
+    tokens = sorted(set(tokenize(q)))
+    if not tokens:
+        return None
+    return SnippetTerm.objects.filter(term__in=tokens).values("snippet_id")
+
+
+# ------------- BM25 -------------
+def _bm25_params():
+    boosts = {**DEFAULT_FIELD_BOOSTS, **getattr(settings, "VAULT_SEARCH_FIELD_BOOSTS", {})}
+    k1 = float(getattr(settings, "VAULT_SEARCH_BM25_K1", 1.2))
+    b = float(getattr(settings, "VAULT_SEARCH_BM25_B", 0.75))
+    pop = float(getattr(settings, "VAULT_SEARCH_POPULARITY_WEIGHT", 0.5))
+    return boosts, k1, b, pop
+
+
+def popularity_prior(weight: float):
+    # log(1 + use_count) — олон хуулагдсан snippet бага зэрэг дээшилнэ
+    return Value(weight) * Ln(Cast(F("use_count"), FloatField()) + Value(1.0))
+
+
+def bm25_search(qs, q: str):
+    """
+    BM25F: талбар бүрийн tf-ийг boost-оор жинлэж, `relevance` annotation
+    (+ use_count prior)-аар эрэмбэлнэ. df, талбарын урт нь урьдчилан
+    тооцсон TermStat/FieldStat/SnippetTerm.field_len-ээс уншигдана.
+    """
+    boosts, k1, b, pop = _bm25_params()
+    prior = popularity_prior(pop)
+    tokens = sorted(set(tokenize(q)))
+    if not tokens:
+        return qs.annotate(relevance=prior).order_by("-relevance", "-updated_at")
+
+    stats = {f: (total, docs) for f, total, docs in FieldStat.objects.values_list("field", "total_len", "docs")}
+    n_docs = max([docs for _t, docs in stats.values()] or [0])
+    dfs = dict(TermStat.objects.filter(term__in=tokens, df__gt=0).values_list("term", "df"))
+    if not dfs:
+        return qs.none()
+    idf = {t: math.log(1.0 + (n_docs - df + 0.5) / (df + 0.5)) for t, df in dfs.items()}
+
+    def avg_len(f):
+        total, docs = stats.get(f, (0, 0))
+        return (total / docs) if docs and total else 1.0
+
+    tf = Cast(F("tf"), FloatField())
+    idf_case = Case(*[When(term=t, then=Value(v)) for t, v in idf.items()],
+                    default=Value(0.0), output_field=FloatField())
+    boost_case = Case(*[When(field=f, then=Value(boosts.get(f, 1.0) * (k1 + 1))) for f in SEARCH_FIELDS],
+                      default=Value(0.0), output_field=FloatField())
+    len_case = Case(*[When(field=f, then=Value(k1 * b / avg_len(f))) for f in SEARCH_FIELDS],
+                    default=Value(0.0), output_field=FloatField())
+    norm = Value(k1 * (1 - b)) + Cast(F("field_len"), FloatField()) * len_case
+
+    score = (
+        SnippetTerm.objects
+        .filter(snippet_id=OuterRef("pk"), term__in=list(idf))
+        .values("snippet_id")
+        .annotate(s=Sum(idf_case * boost_case * tf / (tf + norm), output_field=FloatField()))
+        .values("s")
+    )
+    return (
+        qs.filter(pk__in=SnippetTerm.objects.filter(term__in=list(idf)).values("snippet_id"))
+        .annotate(relevance=Subquery(score, output_field=FloatField()) + prior)
+        .order_by("-relevance", "-updated_at")
+    )
@@ -0,0 +1,104 @@
+# vault/search_mysql.py
+import re
+from functools import reduce
+from operator import add
+
+from django.db.models import F, FloatField, Func, Lookup, Value
+
+from .models import SEARCH_FIELDS
+from .search_index import FIELD_WEIGHTS
+
+# Boolean mode-ыг зөвхөн `mode="boolean"` (API/UI-ийн ?mode=boolean) үед ашиглана —
+# тэмдэгтээс таамаглавал и-мэйл (`@`), `user-id` зэрэг энгийн хайлт 1064 алдаа болно
+PREFIX_OPERATORS = "+-~<>"
+WORD_RE = re.compile(r"\w+", re.UNICODE)
+
+
+class MatchAgainst(Func):
+    """MATCH (col, ...) AGAINST (%s IN <mode> MODE) — relevance оноо буцаана."""
+    output_field = FloatField()
+
+    def __init__(self, *columns, query, mode="natural"):
+        super().__init__(*[F(c) for c in columns])
+        self.query = query
+        self.mode = mode
+
+    def as_sql(self, compiler, connection, **extra_context):
+        cols, params = [], []
+        for expr in self.get_source_expressions():
+            sql, p = compiler.compile(expr)
+            cols.append(sql)
+            params.extend(p)
+        mode = "BOOLEAN" if self.mode == "boolean" else "NATURAL LANGUAGE"
+        return f"MATCH ({', '.join(cols)}) AGAINST (%s IN {mode} MODE)", [*params, self.query]
+
+
+class _Matches(Lookup):
+    """`WHERE MATCH(...) AGAINST(...)` хэлбэрээр (= 1 харьцуулалтгүй) бичнэ — тэгэхгүй бол MySQL индекс ашиглахгүй."""
+    lookup_name = "ft_matches"
+    prepare_rhs = False
+
+    def as_sql(self, compiler, connection):
+        return compiler.compile(self.lhs)
+
+
+def boolean_query(q: str) -> str:
+    """
+    InnoDB-ийн BOOLEAN MODE-д алдаа өгөхгүй хэлбэр: үг бүр нэг угтвар оператор
+    (+ - ~ < >), төгсгөлд `*` авч болно; хаалт/ишлэл тэнцвэртэй бол л үлдэнэ,
+    `@distance` болон үгийн дундах тэмдэгтүүд (`user-id`) phrase болно.
+    """
+    keep_quotes = q.count('"') % 2 == 0
+    depth, keep_parens = 0, True
+    for ch in q:
+        depth += {"(": 1, ")": -1}.get(ch, 0)
+        keep_parens = keep_parens and depth >= 0
+    keep_parens = keep_parens and depth == 0
+
+    out, phrase = [], None
+    for token in re.split(r'(\s+|[()"])', q):
+        if not token or token.isspace():
+            continue
+        if token == '"':
+            if not keep_quotes:
+                continue
+            if phrase is None:
+                phrase = []
+            else:
+                if phrase:
+                    out.append('"' + " ".join(phrase) + '"')
+                phrase = None
+            continue
+        if phrase is not None:
+            phrase.extend(WORD_RE.findall(token))
+            continue
+        if token in "()":
+            if keep_parens:
+                out.append(token)
+            continue
+        words = WORD_RE.findall(token)
+        if not words:
+            continue
+        prefix = token[0] if token[0] in PREFIX_OPERATORS else ""
+        if len(words) == 1:
+            out.append(prefix + words[0] + ("*" if token.endswith("*") else ""))
+        else:
+            out.append(prefix + '"' + " ".join(words) + '"')
+    return " ".join(out).replace("( ", "(").replace(" )", ")").replace("()", "").strip()
+
+
+def fulltext_search(qs, q: str, mode: str = "natural"):
+    """
+    FULLTEXT индексээр шүүж, жинлэсэн MATCH оноогоор (`rank`) эрэмбэлнэ.
+    `mode="boolean"` үед query-г boolean_query-оор цэвэрлэнэ; бусад үед natural language.
+    """
+    q = (q or "").strip()
+    if mode == "boolean":
+        q = boolean_query(q)
+    else:
+        mode = "natural"
+    if not q:
+        return qs
+    qs = qs.filter(_Matches(MatchAgainst(*SEARCH_FIELDS, query=q, mode=mode), True))
+    rank = reduce(add, [MatchAgainst(f, query=q, mode=mode) * Value(w) for f, w in FIELD_WEIGHTS.items()])
+    return qs.annotate(rank=rank).order_by("-rank", "-updated_at")
@@ -1,6 +1,6 @@
 from rest_framework import serializers
-from .models import QuerySnippet, classify_sql_kind
-from .sql_validation import validate_sql, SQLSyntaxError
+from .models import QuerySnippet
+from .sql_validation import analyze_sql
 
 
 class QuerySnippetSerializer(serializers.ModelSerializer):
@@ -19,6 +19,7 @@ class QuerySnippetSerializer(serializers.ModelSerializer):
             "tags",
             "tag_list",
             "sql_kind",  # ← API-д харуулна
+            "sql_fingerprint",
             "created_by",
             "use_count",
             "created_at",
@@ -30,39 +31,38 @@ class QuerySnippetSerializer(serializers.ModelSerializer):
             "created_at",
             "updated_at",
             "sql_kind",  # ← client-с шууд өөрчилдөггүй
+            "sql_fingerprint",
         ]
 
+    sql_analysis = None
+
     def validate(self, attrs):
         attrs = super().validate(attrs)
-        # SQL синтакс шалгалт (sqlglot)
-        try:
-            validate_sql(attrs.get("sql_text"), attrs.get("db_type"))
-        except SQLSyntaxError as e:
-            raise serializers.ValidationError({"sql_text": f"SQL syntax error: {e}"})
+        # SQL синтакс шалгалт (sqlglot) — нэг удаа parse; kind-ийг view, save дахин ашиглана
+        instance = self.instance if isinstance(self.instance, QuerySnippet) else None
+        self.sql_analysis = analyze_sql(
+            attrs.get("sql_text", getattr(instance, "sql_text", None)),
+            attrs.get("db_type", getattr(instance, "db_type", None)),
+        )
+        if not self.sql_analysis.ok:
+            a = self.sql_analysis
+            raise serializers.ValidationError({"sql_text": a.error if a.guard else f"SQL syntax error: {a.error}"})
         return attrs
 
     def create(self, validated_data):
         """
         - created_by-г request-ээс онооно
-        - sql_kind-ийг автоматаар тооцоод хадгална
+        - sql_kind-ийг QuerySnippet.save validate()-ийн analysis-аас авна (дахин parse/UPDATE хийхгүй)
         """
         req = self.context.get("request")
         if req and getattr(req, "user", None) and req.user.is_authenticated:
             validated_data["created_by"] = req.user
 
-        obj = super().create(validated_data)
-
-        # Моделийн save() автоматаар тооцдог байж магадгүй ч
-        # энд дахин баталгаажуулж update хийе
-        obj.sql_kind = classify_sql_kind(obj.sql_text)
-        obj.save(update_fields=["sql_kind"])
+        obj = QuerySnippet(**validated_data)
+        obj._sql_analysis = self.sql_analysis
+        obj.save()
         return obj
 
     def update(self, instance, validated_data):
-        """
-        UPDATE үед ч sql_kind-ийг дахин тооцно.
-        """
-        obj = super().update(instance, validated_data)
-        obj.sql_kind = classify_sql_kind(obj.sql_text)
-        obj.save(update_fields=["sql_kind"])
-        return obj
+        instance._sql_analysis = self.sql_analysis
+        return super().update(instance, validated_data)
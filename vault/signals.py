@@ -0,0 +1,63 @@
+# vault/signals.py
+"""
+Эрхийн хүрээний cache-ийг (utils_perms.permission_scope) хүчингүй болгох, мөн
+QuerySnippet устгахад хайлтын статистик/cache-ийг засах signal-ууд.
+"""
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Group
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from .models import QuerySnippet, UserDBAccess
+from .search_cache import bump_generation
+from .search_index import unindex_snippet
+from .utils_perms import invalidate_permission_scope
+
+User = get_user_model()
+
+
+@receiver(m2m_changed, sender=User.groups.through)
+def _groups_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ("post_add", "post_remove", "pre_clear", "post_clear"):
+        return
+    if not reverse:
+        # user.groups.add/remove/clear
+        invalidate_permission_scope(instance.pk)
+    elif action == "pre_clear":
+        # group.user_set.clear() — post_clear үед pk_set хоосон ирдэг
+        invalidate_permission_scope(*instance.user_set.values_list("pk", flat=True))
+    elif pk_set:
+        invalidate_permission_scope(*pk_set)
+
+
+@receiver(post_save, sender=Group)
+@receiver(pre_delete, sender=Group)
+def _group_changed(sender, instance, **kwargs):
+    # Нэр солигдох/устгагдахад гишүүдийн role өөрчлөгдөж болно
+    invalidate_permission_scope(*instance.user_set.values_list("pk", flat=True))
+
+
+@receiver(post_save, sender=UserDBAccess)
+@receiver(post_delete, sender=UserDBAccess)
+def _db_access_changed(sender, instance, **kwargs):
+    invalidate_permission_scope(instance.user_id)
+
+
+@receiver(post_save, sender=User)
+def _user_changed(sender, instance, created, **kwargs):
+    # is_staff / is_superuser өөрчлөгдсөн байж болно
+    if not created:
+        invalidate_permission_scope(instance.pk)
+
+
+@receiver(pre_delete, sender=QuerySnippet)
+def _snippet_deleting(sender, instance, **kwargs):
+    # instance.delete(), queryset.delete() болон CASCADE бүгд энд ирнэ;
+    # posting-ууд CASCADE-аар устахаас өмнө TermStat/FieldStat-аас хасна
+    unindex_snippet(instance)
+
+
+@receiver(post_delete, sender=QuerySnippet)
+def _snippet_deleted(sender, instance, **kwargs):
+    transaction.on_commit(bump_generation)
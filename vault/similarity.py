@@ -0,0 +1,186 @@
+# vault/similarity.py
+"""
+Сүлжээгүй (local) vector similarity: AI few-shot жишээ болон `suggestions`-д.
+
+Snippet бүрийг hashing-vectorizer-ээр (үг + үгийн доторх 3-gram, signed hash)
+VECTOR_DIM хэмжээтэй float32 vector болгож SnippetEmbedding-д хадгална.
+Process бүр бүх vector-ийг нэг NumPy матрицад (мөр бүр L2-normalized) барьж,
+query-г нэг matrix-vector үржвэрээр (cosine) эрэмбэлнэ. Матриц нь
+`updated_at`-аар зөвхөн өөрчлөгдсөн мөрүүдийг татаж шинэчлэгдэнэ.
+"""
+import math
+import threading
+import time
+import zlib
+from collections import Counter
+
+import numpy as np
+from django.conf import settings
+
+from .models import QuerySnippet, SnippetEmbedding
+from .search_index import tokenize
+
+VECTOR_DIM = 256  # өөрчилбөл бүх SnippetEmbedding-ийг дахин тооцно
+NGRAM = 3
+
+# Талбарын жин (асуулт ихэвчлэн title/description-тэй төстэй)
+FIELD_WEIGHTS = {
+    "title": 2.0,
+    "description": 1.0,
+    "tags": 1.5,
+    "sql_text": 0.5,
+}
+
+
+def _features(text: str, weight: float, counts: Counter):
+    for tok in tokenize(text):
+        counts[tok] += weight
+        padded = f"<{tok}>"
+        for i in range(len(padded) - NGRAM + 1):
+            counts["#" + padded[i:i + NGRAM]] += weight * 0.5
+
+
+def embed_text(**fields) -> np.ndarray:
+    """{field: text} → L2-normalized float32 vector (хоосон бол тэг vector)."""
+    counts = Counter()
+    for field, text in fields.items():
+        _features(text or "", FIELD_WEIGHTS.get(field, 1.0), counts)
+    vec = np.zeros(VECTOR_DIM, dtype=np.float32)
+    for feat, w in counts.items():
+        h = zlib.crc32(feat.encode("utf-8"))
+        sign = 1.0 if h & 0x80000000 else -1.0
+        vec[h % VECTOR_DIM] += sign * (1.0 + math.log(w)) if w >= 1 else sign * w
+    norm = float(np.linalg.norm(vec))
+    return vec / norm if norm else vec
+
+
+def embed_snippet(title="", description="", sql_text="", tags="") -> np.ndarray:
+    return embed_text(title=title, description=description, sql_text=sql_text, tags=tags)
+
+
+def embed_query(text: str) -> np.ndarray:
+    # Асуултыг title/description-тэй адил жинтэй харьцуулна
+    return embed_text(title=text)
+
+
+def index_embedding(snippet: QuerySnippet):
+    vec = embed_snippet(snippet.title, snippet.description, snippet.sql_text, snippet.tags)
+    SnippetEmbedding.objects.update_or_create(snippet_id=snippet.pk, defaults={"vector": vec.tobytes()})
+    vector_index.upsert(snippet.pk, vec)
+
+
+class VectorIndex:
+    """Process доторх (ids, matrix) — thread-safe, incremental refresh."""
+
+    def __init__(self, dim: int = VECTOR_DIM):
+        self.dim = dim
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        self._ids = np.zeros(0, dtype=np.int64)
+        self._matrix = np.zeros((0, self.dim), dtype=np.float32)
+        self._size = 0
+        self._row = {}
+        self._since = None
+        self._checked = 0.0
+
+    def _ensure_capacity(self, n):
+        if n <= len(self._ids):
+            return
+        cap = max(n, 2 * len(self._ids), 1024)
+        ids = np.zeros(cap, dtype=np.int64)
+        matrix = np.zeros((cap, self.dim), dtype=np.float32)
+        ids[:self._size] = self._ids[:self._size]
+        matrix[:self._size] = self._matrix[:self._size]
+        self._ids, self._matrix = ids, matrix
+
+    def _put(self, pk, vec):
+        row = self._row.get(pk)
+        if row is None:
+            self._ensure_capacity(self._size + 1)
+            row = self._row[pk] = self._size
+            self._ids[row] = pk
+            self._size += 1
+        self._matrix[row] = vec
+
+    def upsert(self, pk, vec):
+        with self._lock:
+            self._put(pk, vec)
+
+    def refresh(self, force=False):
+        """
+        `since`-ээс хойш өөрчлөгдсөн embedding-үүдийг татна. Устгалтыг (CASCADE)
+        мөрийн тоо зөрөхөд бүрэн дахин ачаалж барина.
+        """
+        interval = float(getattr(settings, "VAULT_SIMILARITY_REFRESH_SECONDS", 5))
+        now = time.monotonic()
+        if not force and now - self._checked < interval:
+            return
+        with self._lock:
+            self._checked = now
+            if force or self._since is None or SnippetEmbedding.objects.count() < self._size:
+                self._reset()
+                self._checked = now
+            qs = SnippetEmbedding.objects.order_by("updated_at")
+            if self._since is not None:
+                qs = qs.filter(updated_at__gte=self._since)
+            for pk, data, updated in qs.values_list("snippet_id", "vector", "updated_at").iterator(chunk_size=2000):
+                vec = np.frombuffer(bytes(data), dtype=np.float32)
+                if vec.shape[0] == self.dim:
+                    self._put(pk, vec)
+                self._since = updated
+
+    def top_k(self, vec: np.ndarray, k: int, min_score: float = 0.0):
+        """[(snippet_id, score), ...] cosine-оор буурахаар."""
+        for batch in self.ranked(vec, min_score=min_score, batch=k):
+            return batch
+        return []
+
+    def ranked(self, vec: np.ndarray, min_score: float = 0.0, batch: int = 64):
+        """
+        min_score-оос өндөр бүх мөрийг cosine-оор буурахаар, chunk-аар
+        ([(snippet_id, score), ...]) yield хийнэ. Chunk бүр өмнөхөөсөө 2 дахин том,
+        зөвхөн тухайн chunk-ийг эрэмбэлнэ — эхний хэдэн chunk-аар зогсвол бүтэн sort хийхгүй.
+        """
+        self.refresh()
+        with self._lock:
+            n = self._size
+            if not n or batch <= 0 or not vec.any():
+                return
+            scores = self._matrix[:n] @ vec
+            ids = self._ids[:n].copy()
+        rest = np.flatnonzero(scores > min_score)
+        while len(rest):
+            if len(rest) > batch:
+                part = np.argpartition(-scores[rest], batch - 1)
+                head, rest = rest[part[:batch]], rest[part[batch:]]
+            else:
+                head, rest = rest, rest[:0]
+            head = head[np.argsort(-scores[head], kind="stable")]
+            yield [(int(ids[i]), float(scores[i])) for i in head]
+            batch *= 2
+
+    def stats(self) -> dict:
+        return {"rows": self._size, "dim": self.dim, "bytes": int(self._matrix.nbytes)}
+
+
+vector_index = VectorIndex()
+
+
+def similar_ids(text: str, qs, k: int = 8):
+    """
+    `qs` (ж: эрхээр шүүсэн) доторх хамгийн төстэй k snippet-ийн id.
+    Эрхгүй мөрүүдийг хасах тул эрэмбээр доошлон (k·10, k·20, ... хэмжээтэй chunk
+    бүрт нэг query) k мөр олдох эсвэл min_score-оос өндөр мөр дуустал шүүнэ.
+    """
+    min_score = float(getattr(settings, "VAULT_SIMILARITY_MIN_SCORE", 0.1))
+    found = []
+    if k <= 0:
+        return found
+    for candidates in vector_index.ranked(embed_query(text), min_score=min_score, batch=k * 10):
+        allowed = set(qs.filter(pk__in=[pk for pk, _s in candidates]).values_list("pk", flat=True))
+        found.extend(pk for pk, _s in candidates if pk in allowed)
+        if len(found) >= k:
+            break
+    return found[:k]
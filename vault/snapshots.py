@@ -0,0 +1,55 @@
+# vault/snapshots.py
+"""
+Copy log-ийн SQL snapshot-ийг агуулгын hash-аар (sha256) нэг л удаа хадгална.
+
+VAULT_SNAPSHOT_COMPRESS=True бол VAULT_SNAPSHOT_COMPRESS_MIN байтаас урт
+текстийг zlib-ээр шахаж `data`-д хадгална (ийм мөр admin-ы текст хайлтад орохгүй).
+Migration 0014 эдгээр функцийн өөрийн хуулбартай.
+"""
+import hashlib
+import zlib
+
+from django.conf import settings
+
+
+def snapshot_hash(text: str) -> str:
+    return hashlib.sha256((text or "").encode("utf-8")).hexdigest()
+
+
+def encode_snapshot(text: str, compress=None, min_bytes=None):
+    """text → (sql_text, data, size). Шахсан бол sql_text="" ба data=zlib bytes."""
+    text = text or ""
+    raw = text.encode("utf-8")
+    compress = getattr(settings, "VAULT_SNAPSHOT_COMPRESS", False) if compress is None else compress
+    min_bytes = int(getattr(settings, "VAULT_SNAPSHOT_COMPRESS_MIN", 1024)) if min_bytes is None else min_bytes
+    if compress and len(raw) >= min_bytes:
+        return "", zlib.compress(raw, 6), len(raw)
+    return text, None, len(raw)
+
+
+def decode_snapshot(sql_text: str, data) -> str:
+    if data:
+        return zlib.decompress(bytes(data)).decode("utf-8")
+    return sql_text or ""
+
+
+def snapshot_ids(texts, model=None):
+    """
+    Текстүүдийн snapshot id-г {sha256: id} хэлбэрээр буцаана — байхгүйг нь
+    bulk_create (ignore_conflicts) хийнэ. Нэг batch-д 2 query.
+    """
+    if model is None:
+        from .models import SQLSnapshot as model
+    by_hash = {snapshot_hash(t): t for t in texts}
+    if not by_hash:
+        return {}
+    found = dict(model.objects.filter(sha256__in=by_hash).values_list("sha256", "id"))
+    missing = [h for h in by_hash if h not in found]
+    if missing:
+        rows = []
+        for h in missing:
+            sql_text, data, size = encode_snapshot(by_hash[h])
+            rows.append(model(sha256=h, sql_text=sql_text, data=data, size=size))
+        model.objects.bulk_create(rows, ignore_conflicts=True, batch_size=500)
+        found.update(model.objects.filter(sha256__in=missing).values_list("sha256", "id"))
+    return found
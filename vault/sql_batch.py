@@ -0,0 +1,179 @@
+# vault/sql_batch.py
+"""
+Олон SQL-ийг зэрэг шалгах (`POST /api/snippets/validate_sql_batch/`) ба бүх
+snippet-ийг дахин ангилах (`reanalyze_snippets` command).
+
+sqlglot нь цэвэр Python (GIL) тул thread биш process pool-д тараана. Parse cache-д
+байгаа текстийг parent process шууд хариулна; үлдсэнийг pool-д chunk-аар өгч,
+үр дүнг (AST-гүй kind/алдаа/canonical) cache-д буцааж хадгална. Үр дүн оролтын дарааллаар,
+lazy-аар гарна (stream хийхэд тохиромжтой). Цөөн item-ийг pool-гүйгээр шалгана.
+"""
+import logging
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import replace
+
+from django.conf import settings
+
+from .sql_validation import (
+    DIALECT_MAP, SQLAnalysis, _analyze_guarded, _cache_key, analyze_sql, analyze_with_alarm, parse_cache, record_guard,
+)
+
+logger = logging.getLogger(__name__)
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def pool_workers() -> int:
+    return int(getattr(settings, "VAULT_SQL_VALIDATE_WORKERS", None) or os.cpu_count() or 1)
+
+
+def _get_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=pool_workers())
+        return _pool
+
+
+def _reset_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
+
+def _parse_in_worker(item):
+    """Pool worker дотор (SIGALRM хугацааны хязгаартай): (text, dialect) → SQLAnalysis.to_wire()."""
+    return analyze_with_alarm(*item).to_wire()
+
+
+def _parse_inline(item):
+    """Request thread дээр — урт SQL-ийг kill хийж болох process-д (guard-ыг өөрөө тоолно)."""
+    return _analyze_guarded(*item).to_wire()
+
+
+def result_dict(analysis: SQLAnalysis) -> dict:
+    return {
+        "ok": analysis.ok,
+        "dialect": analysis.dialect,
+        "kind": analysis.kind,
+        "statements": analysis.statement_count,
+        "error": analysis.error or None,
+        "guard": analysis.guard or None,
+    }
+
+
+def analyze_many(items):
+    """
+    items: [(sql_text, db_type), ...] → оролтын дарааллаар result_dict-үүдийг yield хийнэ.
+    """
+    items = [((sql or "").strip(), db_type or "other") for sql, db_type in items]
+    done, misses = {}, []
+    for i, (text, db_type) in enumerate(items):
+        dialect = DIALECT_MAP.get(db_type, "mysql")
+        cached = parse_cache.get(_cache_key(text, dialect)) if text else None
+        if cached is not None or not text:
+            done[i] = result_dict(cached or analyze_sql(text, db_type))
+        else:
+            misses.append((i, text, dialect))
+
+    # parsed: (SQLAnalysis.to_wire(), guard тоологдсон эсэх)
+    if len(misses) < int(getattr(settings, "VAULT_SQL_VALIDATE_POOL_MIN", 8)):
+        parsed = ((_parse_inline((text, dialect)), True) for _i, text, dialect in misses)
+    else:
+        chunksize = max(1, len(misses) // (pool_workers() * 4))
+        parsed = _pool_map([(text, dialect) for _i, text, dialect in misses], chunksize)
+
+    pending = iter(zip(misses, parsed))
+    for i in range(len(items)):
+        if i in done:
+            yield done.pop(i)
+            continue
+        (_i, text, dialect), (wire, recorded) = next(pending)
+        analysis = SQLAnalysis.from_wire(text, items[i][1], dialect, wire)
+        if not recorded:
+            record_guard(analysis)  # worker process-ийн тоолуур энд харагдахгүй
+        parse_cache.set(_cache_key(text, dialect), analysis)
+        yield result_dict(analysis)
+
+
+def _pool_map(args, chunksize):
+    """Pool-оор (дарааллаа хадгалан) parse хийнэ; pool эвдэрвэл үлдсэнийг энд шалгана."""
+    position = 0
+    try:
+        for result in _get_pool().map(_parse_in_worker, args, chunksize=chunksize):
+            position += 1
+            yield result, False
+    except BrokenProcessPool:
+        logger.exception("SQL validation pool broke, finishing %d item(s) inline", len(args) - position)
+        _reset_pool()
+        for item in args[position:]:
+            yield _parse_inline(item), True
+
+
+# ------------- bulk re-analysis -------------
+def _init_reanalyze_worker():
+    # spawn үед worker-т Django ачаалагдаагүй байна (fork үед аль хэдийн бэлэн)
+    import django
+    from django.apps import apps
+    if not apps.ready:
+        django.setup()
+
+
+def _reanalyze_row(row):
+    """Worker дотор: (pk, sql_text, db_type) → (pk, kind, fingerprint, guard) — нэг parse."""
+    from .dedupe import sql_fingerprint
+
+    pk, sql_text, db_type = row
+    db_type = db_type or "other"
+    analysis = analyze_with_alarm((sql_text or "").strip(), DIALECT_MAP.get(db_type, "mysql"))
+    analysis = replace(analysis, sql_text=sql_text or "", db_type=db_type)
+    return pk, analysis.kind, sql_fingerprint(sql_text, db_type, analysis=analysis), analysis.guard
+
+
+def reanalyze_snippets(queryset=None, chunk: int = 2000, start_after: int = 0, workers=None,
+                       dry_run=False, on_chunk=None):
+    """
+    sql_kind / sql_fingerprint-ийг id-ийн дарааллаар chunk-аар дахин тооцно
+    (classify дүрэм эсвэл DIALECT_MAP солигдсоны дараа). Parse нь process pool-д;
+    зөвхөн өөрчлөгдсөн мөрийг нэг bulk_update-аар бичнэ (save() дуудахгүй).
+    `on_chunk(last_id, scanned, changes)` — changes: [(pk, old_kind, new_kind, fingerprint өөрчлөгдсөн эсэх)].
+    """
+    from .models import QuerySnippet
+    from .search_cache import bump_generation
+
+    qs = (QuerySnippet.objects.all() if queryset is None else queryset).order_by("pk")
+    fields = ("pk", "sql_text", "db_type", "sql_kind", "sql_fingerprint")
+    last_id, scanned, changed, guarded = start_after, 0, 0, 0
+    workers = workers or pool_workers()
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_reanalyze_worker) as pool:
+        while True:
+            rows = list(qs.filter(pk__gt=last_id).values_list(*fields)[:chunk])
+            if not rows:
+                break
+            current = {pk: (kind, fp) for pk, _sql, _db, kind, fp in rows}
+            results = pool.map(
+                _reanalyze_row, [(pk, sql, db) for pk, sql, db, _k, _f in rows],
+                chunksize=max(1, len(rows) // (workers * 4)),
+            )
+            changes, objs = [], []
+            for pk, kind, fingerprint, guard in results:
+                guarded += bool(guard)
+                old_kind, old_fp = current[pk]
+                if (kind, fingerprint) != (old_kind, old_fp):
+                    changes.append((pk, old_kind, kind, fingerprint != old_fp))
+                    objs.append(QuerySnippet(pk=pk, sql_kind=kind, sql_fingerprint=fingerprint))
+            if objs and not dry_run:
+                QuerySnippet.objects.bulk_update(objs, ["sql_kind", "sql_fingerprint"], batch_size=500)
+                bump_generation()  # sql_kind-аар шүүсэн хайлтын cache
+            last_id = rows[-1][0]
+            scanned += len(rows)
+            changed += len(changes)
+            if on_chunk:
+                on_chunk(last_id, scanned, changes)
+    return scanned, changed, guarded
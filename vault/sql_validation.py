@@ -1,4 +1,22 @@
-from sqlglot import parse_one, errors
+from collections import Counter, OrderedDict
+from dataclasses import dataclass, replace
+import hashlib
+import logging
+import multiprocessing
+import re
+import signal
+import threading
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeout
+from concurrent.futures.process import BrokenProcessPool
+
+import sqlglot
+from django.conf import settings
+from django.core.cache import caches
+from sqlglot import errors, exp
+from sqlglot.dialects.dialect import Dialect
+from sqlglot.tokens import TokenType
+
+logger = logging.getLogger(__name__)
 
 DIALECT_MAP = {
     "postgres": "postgres",
@@ -9,16 +27,466 @@ DIALECT_MAP = {
     "other": "mysql",
 }
 
+# Аюулын эрэмбэ — олон statement-тэй бол хамгийн аюултайгаар нь ангилна
+KIND_RANK = {"select": 0, "modify": 1, "dangerous": 2}
+MODIFY_NODES = (exp.Insert, exp.Update, exp.Merge)
+DANGEROUS_NODES = (exp.Delete, exp.Drop, exp.Alter, exp.Create, exp.TruncateTable, exp.Grant, exp.Revoke)
+
+
 class SQLSyntaxError(Exception):
     pass
 
-def validate_sql(sql_text: str, db_type: str) -> str:
-    sql_text = (sql_text or "").strip()
-    if not sql_text:
-        raise SQLSyntaxError("Empty SQL.")
-    dialect = DIALECT_MAP.get((db_type or "other"), "mysql")
+
+@dataclass(frozen=True, eq=False)
+class SQLAnalysis:
+    """Нэг parse-ын үр дүн: form/serializer → view → QuerySnippet.save дамжина."""
+    sql_text: str
+    db_type: str
+    dialect: str
+    statements: tuple = ()  # sqlglot AST (statement бүр) — parse cache-тай хуваалцана, бүү өөрчил
+    kind: str = "select"
+    errors: tuple = ()
+    statement_count: int = 0
+    guard: str = ""  # too_large / too_many_statements / timeout — шалгаж амжаагүй
+    # dedupe-д: canonical хэлбэрүүд (analysis үүсэхэд тооцно — AST-гүй үед ч дахин parse хэрэггүй)
+    normalized_sql: str = None  # literal → ?, alias → t1/c1 (MinHash)
+    exact_sql: str = None  # table alias л canonical (sql_fingerprint)
+
+    @property
+    def ok(self) -> bool:
+        return not self.errors
+
+    @property
+    def error(self) -> str:
+        return "; ".join(self.errors)
+
+    def matches(self, sql_text, db_type) -> bool:
+        return self.sql_text == (sql_text or "") and self.db_type == (db_type or "other")
+
+    def canonical(self, placeholders=True, column_aliases=True):
+        if placeholders and column_aliases:
+            return self.normalized_sql
+        if not placeholders and not column_aliases:
+            return self.exact_sql
+        return None
+
+    def to_wire(self) -> tuple:
+        """Process/shared cache-ээр дамжуулах хэлбэр (AST-гүй)."""
+        return (self.kind, list(self.errors), self.statement_count, self.guard, self.normalized_sql, self.exact_sql)
+
+    @classmethod
+    def from_wire(cls, text, db_type, dialect, wire):
+        kind, errs, count, guard, normalized, exact = wire
+        return cls(text, db_type, dialect, kind=kind, errors=tuple(errs), statement_count=count, guard=guard,
+                   normalized_sql=normalized, exact_sql=exact)
+
+
+def _strip_comments(sql: str) -> str:
+    s = sql or ""
+    # Хаагдаагүй /* нь төгсгөл хүртэл — олон "/*"-тэй текстэд quadratic болохгүй
+    s = re.sub(r"/\*.*?(?:\*/|\Z)", " ", s, flags=re.S)
+    s = re.sub(r"--.*?$", " ", s, flags=re.M)
+    return s.strip()
+
+
+def classify_sql_kind(sql: str) -> str:
+    """Regex ангилал — parse хийгдэхгүй SQL-д (analyze_sql-ийн fallback)."""
+    s = _strip_comments(sql).lower()
+    if not s:
+        return 'select'
+    m = re.match(r"^(with|select|insert|update|merge|delete|truncate|drop|alter|create|grant|revoke)", s)
+    kw = m.group(1) if m else ''
+    if kw in ('select', 'with'):
+        if re.search(r"\b(insert|update|merge|delete|truncate|drop|alter|create|grant|revoke)\b", s):
+            if re.search(r"\b(delete|truncate|drop|alter|create|grant|revoke)\b", s):
+                return 'dangerous'
+            return 'modify'
+        return 'select'
+    if kw in ('insert', 'update', 'merge'):
+        return 'modify'
+    if kw in ('delete', 'truncate', 'drop', 'alter', 'create', 'grant', 'revoke'):
+        return 'dangerous'
+    return 'select'
+
+
+# ------------- canonical form -------------
+def _canonicalize(tree, placeholders=True, column_aliases=True):
+    """Table alias → t1.., (сонголтоор) column alias → c1.., literal → ?."""
+    table_map, column_map = {}, {}
+    for node in tree.find_all(exp.TableAlias):
+        if node.name and node.name.lower() not in table_map:
+            table_map[node.name.lower()] = f"t{len(table_map) + 1}"
+    if column_aliases:
+        for node in tree.find_all(exp.Alias):
+            if node.alias and node.alias.lower() not in column_map:
+                column_map[node.alias.lower()] = f"c{len(column_map) + 1}"
+
+    def rename(node):
+        if placeholders and isinstance(node, exp.Literal):
+            return exp.Placeholder()
+        if isinstance(node, exp.TableAlias) and node.name.lower() in table_map:
+            node.set("this", exp.to_identifier(table_map[node.name.lower()]))
+        elif isinstance(node, exp.Alias) and node.alias.lower() in column_map:
+            node.set("alias", exp.to_identifier(column_map[node.alias.lower()]))
+        elif isinstance(node, exp.Column):
+            if node.table and node.table.lower() in table_map:
+                node.set("table", exp.to_identifier(table_map[node.table.lower()]))
+            elif not node.table and node.name.lower() in column_map:
+                node.set("this", exp.to_identifier(column_map[node.name.lower()]))
+        return node
+
+    return tree.transform(rename)
+
+
+def render_canonical(trees, dialect, placeholders=True, column_aliases=True) -> str:
+    return ";\n".join(
+        _canonicalize(t, placeholders, column_aliases).sql(dialect=dialect, normalize=True, comments=False)
+        for t in trees
+    )
+
+
+def regex_canonical(text: str, placeholders=True) -> str:
+    """Parse хийгдэхгүй (comment-гүй болгосон) SQL-ийн ойролцоо canonical хэлбэр."""
+    if placeholders:
+        text = re.sub(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b", "?", text)
+    return " ".join(text.lower().split())
+
+
+def _fallback_canonicals(text: str, dialect: str):
+    """Алдаатай SQL: comment-гүй текстийг дахин оролдоод, болохгүй бол regex (dedupe-ийн хуучин зан)."""
+    stripped = _strip_comments(text)
+    try:
+        trees = [t for t in Dialect.get_or_raise(dialect).parse(stripped) if t is not None]
+        return render_canonical(trees, dialect), render_canonical(trees, dialect, False, False)
+    except (errors.ParseError, errors.TokenError, RecursionError):
+        return regex_canonical(stripped), regex_canonical(stripped, placeholders=False)
+
+
+def statement_kind(tree) -> str:
+    """AST-аар: модонд (CTE, subquery орно) байгаа хамгийн аюултай node."""
+    kind = "select"
+    for node in tree.walk():
+        if isinstance(node, DANGEROUS_NODES):
+            return "dangerous"
+        if isinstance(node, MODIFY_NODES):
+            kind = "modify"
+        elif isinstance(node, exp.Command):
+            # sqlglot-ийн танихгүй statement (VACUUM, ...) — текстээр нь
+            kind = max(kind, classify_sql_kind(node.sql()), key=KIND_RANK.get)
+            if kind == "dangerous":
+                return kind
+    return kind
+
+
+# ------------- guards -------------
+guard_stats = Counter()  # энэ process-д хамгаалалт хэдэн удаа ажилласан
+_guard_lock = threading.Lock()
+
+
+class ParseTimeout(BaseException):
+    # Exception биш: sqlglot дотор `except Exception` байдаг тул alarm-ыг залгичихна
+    pass
+
+
+def _guarded(text: str, dialect: str, reason: str, message: str) -> SQLAnalysis:
+    # Шалгаж чадаагүй SQL-ийг эрхийн хувьд хамгийн хатуугаар ангилна; canonical нь зөвхөн whitespace
+    flat = " ".join(text.lower().split())
+    return SQLAnalysis(text, "", dialect, kind="dangerous", errors=(message,), guard=reason,
+                       normalized_sql=flat, exact_sql=flat)
+
+
+def record_guard(analysis: SQLAnalysis, isolated=False):
+    """Parse хийсэн process (parent) дээр тоолно — worker process-ийн тоолуур харагдахгүй."""
+    with _guard_lock:
+        if isolated:
+            guard_stats["isolated"] += 1
+        if analysis.guard:
+            guard_stats[analysis.guard] += 1
+    if analysis.guard:
+        logger.warning("SQL guard tripped (%s): %s", analysis.guard, analysis.error)
+
+
+def guard_snapshot() -> dict:
+    with _guard_lock:
+        return {k: guard_stats.get(k, 0) for k in ("too_large", "too_many_statements", "timeout", "isolated")}
+
+
+def _size_guard(text: str, dialect: str):
+    size = len(text.encode("utf-8", "surrogatepass"))
+    max_bytes = int(getattr(settings, "VAULT_SQL_MAX_BYTES", 1_000_000) or 0)
+    if max_bytes and size > max_bytes:
+        return _guarded(text, dialect, "too_large", f"SQL too large to validate ({size} bytes > {max_bytes}).")
+    return None
+
+
+def _analyze(text: str, dialect: str) -> SQLAnalysis:
+    if not text:
+        return SQLAnalysis(text, "", dialect, errors=("Empty SQL.",), normalized_sql="", exact_sql="")
+    too_large = _size_guard(text, dialect)
+    if too_large is not None:
+        return too_large
+    try:
+        d = Dialect.get_or_raise(dialect)
+        tokens = d.tokenize(text)
+        count = sum(t.token_type == TokenType.SEMICOLON for t in tokens)
+        count += bool(tokens) and tokens[-1].token_type != TokenType.SEMICOLON
+        max_statements = int(getattr(settings, "VAULT_SQL_MAX_STATEMENTS", 500) or 0)
+        if max_statements and count > max_statements:
+            return _guarded(text, dialect, "too_many_statements",
+                            f"Too many statements to validate ({count} > {max_statements}).")
+        statements = tuple(t for t in d.parser().parse(tokens, text) if t is not None)
+    except (errors.ParseError, errors.TokenError) as e:
+        message = str(e)
+    except RecursionError:
+        message = "SQL is nested too deeply."
+    else:
+        if not statements:
+            return SQLAnalysis(text, "", dialect, errors=("Empty SQL.",), normalized_sql="", exact_sql="")
+        kind = max((statement_kind(t) for t in statements), key=KIND_RANK.get)
+        return SQLAnalysis(
+            text, "", dialect, statements=statements, kind=kind, statement_count=len(statements),
+            normalized_sql=render_canonical(statements, dialect),
+            exact_sql=render_canonical(statements, dialect, placeholders=False, column_aliases=False),
+        )
+    normalized, exact = _fallback_canonicals(text, dialect)
+    return SQLAnalysis(text, "", dialect, kind=classify_sql_kind(text), errors=(message,),
+                       normalized_sql=normalized, exact_sql=exact)
+
+
+def _timeout() -> float:
+    return float(getattr(settings, "VAULT_SQL_PARSE_TIMEOUT", 2.0) or 0)
+
+
+def _timed_out(text, dialect, timeout):
+    return _guarded(text, dialect, "timeout", f"SQL too slow to validate (over {timeout:g}s).")
+
+
+def _alarm_available() -> bool:
+    return hasattr(signal, "setitimer") and threading.current_thread() is threading.main_thread()
+
+
+def analyze_with_alarm(text: str, dialect: str, timeout=None) -> SQLAnalysis:
+    """Process-ийн main thread дээр (batch pool worker) SIGALRM-аар хугацаа хязгаарлана."""
+    timeout = _timeout() if timeout is None else timeout
+    if not timeout or not _alarm_available():
+        return _analyze(text, dialect)
+
+    def on_alarm(signum, frame):
+        raise ParseTimeout()
+
+    previous = signal.signal(signal.SIGALRM, on_alarm)
+    signal.setitimer(signal.ITIMER_REAL, timeout)
     try:
-        parse_one(sql_text, read=dialect)
-    except errors.ParseError as e:
-        raise SQLSyntaxError(str(e)) from e
-    return dialect
+        return _analyze(text, dialect)
+    except ParseTimeout:
+        return _timed_out(text, dialect, timeout)
+    finally:
+        signal.setitimer(signal.ITIMER_REAL, 0)
+        signal.signal(signal.SIGALRM, previous)
+
+
+# Kill хийж болох parse-д зориулсан урт насалдаг pool. fork биш forkserver/spawn —
+# олон thread-тэй (threaded WSGI) process-оос fork хийх нь lock-уудыг гацааж болно.
+_isolation_pool = None
+_isolation_lock = threading.Lock()
+# Worker өөрөө SIGALRM-аар зогсоно; parent үүнээс удаан хүлээвэл worker гацсан гэж үзнэ
+ISOLATION_GRACE = 1.0
+
+
+def _isolation_context():
+    methods = multiprocessing.get_all_start_methods()
+    return multiprocessing.get_context("forkserver" if "forkserver" in methods else "spawn")
+
+
+def _get_isolation_pool():
+    global _isolation_pool
+    with _isolation_lock:
+        if _isolation_pool is None:
+            workers = int(getattr(settings, "VAULT_SQL_ISOLATE_WORKERS", 2) or 1)
+            _isolation_pool = ProcessPoolExecutor(max_workers=workers, mp_context=_isolation_context())
+        return _isolation_pool
+
+
+def _reset_isolation_pool(pool, kill=False):
+    """Эвдэрсэн/гацсан pool-ийг солино; `kill` — ажиллаж буй worker-уудыг шууд зогсооно."""
+    global _isolation_pool
+    with _isolation_lock:
+        if _isolation_pool is pool:
+            _isolation_pool = None
+    if kill:
+        # ProcessPoolExecutor-т kill хийх нийтийн API (3.14-өөс өмнө) байхгүй
+        for proc in list((getattr(pool, "_processes", None) or {}).values()):
+            proc.kill()
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+def _isolated_worker(text, dialect, timeout):
+    """Pool worker-ийн main thread дээр (parent-ийн `timeout`-тай SIGALRM): to_wire()."""
+    return analyze_with_alarm(text, dialect, timeout).to_wire()
+
+
+def _analyze_isolated(text: str, dialect: str, timeout: float) -> SQLAnalysis:
+    """
+    Урт насалдаг pool-д parse хийнэ (request thread гацахгүй). Worker `timeout`-д
+    SIGALRM-аар өөрөө зогсдог; түүнээс ISOLATION_GRACE-ээр хэтэрвэл pool-ийг kill хийж
+    шинээр үүсгэнэ. AST-ийг буцааж дамжуулахгүй (pickle нь parse шиг үнэтэй) —
+    kind/алдаа/тоо ба canonical хэлбэрүүдийг л; тиймээс save/dedupe дахин parse хийх шаардлагагүй.
+    """
+    pool = _get_isolation_pool()
+    try:
+        future = pool.submit(_isolated_worker, text, dialect, timeout)
+        return SQLAnalysis.from_wire(text, "", dialect, future.result(timeout + ISOLATION_GRACE))
+    except FutureTimeout:
+        if not future.cancel():
+            _reset_isolation_pool(pool, kill=True)  # SIGALRM-д ч зогсоогүй worker
+        return _timed_out(text, dialect, timeout)
+    except BrokenProcessPool:
+        # Worker санах ой/recursion-оор унасан (эсвэл өөр task-ийн улмаас kill хийгдсэн)
+        _reset_isolation_pool(pool)
+        return _guarded(text, dialect, "timeout", "SQL validation worker crashed.")
+
+
+def _analyze_guarded(text: str, dialect: str) -> SQLAnalysis:
+    """
+    VAULT_SQL_ISOLATE_CHARS-аас урт SQL-ийг, мөн SIGALRM ашиглаж чадахгүй (threaded WSGI
+    worker) thread дээрх бүх SQL-ийг kill хийж болох pool-д. Бусдыг энэ thread дээр
+    (sync worker, command) SIGALRM-аар хугацаа хязгаарлана.
+    """
+    timeout = _timeout()
+    isolate = timeout and (len(text) > int(getattr(settings, "VAULT_SQL_ISOLATE_CHARS", 20_000))
+                           or not _alarm_available())
+    if isolate and (not text or _size_guard(text, dialect) is not None):
+        isolate = False  # хоосон/хэмжээгээр шууд хариулна, pool хэрэггүй
+    if isolate and not multiprocessing.current_process().daemon:
+        analysis = _analyze_isolated(text, dialect, timeout)
+    else:
+        isolate = False
+        analysis = analyze_with_alarm(text, dialect)
+    record_guard(analysis, isolated=bool(isolate))
+    return analysis
+
+
+# ------------- parse cache -------------
+# Ангиллын дүрэм өөрчлөгдвөл нэмэгдүүлнэ (shared cache-ийн хуучин утга хэрэглэгдэхгүй)
+PARSE_CACHE_VERSION = 3
+# Ачааллаас хамаарах (дахин оролдвол өөр үр дүн гарч болох) guard-ууд
+TRANSIENT_GUARDS = frozenset({"timeout"})
+
+
+class ParseCache:
+    """
+    (sha256(text), dialect) → SQLAnalysis LRU (process доторх, thread-safe).
+    Алдаатай (negative), too_large / too_many_statements үр дүн ч хадгалагдана —
+    тухайн SQL-ээс л хамаардаг. `timeout` (worker унасан ч мөн) нь ачааллаас
+    хамаардаг тул хэзээ ч хадгалагдахгүй. VAULT_SQL_PARSE_CACHE_ALIAS
+    тохируулсан бол kind/алдаа/canonical-ийг shared cache-д мөн хадгална (AST-гүйгээр).
+    """
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.shared_hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        with self._lock:
+            value = self._data.get(key)
+            if value is not None:
+                self._data.move_to_end(key)
+                self.hits += 1
+                return value
+        value = self._shared_get(key)
+        with self._lock:
+            if value is None:
+                self.misses += 1
+            else:
+                self.shared_hits += 1
+        if value is not None:
+            self._local_set(key, value)
+        return value
+
+    def set(self, key, value):
+        if value.guard in TRANSIENT_GUARDS:
+            return
+        self._local_set(key, value)
+        self._shared_set(key, value)
+
+    def _local_set(self, key, value):
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    # ---- shared (optional) ----
+    @staticmethod
+    def _shared():
+        alias = getattr(settings, "VAULT_SQL_PARSE_CACHE_ALIAS", None)
+        return caches[alias] if alias else None
+
+    def _shared_get(self, key):
+        shared = self._shared()
+        raw = shared.get(f"vault:sqlparse:{key}") if shared is not None else None
+        if raw is None:
+            return None
+        return SQLAnalysis.from_wire("", "", key.rsplit(":", 1)[1], raw)
+
+    def _shared_set(self, key, value):
+        shared = self._shared()
+        if shared is not None:
+            shared.set(
+                f"vault:sqlparse:{key}", value.to_wire(),
+                timeout=getattr(settings, "VAULT_SQL_PARSE_CACHE_TIMEOUT", 3600),
+            )
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self.hits = self.shared_hits = self.misses = 0
+
+    def stats(self) -> dict:
+        total = self.hits + self.shared_hits + self.misses
+        return {
+            "entries": len(self._data),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "shared_hits": self.shared_hits,
+            "misses": self.misses,
+            "hit_rate": round((self.hits + self.shared_hits) / total, 4) if total else 0.0,
+        }
+
+
+parse_cache = ParseCache(int(getattr(settings, "VAULT_SQL_PARSE_CACHE_SIZE", 512)))
+
+
+def _cache_key(text: str, dialect: str) -> str:
+    digest = hashlib.sha256(text.encode("utf-8", "surrogatepass")).hexdigest()
+    return f"{PARSE_CACHE_VERSION}:{sqlglot.__version__}:{digest}:{dialect}"
+
+
+def analyze_sql(sql_text: str, db_type: str) -> SQLAnalysis:
+    """SQL-ийг нэг удаа parse хийж dialect, statement-үүд, kind, алдааг буцаана (cache-тэй)."""
+    sql_text = sql_text or ""
+    db_type = db_type or "other"
+    dialect = DIALECT_MAP.get(db_type, "mysql")
+    text = sql_text.strip()
+    if not text or len(text) > int(getattr(settings, "VAULT_SQL_PARSE_CACHE_MAX_CHARS", 200_000)):
+        analysis = _analyze_guarded(text, dialect)
+    else:
+        key = _cache_key(text, dialect)
+        analysis = parse_cache.get(key)
+        if analysis is None:
+            analysis = _analyze_guarded(text, dialect)
+            parse_cache.set(key, analysis)
+    return replace(analysis, sql_text=sql_text, db_type=db_type)
+
+
+def validate_sql(sql_text: str, db_type: str) -> str:
+    analysis = analyze_sql(sql_text, db_type)
+    if not analysis.ok:
+        raise SQLSyntaxError(analysis.error)
+    return analysis.dialect
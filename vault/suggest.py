@@ -0,0 +1,79 @@
+# vault/suggest.py
+"""
+Typeahead: SuggestEntry нь title-ийн үг бүрээс эхэлсэн suffix болон tag бүрийг
+жижиг үсгээр хадгалсан эрэмбэлэгдсэн prefix хүснэгт. Хайлт нь
+`key >= prefix AND key < prefix_next` range scan тул ямар ч DB дээр индексээр явна.
+"""
+from django.db import transaction
+from django.db.models import Count, Max, Sum
+
+from .models import SuggestEntry, parse_tags
+
+KEY_MAX_LEN = 200
+MAX_TITLE_POSITIONS = 10
+
+
+def normalize(text: str) -> str:
+    return " ".join((text or "").lower().split())[:KEY_MAX_LEN]
+
+
+def suggestion_rows(title: str, tags: str):
+    """(kind, key, label) жагсаалт (migration 0007 өөрийн хуулбартай)."""
+    rows = []
+    words = normalize(title).split(" ")
+    seen = set()
+    for i in range(min(len(words), MAX_TITLE_POSITIONS)):
+        key = " ".join(words[i:])[:KEY_MAX_LEN]
+        if key and key not in seen:
+            seen.add(key)
+            rows.append(("title", key, (title or "")[:KEY_MAX_LEN]))
+    for tag in parse_tags(tags):
+        key = normalize(tag)
+        if key and key not in seen:
+            seen.add(key)
+            rows.append(("tag", key, key))
+    return rows
+
+
+def sync_suggestions(snippet):
+    rows = suggestion_rows(snippet.title, snippet.tags)
+    with transaction.atomic():
+        SuggestEntry.objects.filter(snippet_id=snippet.pk).delete()
+        SuggestEntry.objects.bulk_create(
+            [SuggestEntry(snippet_id=snippet.pk, kind=k, key=key, label=label) for k, key, label in rows]
+        )
+
+
+def suggest(prefix: str, kinds, db_types=None, limit: int = 8):
+    """Эрхийн хүрээнд prefix-тэй таарах title/tag-уудыг use_count-аар эрэмбэлж буцаана."""
+    prefix = normalize(prefix)
+    if not prefix:
+        return {"titles": [], "tags": []}
+    # `key` аль хэдийн normalize хийгдсэн тул LIKE 'prefix%' индексийн range scan болно
+    # (гараар тооцсон дээд хязгаар MySQL-ийн _ci collation дээр буруу эрэмбэлэгддэг)
+    base = SuggestEntry.objects.filter(key__startswith=prefix, snippet__sql_kind__in=kinds)
+    if db_types is not None:
+        base = base.filter(snippet__db_type__in=db_types)
+
+    titles = (
+        base.filter(kind="title")
+        .values("snippet_id", "label", "snippet__db_type")
+        .annotate(use_count=Max("snippet__use_count"))
+        .order_by("-use_count", "label")[:limit]
+    )
+    tags = (
+        base.filter(kind="tag")
+        .values("label")
+        .annotate(use_count=Sum("snippet__use_count"), snippets=Count("snippet_id"))
+        .order_by("-use_count", "-snippets", "label")[:limit]
+    )
+    return {
+        "titles": [
+            {"id": r["snippet_id"], "title": r["label"], "db_type": r["snippet__db_type"], "use_count": r["use_count"]}
+            for r in titles
+        ],
+        "tags": [
+            {"tag": r["label"], "use_count": r["use_count"] or 0, "snippets": r["snippets"]}
+            for r in tags
+        ],
+    }
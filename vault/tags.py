@@ -0,0 +1,39 @@
+# vault/tags.py
+from django.db.models import Count
+
+from .models import QuerySnippet, Tag, parse_tags
+
+SnippetTag = QuerySnippet.tag_set.through
+
+
+def sync_tags(snippet):
+    """`tags` CharField-ийг Tag M2M-тэй тааруулна."""
+    names = parse_tags(snippet.tags)
+    if names:
+        Tag.objects.bulk_create([Tag(name=n) for n in names], ignore_conflicts=True)
+    snippet.tag_set.set(Tag.objects.filter(name__in=names) if names else [])
+
+
+def filter_by_tags(qs, names, mode="all"):
+    """
+    Tag-аар (яг таарах, case-insensitive) индекстэй join-оор шүүнэ.
+    mode="all" — бүх tag-тай, mode="any" — аль нэг tag-тай.
+    """
+    if not names:
+        return qs
+    if mode == "any":
+        return qs.filter(pk__in=SnippetTag.objects.filter(tag__name__in=names).values("querysnippet_id"))
+    for name in names:
+        qs = qs.filter(pk__in=SnippetTag.objects.filter(tag__name=name).values("querysnippet_id"))
+    return qs
+
+
+
+def tag_counts(snippet_ids, limit=50):
+    """snippet_ids (id жагсаалт эсвэл subquery) доторх tag бүрийн snippet тоо."""
+    return list(
+        SnippetTag.objects.filter(querysnippet_id__in=snippet_ids)
+        .values("tag__name")
+        .annotate(count=Count("querysnippet_id"))
+        .order_by("-count", "tag__name")[:limit]
+    )
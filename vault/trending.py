@@ -0,0 +1,118 @@
+# vault/trending.py
+"""
+Хугацааны exponential decay-тэй "trending" оноо (forward decay).
+
+Copy бүр w = exp(λ·(t − epoch)) жинтэй; snippet-ийн оноо нь эдгээрийн нийлбэр.
+Одоогийн decay хийсэн утга = нийлбэр · exp(−λ·(now − epoch)) бөгөөд бүх snippet-д
+ижил үржигдэхүүнтэй тул эрэмбэ нь хадгалагдсан нийлбэрээр л тодорхойлогдоно →
+`trend_score` дээрх энгийн индекс хангалттай, log-ийг дахин уншихгүй.
+Overflow-оос сэргийлж log орон зайд хадгална: trend_score = ln(Σ w), 0 = event байхгүй.
+Epoch-оос өмнөх copy-г epoch + 1 секундэд гэж тооцдог тул жин бүр > 0, copy-тай
+snippet-ийн оноо үргэлж эерэг (0 нь зөвхөн "copy байхгүй" гэсэн утгатай).
+
+Copy бүр O(1): trend_score ← logaddexp(trend_score, ln Σ w_batch) нэг UPDATE-аар.
+"""
+import datetime
+import math
+from collections import defaultdict
+
+from django.conf import settings
+from django.db.models import Case, F, FloatField, Value, When
+from django.db.models.functions import Abs, Exp, Greatest, Ln
+from django.utils import timezone
+
+from .models import QuerySnippet, SnippetDailyUsage
+from .rollups import day_bounds, finalized_through, live_copy_logs
+from .search_cache import bump_generation
+
+
+def decay_rate() -> float:
+    """λ (1/секунд) — VAULT_TRENDING_HALF_LIFE_DAYS-оос."""
+    half_life = float(getattr(settings, "VAULT_TRENDING_HALF_LIFE_DAYS", 7))
+    return math.log(2) / (half_life * 86400)
+
+
+def epoch() -> datetime.datetime:
+    value = getattr(settings, "VAULT_TRENDING_EPOCH", "2000-01-01")
+    return timezone.make_aware(datetime.datetime.fromisoformat(value), datetime.timezone.utc)
+
+
+def log_weight(t: datetime.datetime) -> float:
+    # Эерэг байх ёстой (0 = copy байхгүй) — epoch-оос өмнөх copy-г epoch + 1s гэж үзнэ
+    return decay_rate() * max((t - epoch()).total_seconds(), 1.0)
+
+
+def logsumexp(values) -> float:
+    values = list(values)
+    top = max(values)
+    return top + math.log(sum(math.exp(v - top) for v in values))
+
+
+def current_value(trend_score: float, now=None) -> float:
+    """Хадгалсан log оноог одоогийн decay хийсэн "copy тоо" болгоно (харуулахад)."""
+    if not trend_score:
+        return 0.0
+    now = now or timezone.now()
+    return math.exp(trend_score - log_weight(now))
+
+
+def apply_copy_times(times_by_snippet):
+    """
+    {snippet_id: [copied_at, ...]} → нэг UPDATE:
+    trend_score = 0 бол δ, үгүй бол max(s, δ) + ln(1 + exp(−|s − δ|)).
+    """
+    deltas = {pk: logsumexp(log_weight(t) for t in times) for pk, times in times_by_snippet.items() if times}
+    if not deltas:
+        return
+    delta = Case(*[When(pk=pk, then=Value(d)) for pk, d in deltas.items()], output_field=FloatField())
+    score = F("trend_score")
+    merged = Greatest(score, delta) + Ln(Value(1.0) + Exp(-Abs(score - delta)))
+    QuerySnippet.objects.filter(pk__in=deltas).update(
+        trend_score=Case(When(trend_score=0, then=delta), default=merged, output_field=FloatField()),
+        trend_updated_at=timezone.now(),
+    )
+
+
+def trending_scores(rows):
+    """
+    [(snippet_id, copied_at, copies), ...] → {snippet_id: trend_score}.
+    rebuild_trending (rollup + raw log-оос бүрэн дахин тооцох) ашиглана.
+    """
+    grouped = defaultdict(list)
+    for pk, t, copies in rows:
+        if copies:
+            grouped[pk].append(log_weight(t) + math.log(copies))
+    return {pk: logsumexp(ws) for pk, ws in grouped.items()}
+
+
+def rebuild_rows():
+    """Эцэслэгдсэн өдрүүд rollup-аас (өдрийн дунд цаг), үлдсэн нь raw log-оос."""
+    through = finalized_through()
+    if through is not None:
+        rolled = SnippetDailyUsage.objects.filter(day__lte=through).values_list("snippet_id", "day", "copies")
+        for pk, day, copies in rolled.iterator(chunk_size=5000):
+            start, end = day_bounds(day)
+            yield pk, start + (end - start) / 2, copies
+    for pk, t in live_copy_logs(through).values_list("snippet_id", "copied_at").iterator(chunk_size=5000):
+        yield pk, t, 1
+
+
+def rebuild_trend_scores(chunk: int = 1000) -> int:
+    """Бүх trend_score-ийг rollup + raw log-оос дахин тооцно (half-life/epoch солигдсоны дараа)."""
+    scores = trending_scores(rebuild_rows())
+    now = timezone.now()
+    QuerySnippet.objects.exclude(pk__in=list(scores)).exclude(trend_score=0).update(trend_score=0.0)
+    batch = []
+    for pk, score in scores.items():
+        batch.append(QuerySnippet(pk=pk, trend_score=score, trend_updated_at=now))
+        if len(batch) >= chunk:
+            QuerySnippet.objects.bulk_update(batch, ["trend_score", "trend_updated_at"])
+            batch = []
+    QuerySnippet.objects.bulk_update(batch, ["trend_score", "trend_updated_at"])
+    bump_generation()  # ordering=trending-ийн cache-лэгдсэн жагсаалт
+    return len(scores)
+
+
+def trending(qs, limit=None):
+    qs = qs.exclude(trend_score=0).order_by("-trend_score", "-id")
+    return qs[:limit] if limit else qs
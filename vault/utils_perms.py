@@ -1,41 +1,105 @@
 # vault/utils_perms.py
-from django.contrib.auth.models import Group
+"""
+Эрхийн хүрээ (role, sql kinds, db types).
+
+`permission_scope(user)` нэг удаа тооцоод request-ийн user объект дээр
+(`_vault_perm_scope`) болон shared cache-д (`vault:perm:<user_id>`) хадгална.
+Group гишүүнчлэл, UserDBAccess, User өөрчлөгдөхөд vault/signals.py cache-ийг устгана.
+VAULT_SEARCH_CACHE_ALIAS нь process-local бол (search_cache.shared_cache) зөвхөн
+request доторх memo ашиглана — нэг worker дээрх устгалт бусдад хүрэхгүй тул.
+"""
+from dataclasses import dataclass
+from typing import Optional, Tuple
+
+from django.conf import settings
+
 from .models import UserDBAccess
+from .search_cache import shared_cache
 
 ROLE_GROUPS = {
     "mid": "mid_user",
     "super": "super_user",
 }
 
+ROLE_KINDS = {
+    "admin": ("select", "modify", "dangerous"),
+    "super": ("select", "modify", "dangerous"),
+    "mid": ("select", "modify"),
+    "user": ("select",),
+    "anon": (),
+}
 
-def user_role(user) -> str:
+_MEMO_ATTR = "_vault_perm_scope"
+
+
+@dataclass(frozen=True)
+class PermissionScope:
+    role: str
+    kinds: Tuple[str, ...]
+    db_types: Optional[Tuple[str, ...]]  # None = бүх DB type
+
+
+def _perm_key(user_id) -> str:
+    return f"vault:perm:{user_id}"
+
+
+def _compute_role(user) -> str:
     if not user.is_authenticated:
         return "anon"
     if user.is_staff or user.is_superuser:
         return "admin"
-    if user.groups.filter(name=ROLE_GROUPS["super"]).exists():
+    names = set(user.groups.filter(name__in=ROLE_GROUPS.values()).values_list("name", flat=True))
+    if ROLE_GROUPS["super"] in names:
         return "super"
-    if user.groups.filter(name=ROLE_GROUPS["mid"]).exists():
+    if ROLE_GROUPS["mid"] in names:
         return "mid"
     return "user"
 
 
-def allowed_sql_kinds_for(user):
-    r = user_role(user)
+def _compute_scope(user) -> PermissionScope:
+    role = _compute_role(user)
+    db_types = None
+    if role != "admin":
+        db_types = () if role == "anon" else tuple(
+            UserDBAccess.objects.filter(user=user).values_list("db_type", flat=True)
+        )
+    return PermissionScope(role=role, kinds=ROLE_KINDS[role], db_types=db_types)
+
+
+def permission_scope(user) -> PermissionScope:
+    scope = getattr(user, _MEMO_ATTR, None)
+    if scope is not None:
+        return scope
+    shared = shared_cache() if user.is_authenticated else None
+    if shared is None:
+        scope = _compute_scope(user)
+    else:
+        key = _perm_key(user.pk)
+        scope = shared.get(key)
+        if scope is None:
+            scope = _compute_scope(user)
+            shared.set(key, scope, timeout=int(getattr(settings, "VAULT_PERM_CACHE_TIMEOUT", 600)))
+    try:
+        setattr(user, _MEMO_ATTR, scope)
+    except AttributeError:
+        pass
+    return scope
+
 
-    if r in ("admin", "super"):
-        return ["select", "modify", "dangerous"]
+def invalidate_permission_scope(*user_ids):
+    shared = shared_cache()
+    if user_ids and shared is not None:
+        shared.delete_many([_perm_key(uid) for uid in user_ids])
 
-    if r == "mid":
-        return ["select", "modify"]
 
-    if r == "user":
-        return ["select"]
+def user_role(user) -> str:
+    return permission_scope(user).role
+
+
+def allowed_sql_kinds_for(user):
+    return list(permission_scope(user).kinds)
 
-    return []
 
 def allowed_db_types_for(user):
-    if user_role(user) == "admin":
-        return None
-    qs = UserDBAccess.objects.filter(user=user).values_list("db_type", flat=True)
-    return list(qs)
+    db_types = permission_scope(user).db_types
+    return None if db_types is None else list(db_types)
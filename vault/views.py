@@ -1,5 +1,4 @@
 from django.contrib.auth.decorators import login_required
-from django.db.models import Q, F
 from django.shortcuts import get_object_or_404, redirect, render
 from django.utils.decorators import method_decorator
 from django.views import View
@@ -7,36 +6,19 @@ from django.views.generic import DetailView, ListView
 from django.contrib import messages
 from django.http import Http404, JsonResponse, HttpResponseForbidden
 
-from .models import QuerySnippet, SnippetCopyLog, classify_sql_kind
+from .copy_events import record_copy
+from .dedupe import find_near_duplicates
+from .models import QuerySnippet
 from .forms import SnippetForm
+from .search import filter_snippets, permitted_snippets, search_params, snippet_facets
+from .related import related_snippets
+from .trending import trending
 from django.contrib.auth.mixins import LoginRequiredMixin
+from rest_framework.request import Request
+from .pagination import SnippetCursorPagination
 from .utils_perms import allowed_sql_kinds_for, allowed_db_types_for
 
 
-def _search_queryset(qs, q):
-    if not q:
-        return qs
-    try:
-        # Postgres FTS байвал ашиглана
-        from django.contrib.postgres.search import SearchQuery, SearchVector, SearchRank
-        vector = (
-                SearchVector("title", weight="A")
-                + SearchVector("description", weight="B")
-                + SearchVector("sql_text", weight="C")
-                + SearchVector("tags", weight="B")
-        )
-        query = SearchQuery(q)
-        qs = qs.annotate(rank=SearchRank(vector, query)).filter(vector=query).order_by("-rank", "-updated_at")
-    except Exception:
-        qs = qs.filter(
-            Q(title__icontains=q)
-            | Q(description__icontains=q)
-            | Q(sql_text__icontains=q)
-            | Q(tags__icontains=q)
-        )
-    return qs
-
-
 class SnippetList(LoginRequiredMixin, ListView):
     model = QuerySnippet
     template_name = "vault/snippet_list.html"
@@ -45,32 +27,17 @@ class SnippetList(LoginRequiredMixin, ListView):
 
     def get_queryset(self):
         qs = super().get_queryset().order_by("-updated_at")
-        q = self.request.GET.get("q", "")
-        tag = self.request.GET.get("tag", "")
-        dbt = self.request.GET.get("db_type", "")
-
-        # хайлт/шүүлт
-        if q:
-            qs = qs.filter(
-                Q(title__icontains=q)
-                | Q(description__icontains=q)
-                | Q(sql_text__icontains=q)
-                | Q(tags__icontains=q)
-            )
-        if tag:
-            qs = qs.filter(tags__icontains=tag)
-        if dbt:
-            qs = qs.filter(db_type=dbt)
-
-        # ЭРХИЙН ШҮҮЛТ
-        kinds = allowed_sql_kinds_for(self.request.user)
-        qs = qs.filter(sql_kind__in=kinds)
-
-        db_types = allowed_db_types_for(self.request.user)
-        if db_types is not None:
-            qs = qs.filter(db_type__in=db_types)
-
-        return qs
+        # хайлт/шүүлт + ЭРХИЙН ШҮҮЛТ (API-тай ижил search backend)
+        return filter_snippets(qs, self.request.user, **search_params(self.request.GET))
+
+    def paginate_queryset(self, queryset, page_size):
+        # OFFSET/COUNT биш (updated_at, id) keyset — API-тай ижил cursor pagination
+        paginator = SnippetCursorPagination()
+        paginator.page_size = page_size
+        page = paginator.paginate_queryset(queryset, Request(self.request))
+        links = paginator.page_links()
+        is_paginated = bool(links["next"] or links["previous"])
+        return paginator, links, page, is_paginated
 
     def get_context_data(self, **kwargs):
         ctx = super().get_context_data(**kwargs)
@@ -78,6 +45,20 @@ class SnippetList(LoginRequiredMixin, ListView):
         ctx["q"] = self.request.GET.get("q", "")
         ctx["tag"] = self.request.GET.get("tag", "")
         ctx["dbt"] = self.request.GET.get("db_type", "")
+        ctx["ordering"] = search_params(self.request.GET)["ordering"]
+
+        # Trending хэсэг: шүүлтгүй эхний хуудсанд (trend_score индексээр)
+        if not any(self.request.GET.get(k) for k in ("q", "tag", "db_type", "cursor")):
+            ctx["trending"] = trending(permitted_snippets(QuerySnippet.objects.all(), self.request.user), limit=5)
+
+        # DB type dropdown-ы тоо: сонгосон db_type-аас бусад шүүлтээр
+        params = {**self.request.GET.dict(), "db_type": ""}
+        facet_qs = filter_snippets(QuerySnippet.objects.all(), self.request.user, **search_params(params))
+        counts = {
+            f["value"]: f["count"]
+            for f in snippet_facets(facet_qs, self.request.user, ["db_type"], **params).get("db_type", [])
+        }
+        ctx["db_choices"] = [(val, label, counts.get(val, 0)) for val, label in QuerySnippet.DB_CHOICES]
         return ctx
 
 
@@ -97,6 +78,14 @@ class SnippetDetail(LoginRequiredMixin, DetailView):
             raise Http404("Not found")
         return obj
 
+    def get_context_data(self, **kwargs):
+        ctx = super().get_context_data(**kwargs)
+        # "Мөн copy хийсэн" — урьдчилан тооцсон top-k (нэг query)
+        ctx["related"] = related_snippets(
+            self.object, allowed_sql_kinds_for(self.request.user), allowed_db_types_for(self.request.user)
+        )
+        return ctx
+
 
 @method_decorator(login_required, name="dispatch")
 class SnippetCreate(View):
@@ -113,9 +102,8 @@ class SnippetCreate(View):
             candidate = form.save(commit=False)
             candidate.created_by = request.user
             # SQL төрөл ангил
-            sql_kind = classify_sql_kind(candidate.sql_text)
             kinds = allowed_sql_kinds_for(request.user)
-            if sql_kind not in kinds:
+            if form.sql_analysis.kind not in kinds:
                 form.add_error("sql_text", "Таны роль энэ төрлийн SQL хадгалах эрхгүй.")
             db_types = allowed_db_types_for(request.user)
             if db_types is not None and candidate.db_type not in db_types:
@@ -126,6 +114,13 @@ class SnippetCreate(View):
 
             candidate.save()
             messages.success(request, "Амжилттай хадгаллаа.")
+            dupes = find_near_duplicates(
+                candidate.sql_text, candidate.db_type, exclude_id=candidate.pk, analysis=form.sql_analysis,
+                queryset=permitted_snippets(QuerySnippet.objects.all(), request.user),
+            )
+            if dupes:
+                listed = ", ".join(f"#{s.pk} {s.title} ({sim:.0%})" for s, sim in dupes)
+                messages.warning(request, f"Ойролцоо SQL аль хэдийн байна: {listed}")
             return redirect("vault:snippet_detail", pk=candidate.pk)
 
         return render(request, "vault/snippet_form.html", {"form": form})
@@ -147,9 +142,8 @@ class SnippetUpdate(View):
         if form.is_valid():
             candidate = form.save(commit=False)
             # Эрхийн шалгалт (шинэ утгаар)
-            sql_kind = classify_sql_kind(candidate.sql_text)
             kinds = allowed_sql_kinds_for(request.user)
-            if sql_kind not in kinds:
+            if form.sql_analysis.kind not in kinds:
                 form.add_error("sql_text", "Таны роль энэ төрлийн SQL засах эрхгүй.")
             db_types = allowed_db_types_for(request.user)
             if db_types is not None and candidate.db_type not in db_types:
@@ -200,22 +194,9 @@ def copy_event(request, pk):
     ua = (request.META.get("HTTP_USER_AGENT", "") or "")[:512]
     ref = request.META.get("HTTP_REFERER", "")
 
-    # Atomic increment
-    QuerySnippet.objects.filter(pk=obj.pk).update(use_count=F("use_count") + 1)
-    obj.refresh_from_db(fields=["use_count"])
-
-    # Log copy
-    SnippetCopyLog.objects.create(
-        snippet=obj,
-        user=request.user if request.user.is_authenticated else None,
-        ip_address=ip or None,
-        user_agent=ua,
-        referer=ref,
-        sql_snapshot=obj.sql_text,
-        sql_chars=len(obj.sql_text or ""),
-    )
-
-    return JsonResponse({"ok": True, "use_count": obj.use_count})
+    # Буферт хийгээд шууд хариулна (use_count нь тооцоолсон утга)
+    use_count = record_copy(obj, user=request.user, ip=ip, user_agent=ua, referer=ref)
+    return JsonResponse({"ok": True, "use_count": use_count, "estimated": True})
 
 
 def _limit_form_db_types(form, user):